@@ -1,8 +1,32 @@
 """ArcEnCiel Link extension package with explicit runtime startup."""
 
+import threading
+
 _started = False
 
 
+def _start_link_services(cfg: dict) -> None:
+    """Start the transport, inventory and worker in the current process."""
+
+    from .client import apply_worker_state, check_backend_health
+    from .downloader import schedule_inventory_push
+
+    if str(cfg.get("transport") or "").lower() == "asyncio":
+        from .engine import start_engine
+
+        start_engine(
+            int(cfg.get("max_concurrent_downloads") or 2),
+            compression=bool(cfg.get("ws_compression", True)),
+        )
+
+    schedule_inventory_push()
+    # the first health check may wait for DNS and TLS; keep it off the WebUI's startup path
+    threading.Thread(target=check_backend_health, name="arcenciel-link-health", daemon=True).start()
+
+    if cfg.get("link_key"):
+        apply_worker_state(bool(cfg.get("enabled", False)), link_key=cfg.get("link_key"))
+
+
 def startup() -> None:
     """Register host callbacks and start background Link services once."""
 
@@ -12,10 +36,7 @@ def startup() -> None:
 
     from modules import script_callbacks
 
-    from .client import apply_worker_state, check_backend_health
     from .config import load
-    from .downloader import schedule_inventory_push
-    from .server import router
 
     cfg = load()
     bridge_port = int(cfg.get("bridge_port") or 0)
@@ -24,6 +45,8 @@ def startup() -> None:
         if not args:
             return
         app = args[-1]
+        from .server import router
+
         if not any(route.path.startswith("/arcenciel-link/") for route in app.router.routes):
             app.include_router(router)
             print("[AEC-LINK] API router mounted")
@@ -40,11 +63,18 @@ def startup() -> None:
         else:
             script_callbacks.on_app_started(mount_api)
 
-    schedule_inventory_push()
-    check_backend_health()
+    if cfg.get("evict_lru"):
+        from .eviction import register_callbacks
+
+        register_callbacks()
+
+    if cfg.get("worker_process"):
+        from .isolation import start_worker_process
+
+        start_worker_process()
+    else:
+        _start_link_services(cfg)
 
-    if cfg.get("link_key"):
-        apply_worker_state(bool(cfg.get("enabled", False)), link_key=cfg.get("link_key"))
     if cfg.get("save_html_preview", False):
         try:
             import arcenciel_link.extra_preview  # noqa: F401
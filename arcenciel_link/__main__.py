@@ -0,0 +1,74 @@
+"""Headless Link worker: ``python -m arcenciel_link``.
+
+Runs the client, downloader, inventory and browser bridge without a WebUI,
+configured from ``config.json`` and the usual environment overrides.  Point
+``--webui-root`` (or ``SD_WEBUI_ROOT``) at a Forge install, and pass its
+model folder flags through ``COMMANDLINE_ARGS``, to share its model folders.
+
+    python -m arcenciel_link [--webui-root PATH] [--bridge-port PORT]
+    python -m arcenciel_link manifest export|import FILE
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import sys
+import threading
+from pathlib import Path
+from typing import List
+
+
+def _run_daemon(args: argparse.Namespace) -> int:
+    from . import _start_link_services, utils
+    from .config import load
+
+    cfg = load()
+    if args.webui_root:
+        utils._WEBUI_ROOT_OVERRIDE = Path(args.webui_root)
+    root = args.webui_root or cfg.get("webui_root") or os.getenv("SD_WEBUI_ROOT")
+    if root:
+        # job targets resolve against SD_WEBUI_ROOT, inventory scans against webui_root or it
+        os.environ["SD_WEBUI_ROOT"] = str(root)
+    bridge_port = int(cfg.get("bridge_port") or 0) if args.bridge_port is None else args.bridge_port
+
+    if bridge_port > 0:
+        from .bridge import start_bridge
+
+        start_bridge(bridge_port)
+    _start_link_services(cfg)
+    print(f"[AEC-LINK] headless worker running for {os.environ.get('SD_WEBUI_ROOT', os.getcwd())}", flush=True)
+
+    stop = threading.Event()
+
+    # the client installs handlers that only close the socket; a daemon also has to exit
+    for name in ("SIGINT", "SIGTERM", "SIGHUP"):
+        sig = getattr(signal, name, None)
+        if sig is not None:
+            signal.signal(sig, lambda *_args: stop.set())
+    while not stop.wait(3600):
+        pass
+
+    from .client import _shutdown
+
+    _shutdown()
+    print("[AEC-LINK] headless worker stopped", flush=True)
+    return 0
+
+
+def main(argv: List[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["manifest"]:
+        from .manifest import main as manifest_main
+
+        return manifest_main(argv[1:])
+
+    parser = argparse.ArgumentParser(prog="python -m arcenciel_link", description=__doc__.splitlines()[0])
+    parser.add_argument("--webui-root", help="WebUI folder whose models/ and embeddings/ are used")
+    parser.add_argument("--bridge-port", type=int, help="browser bridge port, 0 to disable (default: config)")
+    return _run_daemon(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,11 +3,6 @@ from __future__ import annotations
 import atexit
 import threading
 
-import uvicorn
-from fastapi import FastAPI
-
-from .server import router
-
 
 class BridgeServer:
     """Serve only ArcEnCiel routes outside Forge's global CORS middleware."""
@@ -15,30 +10,37 @@ class BridgeServer:
     def __init__(self, port: int) -> None:
         self._port = port
         self._thread: threading.Thread | None = None
-        self._server: uvicorn.Server | None = None
+        self._server = None
+        self._stopping = False
 
     def start(self) -> None:
         if self._thread is not None or self._port <= 0:
             return
-
-        app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
-        app.include_router(router)
-        config = uvicorn.Config(
-            app,
-            host="127.0.0.1",
-            port=self._port,
-            log_level="warning",
-            access_log=False,
-            server_header=False,
-            lifespan="off",
-        )
-        self._server = uvicorn.Server(config)
+        # FastAPI, uvicorn and the routes are imported on the bridge thread
         self._thread = threading.Thread(target=self._run, name="arcenciel-link-bridge", daemon=True)
         self._thread.start()
 
     def _run(self) -> None:
         try:
-            assert self._server is not None
+            import uvicorn
+            from fastapi import FastAPI
+
+            from .server import router
+
+            app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
+            app.include_router(router)
+            config = uvicorn.Config(
+                app,
+                host="127.0.0.1",
+                port=self._port,
+                log_level="warning",
+                access_log=False,
+                server_header=False,
+                lifespan="off",
+            )
+            self._server = uvicorn.Server(config)
+            if self._stopping:
+                return
             self._server.run()
         except BaseException as exc:  # Uvicorn raises SystemExit when the port is occupied.
             print(f"[AEC-LINK] bridge failed on 127.0.0.1:{self._port}: {exc}", flush=True)
@@ -46,6 +48,7 @@ class BridgeServer:
         print(f"[AEC-LINK] bridge stopped on 127.0.0.1:{self._port}", flush=True)
 
     def stop(self) -> None:
+        self._stopping = True
         if self._server is not None:
             self._server.should_exit = True
         if self._thread is not None and self._thread.is_alive():
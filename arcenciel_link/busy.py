@@ -0,0 +1,97 @@
+"""Back off downloads and hashing while the WebUI is generating.
+
+A busy-probe is any callable returning ``True`` while generation runs; the
+default one reads Forge/A1111's ``modules.shared.state``.  ``gate()`` is
+called after every chunk written or hashed and applies ``busy_policy``:
+``"throttle"`` (default) limits background I/O to ``busy_throttle_mbps``,
+``"pause"`` holds it until the WebUI is idle and ``"off"`` ignores the probe.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable
+
+from .cancellation import CancelToken
+from .config import load
+from .priority import IOBudget
+
+Probe = Callable[[], bool]
+POLICIES = ("throttle", "pause", "off")
+# probe results are reused for this long so per-chunk checks stay cheap
+PROBE_TTL = 0.25
+PAUSE_POLL = 0.5
+
+_lock = threading.Lock()
+_probe: Probe | None = None
+_checked_at = 0.0
+_busy = False
+_policy: str | None = None
+_throttle: IOBudget | None = None
+
+
+def forge_state_probe() -> bool:
+    try:
+        from modules import shared
+    except Exception:
+        return False
+    state = getattr(shared, "state", None)
+    if state is None or getattr(state, "interrupted", False):
+        return False
+    return bool(getattr(state, "job_count", 0)) or bool(getattr(state, "job", ""))
+
+
+def set_probe(probe: Probe | None) -> None:
+    """Replace the busy-probe; ``None`` restores the WebUI state probe."""
+
+    global _probe, _checked_at
+    with _lock:
+        _probe = probe
+        _checked_at = 0.0
+
+
+def is_busy() -> bool:
+    global _checked_at, _busy
+    now = time.monotonic()
+    with _lock:
+        if now - _checked_at < PROBE_TTL:
+            return _busy
+        probe = _probe or forge_state_probe
+    try:
+        busy = bool(probe())
+    except Exception:
+        busy = False
+    with _lock:
+        _busy, _checked_at = busy, now
+    return busy
+
+
+def _load_policy() -> str:
+    global _policy, _throttle
+    if _policy is None:
+        cfg = load()
+        policy = str(cfg.get("busy_policy") or "throttle").lower()
+        _throttle = IOBudget(float(cfg.get("busy_throttle_mbps") or 32))
+        _policy = policy if policy in POLICIES else "throttle"
+    return _policy
+
+
+def gate(nbytes: int, cancel: CancelToken | None = None) -> None:
+    """Account *nbytes* of background I/O, slowing down or waiting while busy.
+
+    A pause ends early when *cancel* is cancelled; the caller checks it.
+    """
+
+    policy = _load_policy()
+    if policy == "off" or not is_busy():
+        return
+    if policy == "pause":
+        while is_busy():
+            if cancel is None:
+                time.sleep(PAUSE_POLL)
+            elif cancel.wait(PAUSE_POLL):
+                return
+        return
+    assert _throttle is not None
+    _throttle.consume(nbytes)
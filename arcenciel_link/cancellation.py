@@ -0,0 +1,123 @@
+"""Per-job cancellation tokens.
+
+The server cancels a job with a ``cancel`` control message.  Each job gets a
+token when the worker picks it up; the streaming and retry loops check it and
+an open response registers a hook that shuts its connection down, so a
+cancelled transfer stops within one read.  A cancel for a job that is still
+queued (see ``admit()``) is kept until the job is picked up; one for a job
+this worker does not hold is refused.
+
+Pausing the worker stops every running job the same way with the reason
+``"paused"``; the job keeps its ``.part`` and resumes later.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Callable
+
+
+class Cancelled(Exception):
+    """Raised inside a job whose token was cancelled."""
+
+    def __init__(self, reason: str = "cancelled") -> None:
+        super().__init__(f"{reason} by {'user' if reason == 'paused' else 'server'}")
+        self.reason = reason
+
+
+class CancelToken:
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._hooks: list[Callable[[], None]] = []
+        self.reason: str | None = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            hooks, self._hooks = self._hooks, []
+        for hook in hooks:
+            try:
+                hook()
+            except Exception:
+                pass
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise Cancelled(self.reason or "cancelled")
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to *timeout* seconds; True if cancelled meanwhile."""
+
+        return self._event.wait(timeout)
+
+    def on_cancel(self, hook: Callable[[], None]) -> Callable[[], None]:
+        """Run *hook* on cancellation (at once if already cancelled); returns an unregister function."""
+
+        with self._lock:
+            if not self._event.is_set():
+                self._hooks.append(hook)
+                return lambda: self._discard(hook)
+        hook()
+        return lambda: None
+
+    def _discard(self, hook: Callable[[], None]) -> None:
+        with self._lock:
+            if hook in self._hooks:
+                self._hooks.remove(hook)
+
+
+_TOKENS: dict[str, CancelToken] = {}
+# jobs queued but not started yet
+_QUEUED: set[str] = set()
+_LOCK = threading.Lock()
+
+
+def admit(job_id) -> None:
+    """Note a queued job, so a cancel arriving before it starts is kept."""
+
+    with _LOCK:
+        _QUEUED.add(str(job_id))
+
+
+def token_for(job_id) -> CancelToken:
+    with _LOCK:
+        _QUEUED.discard(str(job_id))
+        return _TOKENS.setdefault(str(job_id), CancelToken())
+
+
+def cancel(job_id) -> bool:
+    """Cancel a running or queued job; False when this worker does not hold it."""
+
+    key = str(job_id)
+    with _LOCK:
+        token = _TOKENS.get(key)
+        if token is None:
+            if key not in _QUEUED:
+                return False
+            # handed out by token_for() when the job starts
+            token = _TOKENS[key] = CancelToken()
+    token.cancel()
+    return True
+
+
+def pause_all() -> None:
+    """Stop every running job; tokens already cancelled keep their reason."""
+
+    with _LOCK:
+        tokens = list(_TOKENS.values())
+    for token in tokens:
+        token.cancel("paused")
+
+
+def release(job_id) -> None:
+    with _LOCK:
+        _TOKENS.pop(str(job_id), None)
+        _QUEUED.discard(str(job_id))
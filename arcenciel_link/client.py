@@ -1,6 +1,5 @@
 import atexit
 import base64
-import json
 import logging
 import queue
 import re
@@ -14,9 +13,11 @@ from urllib.parse import urlparse, urlunparse
 
 import websocket
 
+from . import cancellation, wire
 from .config import load, save
+from .isolation import get_worker_process
 from .utils import get_http_session, list_subfolders
-from .version import CAPABILITIES, CLIENT_ID, PROTOCOL_VERSION, VERSION
+from .version import CAPABILITIES, CLIENT_ID, INVENTORY_DELTA_CAPABILITY, PROTOCOL_VERSION, VERSION
 
 _LOG_FILE = Path(__file__).with_name("client-debug.log")
 
@@ -83,6 +84,7 @@ BASE_URL = _normalise_base_url(_cfg["base_url"], allow_insecure=DEV_MODE)
 LINK_KEY = _cfg.get("link_key", "")
 TIMEOUT = 15
 HEARTBEAT_INTERVAL = 5
+POLL_INTERVAL = HEARTBEAT_INTERVAL + 5
 _socket_enabled = False
 _runner_started = False
 _credentials_dirty = False
@@ -129,6 +131,10 @@ def update_credentials(
     link_key: str | None = None,
 ):
     global BASE_URL, LINK_KEY, _credentials_dirty, _suspend_until, _suspend_notice_logged
+    worker_process = get_worker_process()
+    if worker_process is not None:
+        worker_process.call("update_credentials", base_url=base_url, link_key=link_key)
+        return
     ws_needs_refresh = False
     credentials_changed = False
 
@@ -157,6 +163,7 @@ def update_credentials(
     if credentials_changed:
         _suspend_until = 0.0
         _suspend_notice_logged = False
+        wake_dispatcher()
 
 
 _refresh_ws_url()
@@ -164,6 +171,28 @@ _refresh_ws_url()
 _sock = None
 _job_queue = queue.Queue()
 _open_evt = threading.Event()
+# signalled on job arrival, connection changes and enable/disable; the socket
+# runner and the worker wait on it instead of polling
+_wakeup = threading.Condition()
+_wake_seq = 0
+_last_poll = 0.0
+
+
+def wake_dispatcher() -> None:
+    """Wake the socket runner and a worker blocked in ``queue_next_job``."""
+
+    global _wake_seq
+    with _wakeup:
+        _wake_seq += 1
+        _wakeup.notify_all()
+
+
+def wait_for_wakeup(timeout: float) -> bool:
+    """Block until ``wake_dispatcher()`` runs or *timeout* passes; True if woken."""
+
+    with _wakeup:
+        seq = _wake_seq
+        return _wakeup.wait_for(lambda: _wake_seq != seq, timeout)
 
 
 def _sanitize_link_key(value):
@@ -195,11 +224,19 @@ def _send_ws_payload(payload: dict, *, default_type: str | None = None):
         return
     try:
         if _sock is not None:
-            _sock.send(json.dumps(payload))
+            _send_frame(_sock, payload)
     except Exception as exc:
         _debug(f"failed to send payload: {exc}")
 
 
+def _send_frame(sock, payload: dict) -> None:
+    data = wire.encode(payload)
+    if isinstance(data, bytes):
+        sock.send(data, opcode=websocket.ABNF.OPCODE_BINARY)
+    else:
+        sock.send(data)
+
+
 def _send_worker_state(running: bool | None = None):
     if running is None:
         running = _is_worker_running()
@@ -255,6 +292,9 @@ def _apply_worker_state(enable: bool, *, link_key=None) -> bool:
 
 
 def apply_worker_state(enable: bool, *, link_key: str | None = None) -> bool:
+    worker_process = get_worker_process()
+    if worker_process is not None:
+        return bool(worker_process.call("apply_worker_state", enable=enable, link_key=link_key).get("running"))
     return _apply_worker_state(enable, link_key=link_key)
 
 
@@ -280,6 +320,7 @@ def _set_connection_state(state: str, message: str):
 
 def _on_open(ws):
     global _reconnect_attempts, _credentials_dirty, _last_connected_at, _suspend_until, _suspend_notice_logged
+    wire.reset()
     _open_evt.set()
     _reconnect_attempts = 0
     _credentials_dirty = False
@@ -289,6 +330,7 @@ def _on_open(ws):
     _set_connection_state("connected", f"[AEC-LINK] connected to {_display_target()}")
     _send_worker_state()
     ws.send('{"type":"poll"}')
+    wake_dispatcher()
 
 
 def _parse_retry_after(reason: str | None) -> float:
@@ -305,6 +347,7 @@ def _parse_retry_after(reason: str | None) -> float:
 def _on_close(ws, code=None, msg=None):
     global _suspend_until, _suspend_notice_logged
     _open_evt.clear()
+    wake_dispatcher()
     reason = msg
     if isinstance(reason, bytes):
         try:
@@ -372,15 +415,22 @@ def _on_error(ws, err):
     _set_connection_state("error", "[AEC-LINK] websocket error")
 
 
-def _on_msg(ws, raw):
+def _on_msg(ws, raw, control=None):
+    """Handle one frame; *control*, when given, runs control messages instead of ``_handle_control``."""
+
     try:
-        msg = json.loads(raw)
+        msg = wire.decode(raw)
     except Exception:
         return
+    if msg is None:
+        return
     if msg.get("type") == "job":
-        _job_queue.put(msg["data"])
+        enqueue_job(msg["data"])
     elif msg.get("type") == "control":
-        _handle_control(msg)
+        (control or _handle_control)(msg)
+    elif msg.get("type") == "capabilities":
+        wire.set_peer_capabilities(msg.get("capabilities"))
+        _debug(f"server capabilities: {msg.get('capabilities')}")
 
 
 def _handle_control(msg: dict):
@@ -402,6 +452,15 @@ def _handle_control(msg: dict):
         except Exception as exc:
             response.update({"ok": False, "message": str(exc)})
         _send_control_ack(response)
+    elif command == "cancel":
+        job_id = msg.get("jobId")
+        if job_id is None:
+            response.update({"ok": False, "message": "jobId required"})
+        elif _cancel_local(job_id):
+            response.update({"ok": True, "jobId": job_id})
+        else:
+            response.update({"ok": False, "jobId": job_id, "message": "unknown job"})
+        _send_control_ack(response)
     elif command == "list_subfolders":
         kind = str(msg.get("kind") or "").lower().strip()
         allowed = {"checkpoint", "lora", "vae", "embedding"}
@@ -441,6 +500,33 @@ def _handle_control(msg: dict):
         _send_control_ack(response)
 
 
+def _cancel_local(job_id) -> bool:
+    """Cancel a running, queued or paused job; False when this worker does not hold it."""
+
+    from .downloader import cancel_paused
+
+    return cancellation.cancel(job_id) or cancel_paused(job_id)
+
+
+def _active_engine():
+    # the engine module is only imported once the asyncio transport starts
+    engine = sys.modules.get(f"{__package__}.engine")
+    return engine.get_engine() if engine is not None else None
+
+
+def enqueue_job(job: dict) -> None:
+    """Hand a job to the asyncio engine when it runs, else to the worker queue."""
+
+    if job.get("id") is not None:
+        cancellation.admit(job["id"])
+    engine = _active_engine()
+    if engine is not None:
+        engine.submit_job(job)
+    else:
+        _job_queue.put(job)
+        wake_dispatcher()
+
+
 _alive = threading.Event()
 
 
@@ -457,6 +543,30 @@ def _on_ping(ws, data):
         _debug(f"failed to send pong: {exc}")
 
 
+def _connection_params() -> tuple[str, list[str], list[str] | None]:
+    params: list[str] = ["mode=worker"]
+    headers: list[str] = []
+    if LINK_KEY:
+        headers.append(f"x-link-key: {LINK_KEY}")
+    headers.extend(
+        [
+            f"x-arcenciel-link-protocol: {PROTOCOL_VERSION}",
+            f"x-arcenciel-link-capabilities: {','.join(CAPABILITIES)}",
+            f"x-arcenciel-link-client: {CLIENT_ID}/{VERSION}",
+        ]
+    )
+    query = "?" + "&".join(params)
+    return _WS_URL + query, headers, _ws_subprotocols()
+
+
+def _next_reconnect_delay() -> float:
+    global _reconnect_attempts
+    delay = min(_RECONNECT_MAX_DELAY, _RECONNECT_BASE_DELAY * (2**_reconnect_attempts))
+    _reconnect_attempts = min(_reconnect_attempts + 1, 6)
+    _debug(f"reconnect back-off: {delay:.1f}s")
+    return delay
+
+
 def _ensure_socket():
     global _sock, _reconnect_attempts
     if not _socket_enabled:
@@ -464,6 +574,10 @@ def _ensure_socket():
         return
     if _sock and _open_evt.is_set():
         return
+    engine = _active_engine()
+    if engine is not None:
+        engine.wake()
+        return
 
     def _runner():
         global _sock, _reconnect_attempts, _suspend_until, _suspend_notice_logged
@@ -477,7 +591,8 @@ def _ensure_socket():
                     _sock = None
                 _open_evt.clear()
                 _debug("runner sleeping - disabled")
-                time.sleep(1)
+                with _wakeup:
+                    _wakeup.wait_for(lambda: _socket_enabled)
                 continue
 
             if _suspend_until:
@@ -487,25 +602,14 @@ def _ensure_socket():
                         print(f"[AEC-LINK] waiting {int(remaining)}s before reconnect...")
                         _debug(f"suspend_until active, {remaining:.1f}s remaining")
                         _suspend_notice_logged = True
-                    time.sleep(min(remaining, 5))
+                    # cut short by new credentials or by disabling the connection
+                    with _wakeup:
+                        _wakeup.wait_for(lambda: not _suspend_until or not _socket_enabled, remaining)
                     continue
                 _suspend_until = 0.0
                 _suspend_notice_logged = False
 
-            params: list[str] = ["mode=worker"]
-            headers: list[str] = []
-            if LINK_KEY:
-                headers.append(f"x-link-key: {LINK_KEY}")
-            headers.extend(
-                [
-                    f"x-arcenciel-link-protocol: {PROTOCOL_VERSION}",
-                    f"x-arcenciel-link-capabilities: {','.join(CAPABILITIES)}",
-                    f"x-arcenciel-link-client: {CLIENT_ID}/{VERSION}",
-                ]
-            )
-            query = "?" + "&".join(params)
-            url = _WS_URL + query
-            protocols = _ws_subprotocols()
+            url, headers, protocols = _connection_params()
             try:
                 _set_connection_state("connecting", f"[AEC-LINK] connecting to {_display_target()}")
                 _debug(f"connecting via {url}")
@@ -531,10 +635,8 @@ def _ensure_socket():
             finally:
                 _open_evt.clear()
                 _sock = None
-            delay = min(_RECONNECT_MAX_DELAY, _RECONNECT_BASE_DELAY * (2**_reconnect_attempts))
-            _reconnect_attempts = min(_reconnect_attempts + 1, 6)
-            _debug(f"reconnect back-off: {delay:.1f}s")
-            time.sleep(delay)
+            # force_reconnect() and enable/disable skip the rest of the back-off
+            wait_for_wakeup(_next_reconnect_delay())
 
     global _runner_started
     if not _runner_started:
@@ -543,7 +645,7 @@ def _ensure_socket():
                 threading.Thread(target=_runner, daemon=True).start()
                 _runner_started = True
                 _debug("runner started")
-    time.sleep(0.2)
+                _open_evt.wait(0.2)
 
 
 def headers():
@@ -585,33 +687,52 @@ def check_backend_health():
         return False
 
 
-def queue_next_job():
+def queue_next_job(timeout: float = HEARTBEAT_INTERVAL):
+    """Return the next queued job as soon as it arrives.
+
+    Returns None after *timeout* seconds, or earlier when the connection or
+    the worker state changes, so the caller can re-check both.  The server
+    pushes jobs; an idle worker re-sends ``poll`` only every
+    ``POLL_INTERVAL`` seconds as a safety net.
+    """
+
+    global _last_poll
     _ensure_socket()
-    try:
-        return _job_queue.get(timeout=HEARTBEAT_INTERVAL + 5)
-    except queue.Empty:
-        if _open_evt.is_set():
+    deadline = time.monotonic() + max(0.0, timeout)
+    with _wakeup:
+        seq = _wake_seq
+        while True:
             try:
-                _sock.send('{"type":"poll"}')
-            except Exception:
+                return _job_queue.get_nowait()
+            except queue.Empty:
                 pass
-        return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or _wake_seq != seq:
+                break
+            _wakeup.wait(remaining)
+    now = time.monotonic()
+    if _open_evt.is_set() and now - _last_poll >= POLL_INTERVAL:
+        _last_poll = now
+        try:
+            _sock.send('{"type":"poll"}')
+        except Exception:
+            pass
+    return None
 
 
 def report_progress(job_id: int, *, progress: int = None, state: str = None, message: str | None = None):
     if _open_evt.is_set():
-        _sock.send(
-            json.dumps(
-                {
-                    "type": "progress",
-                    "jobId": job_id,
-                    "progress": progress,
-                    "state": state,
-                    "message": message,
-                }
-            )
+        _send_frame(
+            _sock,
+            {
+                "type": "progress",
+                "jobId": job_id,
+                "progress": progress,
+                "state": state,
+                "message": message,
+            },
         )
-        if state == "DONE":
+        if state in ("DONE", "CANCELLED"):
             _sock.send('{"type":"poll"}')
 
     else:
@@ -624,18 +745,33 @@ def report_progress(job_id: int, *, progress: int = None, state: str = None, mes
         )
 
 
-def push_inventory(hashes: list[str]):
+def push_inventory(hashes: list[str], pending: list[dict] | None = None):
+    payload: dict = {"hashes": hashes}
+    if pending is not None:
+        payload["pending"] = pending
     if _open_evt.is_set():
-        _sock.send(json.dumps({"type": "inventory", "hashes": hashes}))
+        _send_frame(_sock, {"type": "inventory", **payload})
     else:
         SESSION.post(
             f"{BASE_URL}/inventory",
-            json={"hashes": hashes},
+            json=payload,
             headers=headers(),
             timeout=TIMEOUT,
         )
 
 
+def push_inventory_delta(added: list[str], removed: list[str], pending: list[dict] | None = None) -> bool:
+    """Send only the changed hashes; ``False`` when the server cannot take a delta."""
+
+    if not _open_evt.is_set() or not wire.peer_supports(INVENTORY_DELTA_CAPABILITY):
+        return False
+    payload: dict = {"type": "inventory_delta", "added": added, "removed": removed}
+    if pending is not None:
+        payload["pending"] = pending
+    _send_frame(_sock, payload)
+    return True
+
+
 def set_connection_enabled(enabled: bool, *, silent: bool = False):
     global _socket_enabled, _sock
     _socket_enabled = enabled
@@ -652,6 +788,10 @@ def set_connection_enabled(enabled: bool, *, silent: bool = False):
             _set_connection_state("disconnected", "[AEC-LINK] worker offline")
     else:
         _ensure_socket()
+    wake_dispatcher()
+    engine = _active_engine()
+    if engine is not None:
+        engine.wake()
 
 
 def _shutdown(*_args):
@@ -685,7 +825,9 @@ def force_reconnect():
         return
     if not _open_evt.is_set():
         _debug("force_reconnect: socket not open, ensuring connection")
+        _reconnect_attempts = 0
         _ensure_socket()
+        wake_dispatcher()
         return
     if _credentials_dirty or _sock is None:
         _debug("force_reconnect: credentials changed, closing socket")
@@ -714,3 +856,4 @@ def force_reconnect():
 def cancel_job(job_id: int) -> None:
     r = SESSION.patch(f"{BASE_URL}/queue/{job_id}/cancel", headers=headers(), timeout=TIMEOUT)
     r.raise_for_status()
+    _cancel_local(job_id)
@@ -1,5 +1,8 @@
+import copy
 import json
 import os
+import sys
+import threading
 import warnings
 from pathlib import Path
 
@@ -47,10 +50,48 @@ _DEFAULT = {
     "link_key": "",
     "enabled": False,
     "min_free_mb": 2048,
+    # Where downloads go when a model type has several folders (--ckpt-dirs, --lora-dirs, ...):
+    # "first" (primary unless full), "most_free", "tiered" (folders fastest first; files under
+    # placement_small_mb go to the first that fits) or "round_robin".
+    "placement_policy": "first",
+    "placement_small_mb": 1024,
+    # When a download does not fit, remove (or move to evict_cold_dir) the least recently
+    # used models ArcEnCiel downloaded that were idle for evict_min_idle_hours.
+    "evict_lru": False,
+    "evict_cold_dir": "",
+    "evict_min_idle_hours": 72,
     "max_retries": 5,
+    # "final" fsyncs a download once before it is renamed into place, "periodic" also every 256 MiB, "none" never.
+    "download_fsync": "final",
+    # What a job cancelled by the server leaves behind: "delete" its .part, or "keep" it for a re-dispatch to resume.
+    "cancelled_part": "delete",
+    # Folder (e.g. local NVMe or tmpfs) downloads are written and verified in before being moved into place.
+    "staging_dir": "",
     "backoff_base": 2,
     "webui_root": "",
     "save_html_preview": False,
+    # fnmatch patterns (file name or path relative to a model root) skipped by inventory scans.
+    "scan_exclude": [],
+    # Optional content-addressed store; duplicate models are hardlinked or reflinked instead of downloaded.
+    "cas_dir": "",
+    # Files hashed in parallel by inventory scans; keep at 1 for libraries on spinning disks.
+    "hash_workers": 2,
+    # Run hashing, downloads and sidecar work at idle I/O and lowered CPU priority (Linux).
+    "background_priority": True,
+    # Read budget for background hashing in MB/s; 0 means unlimited.
+    "background_io_mbps": 0,
+    # While the WebUI generates: "throttle" downloads and hashing, "pause" them, or "off".
+    "busy_policy": "throttle",
+    "busy_throttle_mbps": 32,
+    # Reuse and refresh the full SHA-256 values the WebUI keeps in its cache.json.
+    "forge_cache_sync": True,
+    # "threads" (websocket-client) or "asyncio" (single event loop; needs the optional websockets package).
+    "transport": "threads",
+    "max_concurrent_downloads": 2,
+    # Run the client, downloader, hashing and inventory in a separate Python process.
+    "worker_process": False,
+    # Offer permessage-deflate on the asyncio transport's WebSocket.
+    "ws_compression": True,
     # Forge's global CORS middleware consumes browser preflights before
     # extension routes run. A dedicated loopback-only bridge avoids changing
     # CORS policy for the rest of the WebUI.
@@ -97,7 +138,46 @@ def _load_keyring_secrets(cfg: dict) -> None:
         cfg[key] = stored or (provided or "")
 
 
+# last loaded config and what it was derived from; see _cache_key()
+_CACHE_LOCK = threading.Lock()
+_cached: tuple[tuple, dict] | None = None
+
+
+def _cache_key() -> tuple:
+    try:
+        st = _CFG.stat()
+        file_key = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        file_key = None
+    opts = None
+    shared = sys.modules.get("modules.shared")
+    data = getattr(getattr(shared, "opts", None), "data", None)
+    if isinstance(data, dict):
+        opts = (data.get("arcenciel_link_base_url"), data.get("arcenciel_link_access_key"))
+    env = tuple(os.getenv(name) for name in ("ARCENCIEL_LINK_URL", "ARCENCIEL_LINK_KEY", "ARCENCIEL_DEV"))
+    return str(_CFG), file_key, opts, env, _detect_dev_mode()
+
+
 def load() -> dict:
+    """Return the effective config, re-read only when its inputs changed.
+
+    The cache is keyed by the file's mtime and size, the WebUI options and
+    the environment overrides, and is dropped by ``save()``.  Callers get a
+    copy they may modify.
+    """
+
+    global _cached
+    key = _cache_key()
+    with _CACHE_LOCK:
+        if _cached is not None and _cached[0] == key:
+            return copy.deepcopy(_cached[1])
+    cfg = _load_uncached()
+    with _CACHE_LOCK:
+        _cached = (key, cfg)
+    return copy.deepcopy(cfg)
+
+
+def _load_uncached() -> dict:
     cfg = _DEFAULT.copy()
     dev_mode = _detect_dev_mode()
 
@@ -140,6 +220,9 @@ def load() -> dict:
 
 
 def save(cfg: dict):
+    global _cached
+    with _CACHE_LOCK:
+        _cached = None
     for key in _SECRET_KEYS:
         secret = sanitize_legacy_secret(cfg.get(key))
         set_secret(key, secret)
@@ -14,13 +14,22 @@ from pathlib import Path
 from textwrap import dedent
 from urllib.parse import unquote, urlparse
 
-from . import client
+from . import cancellation, client, eviction, journal, priority, store
+from .cancellation import Cancelled, CancelToken
 from .config import load
+from .inventory import INDEX
 from .utils import (
+    FSYNC_POLICIES,
+    InsufficientSpace,
     download_file,
     get_http_session,
-    get_model_path,
     list_model_hashes,
+    list_partial_downloads,
+    model_paths_for_target,
+    move_file,
+    paths_for_hash,
+    pending_models,
+    scan_in_progress,
     sha256_of_file,
     update_cached_hash,
 )
@@ -29,15 +38,38 @@ _cfg = load()
 MIN_FREE_MB = int(_cfg.get("min_free_mb", 2048))
 MAX_RETRIES = int(_cfg.get("max_retries", 5))
 BACKOFF_BASE = int(_cfg.get("backoff_base", 2))
+DOWNLOAD_FSYNC = str(_cfg.get("download_fsync") or "final").lower()
+if DOWNLOAD_FSYNC not in FSYNC_POLICIES:
+    DOWNLOAD_FSYNC = "final"
+KEEP_CANCELLED_PART = str(_cfg.get("cancelled_part") or "delete").lower() == "keep"
+PLACEMENT_POLICIES = ("first", "most_free", "tiered", "round_robin")
+PLACEMENT_POLICY = str(_cfg.get("placement_policy") or "first").lower()
+if PLACEMENT_POLICY not in PLACEMENT_POLICIES:
+    PLACEMENT_POLICY = "first"
+PLACEMENT_SMALL_MB = int(_cfg.get("placement_small_mb", 1024))
+STAGING_DIR = Path(_cfg["staging_dir"]).expanduser() if _cfg.get("staging_dir") else None
 
 SLEEP_AFTER_ERROR = 5
+ORPHAN_PART_GRACE = 15 * 60
 PROGRESS_MIN_STEP = 2
 PROGRESS_MIN_INTERVAL = 1.5
-KNOWN_HASHES: set[str] = set()
 
 _backend_ok = False
 _user_disabled = False
 RUNNING = threading.Event()
+# started on first enable rather than at import
+_worker_thread: threading.Thread | None = None
+_WORKER_LOCK = threading.Lock()
+# destinations picked by in-flight jobs, so concurrent downloads never share a name
+_RESERVED_TARGETS: set[Path] = set()
+_TARGET_LOCK = threading.Lock()
+# expected size of every active job's .part, keyed by job id; see _reserve_space()
+_SPACE_RESERVED: dict[str, tuple[int, Path, int]] = {}
+_SPACE_LOCK = threading.Lock()
+_ROUND_ROBIN: dict[tuple[Path, ...], int] = {}
+# jobs stopped by toggle_worker(False), re-queued in order when the worker is enabled again
+_PAUSED: dict[str, dict] = {}
+_PAUSED_LOCK = threading.Lock()
 SESSION = get_http_session()
 
 os.environ.setdefault("PYTHONIOENCODING", "utf-8")
@@ -52,19 +84,15 @@ def _clean(name: str) -> str:
     return _RND_PREFIX.sub("", name, count=1)
 
 
-try:
-    from PIL import Image
-
-    _HAS_PIL = True
-except ImportError:
-    _HAS_PIL = False
-
-
 def _unique_filename(dir_: Path, name: str) -> Path:
     stem, ext = os.path.splitext(name or "_")
     candidate = name
     idx = 1
-    while (dir_ / candidate).exists() or (dir_ / (candidate + ".part")).exists():
+    while (
+        (dir_ / candidate).exists()
+        or (dir_ / (candidate + ".part")).exists()
+        or (dir_ / candidate) in _RESERVED_TARGETS
+    ):
         candidate = f"{stem}_{idx}{ext}"
         idx += 1
     return dir_ / candidate
@@ -82,9 +110,145 @@ def _heartbeat():
 HEARTBEAT_INTERVAL = 5
 
 
-def _enough_free_space(path: Path, min_mb: int = MIN_FREE_MB) -> bool:
-    free = shutil.disk_usage(path).free // (1024 * 1024)
-    return free >= min_mb
+def _expected_size(ver: dict) -> int:
+    try:
+        return max(0, int(ver.get("fileSize") or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _unallocated(part: Path, total: int) -> int:
+    # written or preallocated blocks already count against the free space
+    try:
+        allocated = part.stat().st_blocks * 512
+    except (OSError, AttributeError):
+        allocated = 0
+    return max(0, total - allocated)
+
+
+def _available_space(directory: Path, job_id=None) -> tuple[int, int]:
+    """Return ``(st_dev, free bytes)`` for *directory* minus what other active jobs still have to write.
+
+    Call with ``_SPACE_LOCK`` held.  A folder that does not exist yet is
+    measured at its nearest existing parent.
+    """
+
+    while not directory.exists() and directory.parent != directory:
+        directory = directory.parent
+    dev = os.stat(directory).st_dev
+    pending = sum(
+        _unallocated(other, size)
+        for key, (other_dev, other, size) in _SPACE_RESERVED.items()
+        if other_dev == dev and key != str(job_id)
+    )
+    return dev, shutil.disk_usage(directory).free - pending
+
+
+def _rank_target_dirs(candidates: list[Path], size: int) -> list[Path]:
+    """Order the folders a new download may go to, according to ``placement_policy``.
+
+    ``first`` keeps the primary folder unless the file does not fit there;
+    ``most_free`` takes the folder with the most room; ``tiered`` treats the
+    folders as ordered fastest first and puts files under
+    ``placement_small_mb`` in the first one that fits, larger ones in the
+    one with the most room; ``round_robin`` rotates through the folders
+    that fit.  Folders the file does not fit follow, most room first; the
+    job moves down the list when a space reservation fails.
+    """
+
+    if len(candidates) == 1:
+        return list(candidates)
+    headroom = MIN_FREE_MB * 1024 * 1024
+    with _SPACE_LOCK:
+        free = {directory: _available_space(directory)[1] for directory in candidates}
+        fitting = [directory for directory in candidates if free[directory] - size >= headroom]
+        if PLACEMENT_POLICY == "round_robin" and fitting:
+            key = tuple(candidates)
+            turn = _ROUND_ROBIN.get(key, 0)
+            _ROUND_ROBIN[key] = turn + 1
+            turn %= len(fitting)
+            fitting = fitting[turn:] + fitting[:turn]
+    small = 0 < size < PLACEMENT_SMALL_MB * 1024 * 1024
+    if PLACEMENT_POLICY == "most_free" or (PLACEMENT_POLICY == "tiered" and not small):
+        fitting.sort(key=free.__getitem__, reverse=True)
+    rest = sorted(
+        (directory for directory in candidates if directory not in fitting), key=free.__getitem__, reverse=True
+    )
+    return fitting + rest
+
+
+def _reserve_space(job_id, part: Path, total: int = 0) -> None:
+    """Reserve room for a *total*-byte download into *part*, plus ``min_free_mb``.
+
+    Space other active jobs on the same filesystem still have to write is
+    subtracted from the free space first.  Raises ``InsufficientSpace``.
+    """
+
+    evicted = 0
+    found = None
+    try:
+        while True:
+            with _SPACE_LOCK:
+                dev, available = _available_space(part.parent, job_id)
+                needed = _unallocated(part, total) + MIN_FREE_MB * 1024 * 1024
+                if available >= needed:
+                    _SPACE_RESERVED[str(job_id)] = (dev, part, total)
+                    return
+                victims = eviction.plan(found, needed - available) if found else []
+            # scanning the library and deleting or moving models take a while; other jobs keep reserving meanwhile
+            if victims:
+                freed = eviction.evict(victims)
+                if not freed:
+                    break
+                evicted += freed
+            elif found is None and eviction.enabled():
+                found = eviction.collect(part.parent)
+            else:
+                break
+    finally:
+        if evicted:
+            _sync_inventory()
+    if not total:
+        raise InsufficientSpace(f"Less than {MIN_FREE_MB} MB free")
+    raise InsufficientSpace(
+        f"{part.name.removesuffix('.part')} needs {needed // (1024 * 1024)} MB "
+        f"including {MIN_FREE_MB} MB headroom; {max(available, 0) // (1024 * 1024)} MB available"
+    )
+
+
+def _reserve_job_space(job_id, part: Path, target: Path, total: int = 0) -> None:
+    """Reserve room for the ``.part`` and, when it is staged on another filesystem, for the final copy."""
+
+    _reserve_space(job_id, part, total)
+    if part.parent != target.parent and os.stat(part.parent).st_dev != os.stat(target.parent).st_dev:
+        # move_file() copies through target.part
+        _reserve_space(f"{job_id}:final", target.with_name(target.name + ".part"), total)
+
+
+def _release_space(job_id) -> None:
+    with _SPACE_LOCK:
+        _SPACE_RESERVED.pop(str(job_id), None)
+        _SPACE_RESERVED.pop(f"{job_id}:final", None)
+
+
+def _part_path(job_id, dst_path: Path) -> Path:
+    if STAGING_DIR is None:
+        return dst_path.with_name(dst_path.name + ".part")
+    STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    return STAGING_DIR / f"{job_id}_{dst_path.name}.part"
+
+
+def _claim_target(job_id, directory: Path, name: str, previous: Path | None = None) -> tuple[Path, Path]:
+    """Reserve a free file name in *directory*, releasing *previous*; returns ``(target, part)``."""
+
+    with _TARGET_LOCK:
+        if previous is not None:
+            _RESERVED_TARGETS.discard(previous)
+        directory.mkdir(parents=True, exist_ok=True)
+        #  foo.safetensors ,  foo_1.safetensors ,  foo_2
+        target = _unique_filename(directory, name)
+        _RESERVED_TARGETS.add(target)
+    return target, _part_path(job_id, target)
 
 
 def _print_progress(label: str, pct: int | None = None, last=[-1]):
@@ -97,16 +261,64 @@ def _print_progress(label: str, pct: int | None = None, last=[-1]):
 
 
 def _already_have(hash_: str | None) -> bool:
-    return hash_ in KNOWN_HASHES if hash_ else False
+    return INDEX.contains(hash_)
 
 
-def _sync_inventory(hashes: list[str]) -> None:
-    unique_count = len(KNOWN_HASHES)
-    if len(hashes) == unique_count and KNOWN_HASHES.issuperset(hashes):
-        return
-    KNOWN_HASHES.clear()
-    KNOWN_HASHES.update(hashes)
-    client.push_inventory(hashes)
+# inventory changes accumulated from the index until the next publish
+_INVENTORY_LOCK = threading.Lock()
+_pending_added: set[str] = set()
+_pending_removed: set[str] = set()
+_inventory_published = False
+_published_pending: list[dict] = []
+
+
+def _on_inventory_change(added: list[str], removed: list[str]) -> None:
+    with _INVENTORY_LOCK:
+        for h in added:
+            if h in _pending_removed:
+                _pending_removed.discard(h)
+            else:
+                _pending_added.add(h)
+        for h in removed:
+            if h in _pending_added:
+                _pending_added.discard(h)
+            else:
+                _pending_removed.add(h)
+
+
+INDEX.subscribe(_on_inventory_change)
+
+
+def _sync_inventory() -> None:
+    """Publish pending inventory changes, as a delta when the server takes one.
+
+    Only full SHA-256 values count as inventory; files still being hashed go
+    out separately as ``pending`` fingerprints.
+    """
+
+    global _inventory_published, _published_pending
+    pending = sorted(pending_models(), key=lambda entry: (entry.get("fingerprint") or "", entry.get("size", 0)))
+    with _INVENTORY_LOCK:
+        unchanged = not _pending_added and not _pending_removed and pending == _published_pending
+        if _inventory_published and unchanged:
+            return
+        added, removed = sorted(_pending_added), sorted(_pending_removed)
+        _pending_added.clear()
+        _pending_removed.clear()
+        first = not _inventory_published
+        previous_pending = _published_pending
+        _inventory_published = True
+        _published_pending = pending
+    try:
+        if first or not client.push_inventory_delta(added, removed, pending):
+            client.push_inventory(INDEX.hashes(), pending)
+    except Exception:
+        with _INVENTORY_LOCK:
+            _inventory_published = not first
+            _published_pending = previous_pending
+            _pending_added.update(added)
+            _pending_removed.update(removed)
+        raise
 
 
 def _private_download_options(job: dict, url: str) -> tuple[dict[str, str] | None, bool]:
@@ -141,6 +353,8 @@ def _download_with_retry(
     *,
     request_headers: dict[str, str] | None = None,
     allow_redirects: bool = True,
+    cancel: CancelToken | None = None,
+    reserve=None,
 ):
     for attempt in range(1, MAX_RETRIES + 1):
         try:
@@ -150,13 +364,27 @@ def _download_with_retry(
                 progress_cb,
                 request_headers=request_headers,
                 allow_redirects=allow_redirects,
+                fsync=DOWNLOAD_FSYNC,
+                cancel=cancel,
+                reserve=reserve,
             )
             return
-        except Exception:
+        except Cancelled:
+            raise
+        except InsufficientSpace:
+            # the job ends here and its journal entry with it; nothing would claim the .part
             tmp.unlink(missing_ok=True)
+            raise
+        except Exception:
+            # keep the .part between attempts; the next one resumes it with a Range request
             if attempt == MAX_RETRIES:
+                tmp.unlink(missing_ok=True)
                 raise
-            time.sleep(BACKOFF_BASE**attempt + random.uniform(0, 1))
+            delay = BACKOFF_BASE**attempt + random.uniform(0, 1)
+            if cancel is None:
+                time.sleep(delay)
+            elif cancel.wait(delay):
+                cancel.check()
 
 
 def _save_preview(url: str, model_path: Path) -> str | None:
@@ -171,7 +399,11 @@ def _save_preview(url: str, model_path: Path) -> str | None:
         r = SESSION.get(url, timeout=20)
         r.raise_for_status()
 
-        if _HAS_PIL:
+        try:
+            from PIL import Image
+        except ImportError:
+            Image = None
+        if Image is not None:
             img = Image.open(BytesIO(r.content)).convert("RGBA")
             img.save(preview_file, format="PNG")
         else:
@@ -184,7 +416,7 @@ def _save_preview(url: str, model_path: Path) -> str | None:
         return None
 
 
-def _write_info_json(meta: dict, sha_local: str, preview_name: str | None, model_path: Path):
+def _write_info_json(meta: dict, sha_local: str, preview_name: str | None, model_path: Path, downloaded: bool = False):
     info = {
         "schema": 1,
         "modelId": meta.get("modelId"),
@@ -198,6 +430,9 @@ def _write_info_json(meta: dict, sha_local: str, preview_name: str | None, model
         "previewFile": preview_name,
         "arcencielUrl": f"https://arcenciel.io/models/{meta.get('modelId')}",
     }
+    if downloaded:
+        # marks the file as the link's own; only these are candidates for LRU eviction
+        info["downloadedByLink"] = True
     (model_path.parent / (model_path.stem + ".arcenciel.info")).write_text(
         json.dumps(info, indent=2, ensure_ascii=False), encoding="utf-8"
     )
@@ -240,131 +475,351 @@ def _write_html(meta: dict, preview_name: str | None, model_path: Path):
     (model_path.parent / (model_path.stem + ".arcenciel.html")).write_text(html, encoding="utf-8")
 
 
-def _worker():
-    global _backend_ok
-
-    last_hb = 0
-    while True:
-        RUNNING.wait()
+def _index_existing_copy(path: Path) -> None:
+    if not path.is_file() or INDEX.hash_of(path.resolve()) is not None:
+        return
+    update_cached_hash(path, sha256_of_file(path))
+
+
+def _place_local_copy(sha256: str, dst_path: Path) -> bool:
+    if not store.enabled():
+        return False
+    candidates = paths_for_hash(sha256)
+    if any(path.parent == dst_path.parent for path in candidates):
+        return False
+    method = store.place(sha256, dst_path, candidates)
+    if not method:
+        return False
+    print(f"[AEC-LINK] {dst_path.name} placed from local copy ({method})", flush=True)
+    return True
+
+
+def _finish_job(job: dict, meta: dict, dst_path: Path, sha256: str) -> None:
+    # side-cars
+    preview_name = _save_preview(meta.get("preview"), dst_path)
+    _write_info_json(meta, sha256, preview_name, dst_path, downloaded=True)
+    if _cfg.get("save_html_preview"):
+        _write_html(meta | {"sha256": sha256}, preview_name, dst_path)
+
+    # done
+    update_cached_hash(dst_path, sha256)
+    _sync_inventory()
+    journal.remove(job["id"])
+    client.report_progress(job["id"], state="DONE", progress=100)
+    _print_progress(dst_path.name)
+
+
+def _interrupt(job_id, part: Path | None, message: str) -> None:
+    # private grants are short-lived; the server must re-dispatch the job, which then adopts the .part
+    if part is not None and part.exists():
+        journal.update(job_id, state="INTERRUPTED")
+    else:
+        journal.remove(job_id)
+    try:
+        client.report_progress(int(job_id), state="ERROR", message=message)
+    except Exception as exc:
+        print(f"[AEC-LINK] could not report interrupted job {job_id}: {exc}")
 
-        now = time.time()
-        if now - last_hb > HEARTBEAT_INTERVAL:
-            _heartbeat()
-            last_hb = now
 
-        try:
-            job = client.queue_next_job()
+def _recover_journal() -> None:
+    """Resume or re-report jobs a previous process left unfinished."""
 
-            if job is None:
-                time.sleep(2)
+    for job_id, entry in journal.entries().items():
+        part = Path(entry["part"])
+        if entry.get("state") == "INTERRUPTED":
+            if not part.exists():
+                journal.remove(job_id)
+            continue
+        if not entry.get("private") and part.exists():
+            print(f"[AEC-LINK] resuming {Path(entry['target']).name} after restart", flush=True)
+            client.enqueue_job(entry["job"])
+            continue
+        _interrupt(job_id, part, "Download interrupted by restart")
+
+    claimed = journal.claimed_parts()
+    # browsers and other downloaders write .part files too; only ours are removed
+    known = journal.known_parts()
+    cutoff = time.time() - ORPHAN_PART_GRACE
+    partials = [(part, st) for part, st in list_partial_downloads() if str(part) in known]
+    if STAGING_DIR is not None and STAGING_DIR.is_dir():
+        for part in STAGING_DIR.glob("*.part"):
+            if not _RND_PREFIX.match(part.name):
                 continue
-
-            if not _backend_ok:
-                print("[AEC-LINK] connected")
-            _backend_ok = True
-        except Exception:
-            if _backend_ok:
-                print("[AEC-LINK] disconnected")
-            _backend_ok = False
-            time.sleep(SLEEP_AFTER_ERROR)
+            try:
+                partials.append((Path(os.path.realpath(part)), part.stat()))
+            except OSError:
+                continue
+    for part, st in partials:
+        # another WebUI sharing the folder may still be writing a fresh .part
+        if str(part) in claimed or st.st_mtime > cutoff:
             continue
+        print(f"[AEC-LINK] removing orphaned partial download {part}", flush=True)
+        part.unlink(missing_ok=True)
+    journal.forget_parts(path for path in known if path not in claimed and not os.path.exists(path))
 
-        try:
-            ver = job["version"]
-            meta = ver.get("meta") or {}
-            url_raw = ver.get("externalDownloadUrl") or ver.get("filePath")
 
-            if url_raw and not url_raw.startswith(("http://", "https://")):
-                from urllib.parse import urljoin
+_recovered = False
 
-                root = client.BASE_URL.split("/api/")[0].rstrip("/")
-                url_raw = urljoin(root + "/", url_raw.lstrip("/"))
 
-            if not url_raw:
-                raise RuntimeError("No download URL provided by server")
+def _recover_once() -> None:
+    global _recovered
+    if _recovered:
+        return
+    _recovered = True
+    try:
+        _recover_journal()
+    except Exception as exc:
+        print(f"[AEC-LINK] job journal recovery failed: {exc}")
+
+
+def _cancel_job(job: dict, tmp_path: Path | None) -> None:
+    if tmp_path is not None and KEEP_CANCELLED_PART and tmp_path.exists():
+        # a re-dispatch of the same model to this folder adopts the .part
+        journal.update(job["id"], state="INTERRUPTED")
+    else:
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+        journal.remove(job["id"])
+    print(f"[AEC-LINK] job {job['id']} cancelled", flush=True)
+    client.report_progress(job["id"], state="CANCELLED")
+
+
+def _pause_job(job: dict, tmp_path: Path | None) -> None:
+    # the journal keeps target and .part, so the re-queued job resumes with a Range request
+    size = tmp_path.stat().st_size if tmp_path is not None and tmp_path.exists() else 0
+    journal.update(job["id"], state="PAUSED", bytes=size)
+    with _PAUSED_LOCK:
+        _PAUSED[str(job["id"])] = job
+    print(f"[AEC-LINK] job {job['id']} paused at {size // (1024 * 1024)} MiB", flush=True)
+    client.report_progress(job["id"], state="PAUSED")
+
+
+def _journal_part(job_id) -> Path | None:
+    entry = journal.entries().get(str(job_id))
+    return Path(entry["part"]) if entry and entry.get("part") else None
+
+
+def cancel_paused(job_id) -> bool:
+    """Cancel a job paused by ``toggle_worker(False)`` at once; False when it is not paused."""
+
+    with _PAUSED_LOCK:
+        job = _PAUSED.pop(str(job_id), None)
+    if job is None:
+        return False
+    _cancel_job(job, _journal_part(job_id))
+    return True
+
+
+def _resume_paused() -> None:
+    with _PAUSED_LOCK:
+        jobs = [job for job in _PAUSED.values() if not job.get("downloadGrant")]
+        private = [job for job in _PAUSED.values() if job.get("downloadGrant")]
+        _PAUSED.clear()
+        # a cancel arriving before enqueue_job() must still find them
+        for job in jobs:
+            cancellation.admit(job["id"])
+    for job in private:
+        # the grant may have expired while paused
+        print(f"[AEC-LINK] job {job['id']} was private; waiting for the server to re-dispatch it", flush=True)
+        _interrupt(job["id"], _journal_part(job["id"]), "Download interrupted by pause")
+    for job in jobs:
+        print(f"[AEC-LINK] resuming job {job['id']}", flush=True)
+        client.enqueue_job(job)
+
+
+def _process_job(job: dict) -> None:
+    priority.lower_current_thread()
+    reserved: Path | None = None
+    tmp_path: Path | None = None
+    token = cancellation.token_for(job["id"])
+    if not RUNNING.is_set():
+        # dequeued just as the worker was paused
+        token.cancel("paused")
+    try:
+        token.check()
+        ver = job["version"]
+        meta = ver.get("meta") or {}
+        url_raw = ver.get("externalDownloadUrl") or ver.get("filePath")
 
-            url_path = unquote(urlparse(url_raw).path)
+        if url_raw and not url_raw.startswith(("http://", "https://")):
+            from urllib.parse import urljoin
 
-            sha_server = ver.get("sha256")
-            try:
-                dst_dir = get_model_path(job["targetPath"])
-            except ValueError as exc:
-                client.report_progress(job["id"], state="ERROR", message=str(exc))
-                continue
-            dst_dir.mkdir(parents=True, exist_ok=True)
-            dst_path = dst_dir / Path(url_path).name
+            root = client.BASE_URL.split("/api/")[0].rstrip("/")
+            url_raw = urljoin(root + "/", url_raw.lstrip("/"))
 
-            raw_name = Path(url_path).name  # 6588bcd7_foo.safetensors
-            clean_name = _clean(raw_name)  # foo.safetensors
+        if not url_raw:
+            raise RuntimeError("No download URL provided by server")
 
-            #  foo.safetensors ,  foo_1.safetensors ,  foo_2
-            dst_path = _unique_filename(dst_dir, clean_name)
+        url_path = unquote(urlparse(url_raw).path)
 
-            dst_path.parent.mkdir(parents=True, exist_ok=True)
+        sha_server = ver.get("sha256")
+        try:
+            dst_dirs = model_paths_for_target(job["targetPath"])
+        except ValueError as exc:
+            client.report_progress(job["id"], state="ERROR", message=str(exc))
+            return
+        raw_name = Path(url_path).name  # 6588bcd7_foo.safetensors
+        clean_name = _clean(raw_name)  # foo.safetensors
+
+        # other folders to try, in order, when the chosen one runs out of room
+        fallbacks: list[Path] = []
+        with _TARGET_LOCK:
+            resumed = journal.resume_target(job["id"], sha_server, *dst_dirs)
+            if resumed:
+                dst_path, tmp_path = resumed
+                _RESERVED_TARGETS.add(dst_path)
+        if not resumed:
+            fallbacks = _rank_target_dirs(dst_dirs, _expected_size(ver))
+            dst_path, tmp_path = _claim_target(job["id"], fallbacks.pop(0), clean_name)
+        reserved = dst_path
+
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # the first scan may not have reached this folder yet
+        if sha_server and not _already_have(sha_server) and scan_in_progress():
+            _index_existing_copy(dst_path.parent / clean_name)
+
+        # same bytes elsewhere on disk?  link them into the requested folder
+        if sha_server and _place_local_copy(sha_server, dst_path):
+            _finish_job(job, meta, dst_path, sha_server)
+            return
 
-            # free-space guard
-            if not _enough_free_space(dst_path.parent):
-                client.report_progress(job["id"], state="ERROR", message=f"Less than {MIN_FREE_MB} MB free")
-                continue
+        # room for the whole file next to every other active download
+        while True:
+            try:
+                _reserve_job_space(job["id"], tmp_path, dst_path, _expected_size(ver))
+                break
+            except InsufficientSpace as exc:
+                if fallbacks:
+                    dst_path, tmp_path = _claim_target(job["id"], fallbacks.pop(0), clean_name, reserved)
+                    reserved = dst_path
+                    continue
+                # a .part resumed from the journal would be left unclaimed
+                tmp_path.unlink(missing_ok=True)
+                journal.remove(job["id"])
+                client.report_progress(job["id"], state="ERROR", message=str(exc))
+                return
 
-            # already have?
-            if sha_server and _already_have(sha_server):
-                client.report_progress(job["id"], state="DONE", progress=100)
-                continue
+        # already have?
+        if sha_server and _already_have(sha_server):
+            journal.remove(job["id"])
+            client.report_progress(job["id"], state="DONE", progress=100)
+            return
 
-            label = dst_path.name
+        label = dst_path.name
+
+        # download   tmp
+        journal.record(job, url=url_raw, target=dst_path, part=tmp_path, sha256=sha_server)
+        client.report_progress(job["id"], state="DOWNLOADING", progress=0)
+        _print_progress(label, 0)
+        last_progress = {"pct": 0, "ts": time.monotonic()}
+
+        def _progress_cb(frac: float):
+            pct = max(0, min(100, int(frac * 100)))
+            now = time.monotonic()
+            delta = pct - last_progress["pct"]
+            elapsed = now - last_progress["ts"]
+            if pct not in (0, 100) and delta < PROGRESS_MIN_STEP and elapsed < PROGRESS_MIN_INTERVAL:
+                return
+            last_progress["pct"] = pct
+            last_progress["ts"] = now
+            client.report_progress(job["id"], progress=pct)
+            _print_progress(label, pct)
+
+        request_headers, allow_redirects = _private_download_options(job, url_raw)
+        while True:
+            try:
+                # reads tmp_path and dst_path when called, so it follows a fallback
+                _download_with_retry(
+                    url_raw,
+                    tmp_path,
+                    _progress_cb,
+                    request_headers=request_headers,
+                    allow_redirects=allow_redirects,
+                    cancel=token,
+                    reserve=lambda total: _reserve_job_space(job["id"], tmp_path, dst_path, total),
+                )
+                break
+            except InsufficientSpace as exc:
+                # the Content-Length did not fit; the .part is gone, start over in the next folder
+                if not fallbacks:
+                    raise
+                _release_space(job["id"])
+                dst_path, tmp_path = _claim_target(job["id"], fallbacks.pop(0), clean_name, reserved)
+                reserved = dst_path
+                label = dst_path.name
+                print(f"[AEC-LINK] {exc}; trying {dst_path.parent}", flush=True)
+                journal.record(job, url=url_raw, target=dst_path, part=tmp_path, sha256=sha_server)
+        token.check()
+
+        # hash
+        sha_local = sha256_of_file(tmp_path, token)
+        if sha_server and sha_local != sha_server:
+            tmp_path.unlink(missing_ok=True)
+            raise RuntimeError("SHA-256 mismatch")
+
+        if move_file(tmp_path, dst_path, fsync=DOWNLOAD_FSYNC, cancel=token) == "copy":
+            print(f"[AEC-LINK] {dst_path.name} copied from staging", flush=True)
+        store.ingest(dst_path, sha_local)
+
+        _finish_job(job, meta, dst_path, sha_local)
+
+    except Cancelled as exc:
+        if tmp_path is None:
+            # stopped before this run chose its .part; a resumed job has one in the journal
+            tmp_path = _journal_part(job["id"])
+        if exc.reason == "paused":
+            _pause_job(job, tmp_path)
+        else:
+            _cancel_job(job, tmp_path)
+    except Exception as e:
+        print(f"[AEC-LINK] worker error: {e}")
+        journal.remove(job["id"])
+        client.report_progress(job["id"], state="ERROR", message=str(e))
+    finally:
+        cancellation.release(job["id"])
+        _release_space(job["id"])
+        if reserved is not None:
+            with _TARGET_LOCK:
+                _RESERVED_TARGETS.discard(reserved)
 
-            # download   tmp
-            tmp_path = dst_path.with_suffix(".part")
-            client.report_progress(job["id"], state="DOWNLOADING", progress=0)
-            _print_progress(label, 0)
-            last_progress = {"pct": 0, "ts": time.monotonic()}
 
-            def _progress_cb(frac: float):
-                pct = max(0, min(100, int(frac * 100)))
-                now = time.monotonic()
-                delta = pct - last_progress["pct"]
-                elapsed = now - last_progress["ts"]
-                if pct not in (0, 100) and delta < PROGRESS_MIN_STEP and elapsed < PROGRESS_MIN_INTERVAL:
-                    return
-                last_progress["pct"] = pct
-                last_progress["ts"] = now
-                client.report_progress(job["id"], progress=pct)
-                _print_progress(label, pct)
-
-            request_headers, allow_redirects = _private_download_options(job, url_raw)
-            _download_with_retry(
-                url_raw,
-                tmp_path,
-                _progress_cb,
-                request_headers=request_headers,
-                allow_redirects=allow_redirects,
-            )
+def _worker():
+    global _backend_ok
 
-            # hash
-            sha_local = sha256_of_file(tmp_path)
-            if sha_server and sha_local != sha_server:
-                tmp_path.unlink(missing_ok=True)
-                raise RuntimeError("SHA-256 mismatch")
+    priority.lower_current_thread()
+    last_hb = float("-inf")
+    while True:
+        RUNNING.wait()
+        if client._active_engine() is not None:
+            return
 
-            tmp_path.rename(dst_path)
+        _recover_once()
 
-            # side-cars
-            preview_name = _save_preview(meta.get("preview"), dst_path)
-            _write_info_json(meta, sha_local, preview_name, dst_path)
-            if _cfg.get("save_html_preview"):
-                _write_html(meta | {"sha256": sha_local}, preview_name, dst_path)
+        now = time.monotonic()
+        if now - last_hb >= HEARTBEAT_INTERVAL:
+            _heartbeat()
+            last_hb = now
 
-            # done
-            hashes = update_cached_hash(dst_path, sha_local)
-            _sync_inventory(hashes)
-            client.report_progress(job["id"], state="DONE", progress=100)
-            _print_progress(label)
+        try:
+            # wakes on job arrival, connection changes and toggle_worker(); the
+            # timeout only keeps the heartbeat on schedule
+            job = client.queue_next_job(timeout=last_hb + HEARTBEAT_INTERVAL - time.monotonic())
+
+            if job is None:
+                continue
 
-        except Exception as e:
-            print(f"[AEC-LINK] worker error: {e}")
-            client.report_progress(job["id"], state="ERROR", message=str(e))
-            time.sleep(SLEEP_AFTER_ERROR)
+            if not _backend_ok:
+                print("[AEC-LINK] connected")
+            _backend_ok = True
+        except Exception:
+            if _backend_ok:
+                print("[AEC-LINK] disconnected")
+            _backend_ok = False
+            client.wait_for_wakeup(SLEEP_AFTER_ERROR)
+            continue
+
+        _process_job(job)
 
 
 def toggle_worker(enable: bool):
@@ -375,38 +830,61 @@ def toggle_worker(enable: bool):
         RUNNING.set()
         _backend_ok = True
         print("[AEC-LINK] worker ENABLED", flush=True)
+        if client._active_engine() is None:
+            start_worker()
+        _resume_paused()
 
     elif not enable and RUNNING.is_set():
         _user_disabled = True
         RUNNING.clear()
         _backend_ok = False
+        cancellation.pause_all()
         print("[AEC-LINK] worker DISABLED by user", flush=True)
 
+    engine = client._active_engine()
+    if engine is not None:
+        engine.wake()
+    else:
+        client.wake_dispatcher()
+
 
 def start_worker():
-    threading.Thread(target=_worker, daemon=True).start()
+    global _worker_thread
+    with _WORKER_LOCK:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return
+        _worker_thread = threading.Thread(target=_worker, name="arcenciel-link-worker", daemon=True)
+        _worker_thread.start()
+
+
+def _inventory_pass() -> None:
+    priority.lower_current_thread()
+    list_model_hashes(on_batch=_sync_inventory)
+    _sync_inventory()
+    store.prune()
 
 
 def _inventory_worker():
     while True:
         try:
-            hashes = list_model_hashes()
-            _sync_inventory(hashes)
+            _inventory_pass()
         except Exception:
             pass
         time.sleep(3600)
 
 
 def schedule_inventory_push():
+    engine = client._active_engine()
+    if engine is not None:
+        engine.schedule_inventory()
+        return
     threading.Thread(target=_inventory_worker, daemon=True).start()
 
 
-start_worker()
-
-
 def generate_sidecars_for_existing():
     from .utils import _load_cache
 
+    priority.lower_current_thread()
     cache = _load_cache()
     model_files = {v["hash"]: Path(k) for k, v in cache.items() if Path(k).exists()}
     if not model_files:
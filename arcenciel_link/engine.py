@@ -0,0 +1,268 @@
+"""Optional single-event-loop transport engine.
+
+With ``"transport": "asyncio"`` one event loop thread multiplexes the
+WebSocket, the heartbeat and inventory timers and job dispatch, replacing the
+websocket-client runner, the polling worker and the inventory thread.  The
+WebSocket offers permessage-deflate, which websocket-client cannot negotiate.
+Downloads stay on ``requests`` streams, run concurrently in a small bounded
+pool owned by the loop.  Requires the optional ``websockets`` package.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from websockets.asyncio.client import connect as _ws_connect
+    from websockets.exceptions import ConnectionClosed
+except ImportError:  # pragma: no cover - optional dependency
+    _ws_connect = None
+
+INVENTORY_INTERVAL = 3600
+
+
+def is_available() -> bool:
+    return _ws_connect is not None
+
+
+class _EngineSocket:
+    """Thread-safe stand-in for ``websocket.WebSocketApp`` used by ``client``."""
+
+    def __init__(self, engine: AsyncEngine, ws) -> None:
+        self._engine = engine
+        self._ws = ws
+
+    def send(self, data, opcode=None) -> None:
+        # websockets picks text or binary frames from the payload type
+        self._engine.call(self._ws.send(data))
+
+    def close(self) -> None:
+        self._engine.call(self._ws.close())
+
+
+class AsyncEngine:
+    def __init__(self, max_downloads: int = 2, *, compression: bool = True) -> None:
+        self._max_downloads = max(1, int(max_downloads))
+        self._compression = compression
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._wake: asyncio.Event | None = None
+        self._jobs: asyncio.Queue | None = None
+        self._pool: ThreadPoolExecutor | None = None
+        # control messages touch config files and the keyring; one thread keeps them in order
+        self._control: ThreadPoolExecutor | None = None
+        self._stopping = False
+        self._inventory_scheduled = False
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="arcenciel-link-engine", daemon=True)
+        self._thread.start()
+        ready.wait(timeout=5)
+
+    def _run(self, ready: threading.Event) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._jobs = asyncio.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=self._max_downloads, thread_name_prefix="arcenciel-link-download")
+        self._control = ThreadPoolExecutor(max_workers=1, thread_name_prefix="arcenciel-link-control")
+        loop.create_task(self._connection_loop())
+        loop.create_task(self._dispatch_loop())
+        loop.create_task(self._heartbeat_loop())
+        ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._control.shutdown(wait=False, cancel_futures=True)
+            loop.close()
+
+    def stop(self) -> None:
+        self._stopping = True
+        if self._loop is not None and self._loop.is_running():
+            self.wake()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+    # thread-safe entry points -------------------------------------------------
+
+    def call(self, coro) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            coro.close()
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(coro)
+        else:
+            asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def wake(self) -> None:
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def submit_job(self, job: dict) -> None:
+        if self._loop is not None and self._jobs is not None:
+            self._loop.call_soon_threadsafe(self._jobs.put_nowait, job)
+
+    def spawn(self, fn, *args) -> None:
+        """Run a blocking callable on the loop's default executor."""
+
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.run_in_executor, None, fn, *args)
+
+    def schedule_inventory(self) -> None:
+        if self._loop is not None and not self._inventory_scheduled:
+            self._inventory_scheduled = True
+            self.call(self._inventory_loop())
+
+    # loop tasks ----------------------------------------------------------------
+
+    async def _sleep(self, timeout: float | None = None) -> None:
+        """Sleep until *timeout* elapses or ``wake()`` is called."""
+
+        assert self._wake is not None
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _connection_loop(self) -> None:
+        from . import client
+
+        loop = asyncio.get_running_loop()
+
+        def control(msg: dict) -> None:
+            loop.run_in_executor(self._control, client._handle_control, msg)
+
+        while not self._stopping:
+            if not client._socket_enabled:
+                client._debug("engine idle - connection disabled")
+                await self._sleep()
+                continue
+
+            if client._suspend_until:
+                remaining = client._suspend_until - time.monotonic()
+                if remaining > 0:
+                    if not client._suspend_notice_logged:
+                        print(f"[AEC-LINK] waiting {int(remaining)}s before reconnect...")
+                        client._suspend_notice_logged = True
+                    await self._sleep(remaining)
+                    continue
+                client._suspend_until = 0.0
+                client._suspend_notice_logged = False
+
+            url, headers, protocols = client._connection_params()
+            header_pairs = [tuple(item.split(": ", 1)) for item in headers]
+            code = None
+            reason = ""
+            adapter = None
+            try:
+                client._set_connection_state("connecting", f"[AEC-LINK] connecting to {client._display_target()}")
+                client._debug(f"engine connecting via {url}")
+                async with _ws_connect(
+                    url,
+                    additional_headers=header_pairs,
+                    subprotocols=protocols,
+                    compression="deflate" if self._compression else None,
+                    ping_interval=None,
+                ) as ws:
+                    adapter = _EngineSocket(self, ws)
+                    client._sock = adapter
+                    client._on_open(adapter)
+                    try:
+                        async for raw in ws:
+                            client._on_msg(adapter, raw, control)
+                    except ConnectionClosed:
+                        pass
+                    code, reason = ws.close_code, ws.close_reason or ""
+            except Exception as exc:
+                client._on_error(adapter, exc)
+            finally:
+                client._open_evt.clear()
+                client._sock = None
+            client._on_close(adapter, code, reason)
+            if not self._stopping:
+                await self._sleep(client._next_reconnect_delay())
+
+    async def _dispatch_loop(self) -> None:
+        from . import downloader
+
+        assert self._jobs is not None
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self._max_downloads)
+        while not downloader.RUNNING.is_set() and not self._stopping:
+            await self._sleep()
+        await loop.run_in_executor(None, downloader._recover_once)
+        while not self._stopping:
+            job = await self._jobs.get()
+            while not downloader.RUNNING.is_set() and not self._stopping:
+                await self._sleep()
+            await slots.acquire()
+            future = loop.run_in_executor(self._pool, downloader._process_job, job)
+            future.add_done_callback(lambda _f: slots.release())
+
+    async def _heartbeat_loop(self) -> None:
+        from . import client, downloader
+
+        while not self._stopping:
+            await asyncio.sleep(client.HEARTBEAT_INTERVAL)
+            if downloader.RUNNING.is_set():
+                downloader._heartbeat()
+
+    async def _inventory_loop(self) -> None:
+        from . import downloader
+
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            try:
+                await loop.run_in_executor(None, downloader._inventory_pass)
+            except Exception as exc:
+                print(f"[AEC-LINK] inventory pass failed: {exc}")
+            await asyncio.sleep(INVENTORY_INTERVAL)
+
+
+_engine: AsyncEngine | None = None
+
+
+def get_engine() -> AsyncEngine | None:
+    return _engine
+
+
+def start_engine(max_downloads: int = 2, *, compression: bool = True) -> AsyncEngine | None:
+    global _engine
+    if _engine is None:
+        if not is_available():
+            print("[AEC-LINK] asyncio transport needs the 'websockets' package; using threads", flush=True)
+            return None
+        _engine = AsyncEngine(max_downloads, compression=compression)
+        _engine.start()
+        print("[AEC-LINK] asyncio transport engine started", flush=True)
+    return _engine
+
+
+def stop_engine() -> None:
+    global _engine
+    if _engine is not None:
+        _engine.stop()
+        _engine = None
+
+
+atexit.register(stop_engine)
@@ -0,0 +1,219 @@
+"""Opt-in LRU eviction of models ArcEnCiel downloaded.
+
+With ``evict_lru`` enabled, a download that does not fit makes room by
+removing the least recently used models on the same filesystem that the link
+downloaded itself (``downloadedByLink`` in their ``.arcenciel.info``), or
+moving them below ``evict_cold_dir`` when that is set.  Models added by hand
+are never touched, even when sidecars were generated for them.
+
+Last use is the latest of the file's mtime, its atime and the last time the
+WebUI loaded it as a checkpoint (``on_model_loaded``, recorded in
+``last_used.json`` next to the hash cache so a worker subprocess sees it).
+Models used within ``evict_min_idle_hours`` are kept.
+"""
+
+from __future__ import annotations
+
+import errno
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from . import store, utils
+from .config import load
+from .inventory import INDEX
+
+SIDECAR_SUFFIXES = (".arcenciel.info", ".json", ".preview.png", ".arcenciel.html")
+
+_LOCK = threading.Lock()
+# models picked by plan() and not yet evicted, so concurrent jobs do not pick the same ones
+_CLAIMED: set[Path] = set()
+
+
+def enabled() -> bool:
+    return bool(load().get("evict_lru"))
+
+
+def _state_file() -> Path:
+    return utils.CACHE_DIR / "last_used.json"
+
+
+def _load_state() -> dict[str, float]:
+    try:
+        data = json.loads(_state_file().read_text())
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def touch(path: Path | str) -> None:
+    """Record that the model at *path* was used just now."""
+
+    key = os.path.realpath(path)
+    with _LOCK:
+        state = _load_state()
+        state[key] = time.time()
+        target = _state_file()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temporary = target.with_suffix(".json.tmp")
+        temporary.write_text(json.dumps(state, indent=2))
+        os.replace(temporary, target)
+
+
+def record_model_load(sd_model) -> None:
+    """``script_callbacks.on_model_loaded`` hook."""
+
+    filename = getattr(getattr(sd_model, "sd_checkpoint_info", None), "filename", None)
+    if filename:
+        try:
+            touch(filename)
+        except OSError as exc:
+            print(f"[AEC-LINK] could not record model use: {exc}")
+
+
+def register_callbacks() -> None:
+    if not enabled():
+        return
+    try:
+        from modules import script_callbacks
+    except ImportError:
+        return
+    if hasattr(script_callbacks, "on_model_loaded"):
+        script_callbacks.on_model_loaded(record_model_load)
+
+
+def _sidecars(path: Path) -> list[Path]:
+    stem = path.with_suffix("")
+    return [sidecar for sidecar in (Path(f"{stem}{suffix}") for suffix in SIDECAR_SUFFIXES) if sidecar.exists()]
+
+
+def _downloaded_by_link(path: Path) -> bool:
+    try:
+        info = json.loads(path.with_suffix(".arcenciel.info").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return isinstance(info, dict) and info.get("downloadedByLink") is True
+
+
+def _model_root(path: Path, roots: list[Path]) -> Path:
+    return next((root for root in roots if root in path.parents), path.parent)
+
+
+def candidates(dev: int) -> list[tuple[float, Path, Path, int]]:
+    """Models the link downloaded on device *dev* and idle long enough to evict.
+
+    Yields ``(last_used, path, model_root, size)``, least recently used first.
+    """
+
+    cfg = load()
+    root = utils._webui_root(cfg)
+    roots = utils._scan_roots(utils._get_model_dirs(root))
+    cutoff = time.time() - float(cfg.get("evict_min_idle_hours", 72)) * 3600
+    state = _load_state()
+    found = []
+    for path, st in utils._iter_model_files(root):
+        if st.st_dev != dev or not _downloaded_by_link(path):
+            continue
+        last_used = max(st.st_mtime, st.st_atime, state.get(str(path), 0.0))
+        if last_used <= cutoff:
+            found.append((last_used, path, _model_root(path, roots), st.st_blocks * 512))
+    found.sort(key=lambda item: item[0])
+    return found
+
+
+def _cold_dir() -> Path | None:
+    cfg = load()
+    return Path(cfg["evict_cold_dir"]) if cfg.get("evict_cold_dir") else None
+
+
+def _evict(path: Path, model_root: Path, cold_dir: Path | None) -> None:
+    hash_value = INDEX.hash_of(path)
+    sidecars = _sidecars(path)
+    if cold_dir is not None:
+        # keep the layout below the model folder and never replace what is already there
+        destination = cold_dir / model_root.name / path.relative_to(model_root)
+        for item in (path, *sidecars):
+            if destination.with_name(item.name).exists():
+                raise FileExistsError(errno.EEXIST, "already in evict_cold_dir", str(destination.with_name(item.name)))
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(path), str(destination))
+    else:
+        path.unlink()
+    # the model is gone; a failing sidecar below must not leave it in the cache or inventory
+    utils.forget_cached_hash(path)
+    for item in sidecars:
+        if cold_dir is not None:
+            shutil.move(str(item), str(destination.with_name(item.name)))
+        else:
+            item.unlink(missing_ok=True)
+    # the CAS copy would keep the blocks allocated
+    if hash_value and not INDEX.paths(hash_value):
+        obj = store.object_path(hash_value)
+        if obj is not None and obj.is_file() and obj.stat().st_nlink <= 1:
+            obj.unlink(missing_ok=True)
+
+
+def collect(directory: Path) -> list[tuple[float, Path, Path, int]]:
+    """Eviction candidates on *directory*'s filesystem, least recently used first.
+
+    Walks the whole model library, so callers must not hold a lock other
+    jobs wait on.
+    """
+
+    cold_dir = _cold_dir()
+    while not directory.exists() and directory.parent != directory:
+        directory = directory.parent
+    dev = os.stat(directory).st_dev
+    if cold_dir is not None and cold_dir.exists() and os.stat(cold_dir).st_dev == dev:
+        print("[AEC-LINK] evict_cold_dir is on the same disk; nothing to evict", flush=True)
+        return []
+    return candidates(dev)
+
+
+def plan(found: list[tuple[float, Path, Path, int]], needed: int) -> list[tuple[float, Path, Path, int]]:
+    """Claim enough of the *found* candidates to free *needed* bytes.
+
+    Skips models another job has claimed or that are gone already.  The
+    picked models stay claimed until ``evict()`` has handled them.  Returns
+    fewer models than needed, or none, when no more candidates are left.
+    """
+
+    victims = []
+    freed = 0
+    with _LOCK:
+        for victim in found:
+            if freed >= needed:
+                break
+            if victim[1] in _CLAIMED or not victim[1].exists():
+                continue
+            _CLAIMED.add(victim[1])
+            victims.append(victim)
+            freed += victim[3]
+    return victims
+
+
+def evict(victims: list[tuple[float, Path, Path, int]]) -> int:
+    """Remove or move away the models picked by ``plan()``; returns how many were evicted.
+
+    Callers re-check the free space afterwards.
+    """
+
+    cold_dir = _cold_dir()
+    evicted = 0
+    try:
+        for last_used, path, model_root, _size in victims:
+            try:
+                _evict(path, model_root, cold_dir)
+            except OSError as exc:
+                print(f"[AEC-LINK] could not evict {path.name}: {exc}", flush=True)
+                continue
+            evicted += 1
+            action = f"moved to {cold_dir}" if cold_dir is not None else "removed"
+            print(f"[AEC-LINK] {path.name} {action} to free space (unused since {time.ctime(last_used)})", flush=True)
+    finally:
+        with _LOCK:
+            _CLAIMED.difference_update(victim[1] for victim in victims)
+    return evicted
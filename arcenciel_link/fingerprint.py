@@ -0,0 +1,51 @@
+"""Fast provisional model identity.
+
+A fingerprint covers the file size, the safetensors header (or the first MiB
+of GGUF and pickle files, where their metadata lives) and a few blocks
+sampled across the tensor data, so it costs a handful of reads regardless of
+file size.  It identifies files that are still waiting for their full
+SHA-256, but it is never published as a model hash: an in-place rewrite of
+the same size can keep every sampled block.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import struct
+from pathlib import Path
+
+BLOCK_SIZE = 64 * 1024
+SAMPLE_BLOCKS = 8
+PREFIX_SIZE = 1024 * 1024
+HEADER_LIMIT = 100 * 1024 * 1024
+_SAFETENSORS_EXTS = {".safetensors", ".sft"}
+
+
+def _header_length(f, path: Path, size: int) -> int:
+    if path.suffix.lower() in _SAFETENSORS_EXTS:
+        raw = f.read(8)
+        if len(raw) == 8:
+            length = struct.unpack("<Q", raw)[0]
+            if 0 < length <= min(HEADER_LIMIT, size - 8):
+                return 8 + length
+    return min(size, PREFIX_SIZE)
+
+
+def fingerprint(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        h.update(size.to_bytes(8, "little"))
+        header = _header_length(f, path, size)
+        f.seek(0)
+        h.update(f.read(header))
+        remaining = size - header
+        if remaining <= BLOCK_SIZE * SAMPLE_BLOCKS:
+            h.update(f.read())
+        else:
+            # evenly spaced blocks; the last one ends at EOF
+            for i in range(SAMPLE_BLOCKS):
+                f.seek(header + (remaining - BLOCK_SIZE) * i // (SAMPLE_BLOCKS - 1))
+                h.update(f.read(BLOCK_SIZE))
+    return h.hexdigest()
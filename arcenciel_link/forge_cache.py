@@ -0,0 +1,182 @@
+"""Share full SHA-256 values with the WebUI's own ``cache.json``.
+
+Forge/A1111 keep file hashes in the ``hashes`` section of ``cache.json``,
+titled ``checkpoint/<path relative to the checkpoint dir>``, ``lora/<stem>``
+or ``textual_inversion/<stem>`` and stamped with the file mtime.  Entries are
+trusted the same way the WebUI trusts them: only while the file on disk is
+not newer than the recorded mtime.  ``hashes-addnet`` is ignored because it
+stores hashes of the tensor payload, not of the file.
+
+The WebUI keeps that cache in memory and rewrites the file from it, so inside
+the WebUI both sides go through ``modules.cache``; a worker subprocess hands
+its hashes to the WebUI process, and only headless mode touches the file.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List
+
+_SECTION = "hashes"
+_HEX_DIGEST = re.compile(r"^[0-9a-fA-F]{64}$")
+_TITLE_PREFIXES = {"checkpoint": "checkpoint", "lora": "lora", "embedding": "textual_inversion"}
+
+# set in the worker subprocess: passes (path, mtime, sha256) entries on to the WebUI process
+FORWARD: Callable[[List[tuple[str, float, str]]], None] | None = None
+
+
+def cache_file(webui_root: Path) -> Path:
+    override = os.getenv("SD_WEBUI_CACHE_FILE")
+    return Path(override) if override else webui_root / "cache.json"
+
+
+def _read(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _webui_cache():
+    try:
+        from modules import cache
+    except ImportError:
+        return None
+    return cache if hasattr(cache, "cache") and hasattr(cache, "dump_cache") else None
+
+
+def _classify(path: Path, dirs_by_kind: Dict[str, List[Path]]) -> tuple[str, Path] | None:
+    best: tuple[str, Path] | None = None
+    for kind, roots in dirs_by_kind.items():
+        if kind not in _TITLE_PREFIXES:
+            continue
+        for root in roots:
+            real = Path(os.path.realpath(root))
+            if real in path.parents and (best is None or len(real.parts) > len(best[1].parts)):
+                best = (kind, real)
+    return best
+
+
+def _relative(path: Path, kind: str, root: Path) -> str:
+    return os.path.relpath(path, root) if kind == "checkpoint" else path.stem
+
+
+def _title(path: Path, kind: str, root: Path) -> str:
+    return f"{_TITLE_PREFIXES[kind]}/{_relative(path, kind, root)}"
+
+
+def _titles(path: Path, kind: str, root: Path) -> List[str]:
+    # the WebUI writes native separators; accept either when reading
+    rel = _relative(path, kind, root)
+    variants = (rel, rel.replace("\\", "/"), rel.replace("/", "\\"))
+    return [f"{_TITLE_PREFIXES[kind]}/{variant}" for variant in dict.fromkeys(variants)]
+
+
+def seed_hashes(
+    files: Iterable[tuple[Path, os.stat_result]],
+    dirs_by_kind: Dict[str, List[Path]],
+    webui_root: Path,
+    scanned: Iterable[str | Path] | None = None,
+) -> Dict[str, str]:
+    """Return ``{path: sha256}`` for *files* the WebUI has already hashed.
+
+    *scanned* lists every model file found, hashed or not; stems are only
+    trusted when they are unique among those.
+    """
+
+    webui_cache = _webui_cache()
+    section = webui_cache.cache(_SECTION) if webui_cache else _read(cache_file(webui_root)).get(_SECTION)
+    if not isinstance(section, dict) or not section:
+        return {}
+    files = list(files)
+    # stem titles are ambiguous when two files share a stem
+    names = scanned if scanned is not None else (path for path, _st in files)
+    stems = Counter(Path(name).stem for name in names)
+    found: Dict[str, str] = {}
+    for path, st in files:
+        located = _classify(path, dirs_by_kind)
+        if located is None:
+            continue
+        kind, root = located
+        if kind != "checkpoint" and stems[path.stem] > 1:
+            continue
+        for title in _titles(path, kind, root):
+            entry = section.get(title)
+            if not isinstance(entry, dict):
+                continue
+            sha256 = str(entry.get("sha256") or "")
+            try:
+                mtime = float(entry.get("mtime") or 0)
+            except (TypeError, ValueError):
+                continue
+            if _HEX_DIGEST.fullmatch(sha256) and st.st_mtime <= mtime:
+                found[str(path)] = sha256.lower()
+                break
+    return found
+
+
+def _merge(section: dict, entries: List[tuple[Path, float, str]], dirs_by_kind: Dict[str, List[Path]]) -> int:
+    stems = Counter(model.stem for model, _mtime, _sha in entries)
+    added = 0
+    for model, mtime, sha256 in entries:
+        located = _classify(model, dirs_by_kind)
+        if located is None or (located[0] != "checkpoint" and stems[model.stem] > 1):
+            continue
+        title = _title(model, *located)
+        current = section.get(title)
+        if isinstance(current, dict) and current.get("sha256") == sha256 and current.get("mtime", 0) >= mtime:
+            continue
+        section[title] = {"mtime": mtime, "sha256": sha256}
+        added += 1
+    return added
+
+
+def write_back(
+    entries: Iterable[tuple[Path, float, str]],
+    dirs_by_kind: Dict[str, List[Path]],
+    webui_root: Path,
+) -> int:
+    """Add our ``(path, mtime, sha256)`` hashes to the WebUI cache so it does not rehash them.
+
+    Inside the WebUI they are merged into its in-memory cache and saved with
+    its own ``dump_cache()``; in the worker subprocess they are forwarded
+    to the WebUI process.  Only in headless mode, with no WebUI holding the
+    cache, is ``cache.json`` rewritten directly.
+    """
+
+    entries = list(entries)
+    webui_cache = _webui_cache()
+    if webui_cache is None and FORWARD is not None:
+        if entries:
+            FORWARD([(str(model), mtime, sha256) for model, mtime, sha256 in entries])
+        return 0
+    if webui_cache is not None:
+        added = _merge(webui_cache.cache(_SECTION), entries, dirs_by_kind)
+        if added:
+            webui_cache.dump_cache()
+        return added
+
+    path = cache_file(webui_root)
+    if not path.parent.is_dir():
+        return 0
+    data = _read(path)
+    section = data.get(_SECTION)
+    if not isinstance(section, dict):
+        section = {}
+    added = _merge(section, entries, dirs_by_kind)
+    if not added:
+        return 0
+    data[_SECTION] = section
+    temporary = path.with_name(path.name + ".aec.tmp")
+    try:
+        temporary.write_text(json.dumps(data, indent=4, ensure_ascii=False), encoding="utf-8")
+        os.replace(temporary, path)
+    except OSError:
+        temporary.unlink(missing_ok=True)
+        return 0
+    return added
@@ -0,0 +1,138 @@
+"""Thread-safe in-memory index of local model hashes.
+
+The index maps path -> digest and digest -> paths with raw 32-byte digests,
+so adding or removing one file is O(1).  Subscribers receive the hex digests
+that appeared in or vanished from the inventory after every change.
+"""
+
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Set
+
+Listener = Callable[[List[str], List[str]], None]
+
+
+def _digest(hash_value: str) -> bytes | None:
+    if not hash_value or len(hash_value) != 64:
+        return None
+    try:
+        return bytes.fromhex(hash_value)
+    except ValueError:
+        return None
+
+
+class InventoryIndex:
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._by_path: Dict[str, bytes] = {}
+        self._by_hash: Dict[bytes, Set[str]] = {}
+        self._listeners: List[Listener] = []
+
+    def subscribe(self, listener: Listener) -> Callable[[], None]:
+        with self._lock:
+            self._listeners.append(listener)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+
+        return unsubscribe
+
+    def _notify(self, added: List[str], removed: List[str]) -> None:
+        if not added and not removed:
+            return
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(added, removed)
+            except Exception as exc:
+                print(f"[AEC-LINK] inventory listener failed: {exc}")
+
+    def _add_locked(self, key: str, digest: bytes, added: List[str], removed: List[str]) -> None:
+        previous = self._by_path.get(key)
+        if previous == digest:
+            return
+        if previous is not None:
+            self._remove_locked(key, removed)
+        self._by_path[key] = digest
+        paths = self._by_hash.setdefault(digest, set())
+        if not paths:
+            added.append(digest.hex())
+        paths.add(key)
+
+    def _remove_locked(self, key: str, removed: List[str]) -> None:
+        digest = self._by_path.pop(key, None)
+        if digest is None:
+            return
+        paths = self._by_hash.get(digest)
+        if paths is not None:
+            paths.discard(key)
+            if not paths:
+                del self._by_hash[digest]
+                removed.append(digest.hex())
+
+    def add(self, path: Path | str, hash_value: str) -> None:
+        digest = _digest(hash_value)
+        if digest is None:
+            return
+        added: List[str] = []
+        removed: List[str] = []
+        with self._lock:
+            self._add_locked(str(path), digest, added, removed)
+        self._notify(added, removed)
+
+    def remove(self, path: Path | str) -> None:
+        removed: List[str] = []
+        with self._lock:
+            self._remove_locked(str(path), removed)
+        self._notify([], removed)
+
+    def update(self, entries: Iterable[tuple[str, str]], *, prune: bool = False) -> None:
+        """Add ``(path, hash)`` pairs; with *prune*, drop every path not listed."""
+
+        added: List[str] = []
+        removed: List[str] = []
+        with self._lock:
+            seen: Set[str] = set()
+            for key, hash_value in entries:
+                digest = _digest(hash_value)
+                if digest is None:
+                    continue
+                seen.add(key)
+                self._add_locked(key, digest, added, removed)
+            if prune:
+                for key in [key for key in self._by_path if key not in seen]:
+                    self._remove_locked(key, removed)
+        # a hash that moved between paths is neither added nor removed
+        both = set(added) & set(removed)
+        self._notify([h for h in added if h not in both], [h for h in removed if h not in both])
+
+    def contains(self, hash_value: str | None) -> bool:
+        digest = _digest(hash_value or "")
+        with self._lock:
+            return digest is not None and digest in self._by_hash
+
+    def paths(self, hash_value: str) -> List[Path]:
+        digest = _digest(hash_value)
+        with self._lock:
+            return [Path(key) for key in self._by_hash.get(digest, ())] if digest else []
+
+    def hash_of(self, path: Path | str) -> str | None:
+        with self._lock:
+            digest = self._by_path.get(str(path))
+        return digest.hex() if digest else None
+
+    def hashes(self) -> List[str]:
+        with self._lock:
+            return [digest.hex() for digest in self._by_hash]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._by_hash)
+
+
+INDEX = InventoryIndex()
@@ -0,0 +1,343 @@
+"""Optional worker subprocess.
+
+With ``"worker_process": true`` the WebSocket client, downloader, hashing and
+inventory run in a separate Python interpreter, so they neither share the
+GIL with Gradio and inference code nor the WebUI's core.  ``startup()``
+launches it with ``python -m arcenciel_link.isolation`` and the two sides
+talk over an authenticated local ``multiprocessing.connection`` channel:
+
+* parent -> child: the WebUI's model folder options once, busy state
+  changes, and control requests (worker state, credentials, sidecars,
+  manifests, status);
+* child -> parent: one reply per request, and newly computed hashes for the
+  WebUI's ``cache.json``, which only the WebUI process may write.
+
+Download progress is reported to the server by the child and printed to the
+console it inherits from the WebUI.  A child that exits on its own is
+restarted after ``RESTART_DELAY`` seconds, up to ``MAX_RESTARTS`` times in a
+row; after that the WebUI has to be restarted.
+"""
+
+from __future__ import annotations
+
+import atexit
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+ADDRESS_ENV = "ARCENCIEL_LINK_IPC_ADDRESS"
+AUTHKEY_ENV = "ARCENCIEL_LINK_IPC_AUTHKEY"
+CONNECT_TIMEOUT = 20
+CALL_TIMEOUT = 10
+RESTART_DELAY = 5
+MAX_RESTARTS = 3
+# a child that ran this long before exiting resets the restart count
+RESTART_WINDOW = 60
+
+
+class WorkerUnavailable(RuntimeError):
+    """The worker process is not running or did not answer in time."""
+
+
+class WorkerProcess:
+    """Parent-side handle for the worker subprocess."""
+
+    def __init__(self) -> None:
+        self._proc: subprocess.Popen | None = None
+        self._conn = None
+        self._send_lock = threading.Lock()
+        self._replies: dict[int, dict] = {}
+        # ids of calls still waiting; replies to any other id are dropped
+        self._waiting: set[int] = set()
+        self._replied = threading.Condition()
+        self._ids = itertools.count(1)
+        self._connected = threading.Event()
+        self._closed = threading.Event()
+        self._stopping = threading.Event()
+        self._cmd_opts: dict = {}
+        self._started_at = 0.0
+        self._restarts = 0
+
+    def start(self, cmd_opts: dict) -> None:
+        self._cmd_opts = cmd_opts
+        self._started_at = time.monotonic()
+        self._connected = threading.Event()
+        self._closed = threading.Event()
+        authkey = os.urandom(32)
+        listener = Listener(("127.0.0.1", 0), authkey=authkey)
+        host, port = listener.address
+        env = dict(os.environ)
+        env[ADDRESS_ENV] = f"{host}:{port}"
+        env[AUTHKEY_ENV] = authkey.hex()
+        package_parent = str(Path(__file__).resolve().parent.parent)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, (package_parent, env.get("PYTHONPATH"))))
+        self._proc = subprocess.Popen([sys.executable, "-m", "arcenciel_link.isolation"], env=env)
+        threading.Thread(target=self._serve, args=(listener, cmd_opts), name="arcenciel-link-ipc", daemon=True).start()
+        threading.Thread(
+            target=self._watch_busy, args=(self._connected, self._closed), name="arcenciel-link-busy", daemon=True
+        ).start()
+
+    def _serve(self, listener: Listener, cmd_opts: dict) -> None:
+        # the child connects right away; stop waiting if it never does
+        watchdog = threading.Timer(CONNECT_TIMEOUT, lambda: self._connected.is_set() or listener.close())
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            self._conn = listener.accept()
+        except Exception as exc:
+            print(f"[AEC-LINK] worker process did not connect: {exc}", flush=True)
+            self._closed.set()
+            return
+        finally:
+            watchdog.cancel()
+            listener.close()
+        self.send({"type": "init", "cmd_opts": cmd_opts})
+        self._connected.set()
+        try:
+            while True:
+                message = self._conn.recv()
+                if message.get("type") == "forge_hashes":
+                    self._share_hashes(message.get("entries") or [])
+                    continue
+                with self._replied:
+                    if message.get("id") in self._waiting:
+                        self._replies[message["id"]] = message
+                        self._replied.notify_all()
+        except (EOFError, OSError):
+            pass
+        finally:
+            self._closed.set()
+            with self._replied:
+                self._replied.notify_all()
+        if self._proc is None or self._stopping.is_set():
+            return
+        try:
+            self._proc.wait(timeout=CONNECT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            # the channel is gone, so the child is of no use any more
+            self._proc.kill()
+            self._proc.wait()
+        print(f"[AEC-LINK] worker process exited with code {self._proc.returncode}", flush=True)
+        self._restart()
+
+    def _restart(self) -> None:
+        if time.monotonic() - self._started_at > RESTART_WINDOW:
+            self._restarts = 0
+        if self._restarts >= MAX_RESTARTS:
+            print("[AEC-LINK] worker process keeps exiting; restart the WebUI to try again", flush=True)
+            return
+        self._restarts += 1
+        if self._stopping.wait(RESTART_DELAY):
+            return
+        print("[AEC-LINK] restarting worker process", flush=True)
+        self.start(self._cmd_opts)
+
+    @staticmethod
+    def _share_hashes(entries: list) -> None:
+        # the WebUI's hash cache lives in this process
+        from . import forge_cache, utils
+        from .config import load
+
+        try:
+            root = utils._webui_root(load())
+            forge_cache.write_back(
+                ((Path(path), mtime, sha256) for path, mtime, sha256 in entries),
+                utils._get_model_dirs_by_kind(root),
+                root,
+            )
+        except Exception as exc:
+            print(f"[AEC-LINK] could not share hashes with the WebUI cache: {exc}", flush=True)
+
+    def _watch_busy(self, connected: threading.Event, closed: threading.Event) -> None:
+        from . import busy
+
+        last = None
+        while not closed.is_set():
+            if connected.is_set():
+                current = busy.forge_state_probe()
+                if current != last:
+                    try:
+                        self.send({"type": "busy", "value": current})
+                        last = current
+                    except OSError:
+                        return
+            time.sleep(busy.PROBE_TTL)
+
+    def send(self, message: dict) -> None:
+        with self._send_lock:
+            self._conn.send(message)
+
+    def call(self, action: str, timeout: float = CALL_TIMEOUT, **params) -> dict:
+        """Run *action* in the worker process and return its result."""
+
+        if not self._connected.wait(timeout) or self._closed.is_set():
+            raise WorkerUnavailable("worker process is not running")
+        request_id = next(self._ids)
+        with self._replied:
+            self._waiting.add(request_id)
+        try:
+            try:
+                self.send({"type": "call", "id": request_id, "action": action, "params": params})
+            except OSError as exc:
+                raise WorkerUnavailable("worker process is not running") from exc
+            deadline = time.monotonic() + timeout
+            with self._replied:
+                while request_id not in self._replies:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._closed.is_set():
+                        raise WorkerUnavailable(f"worker process did not answer {action!r}")
+                    self._replied.wait(remaining)
+                reply = self._replies.pop(request_id)
+        finally:
+            with self._replied:
+                self._waiting.discard(request_id)
+                self._replies.pop(request_id, None)
+        if reply.get("error"):
+            raise (ValueError if reply.get("invalid") else RuntimeError)(reply["error"])
+        return reply.get("result") or {}
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._conn is not None and not self._closed.is_set():
+            try:
+                self.send({"type": "stop"})
+            except OSError:
+                pass
+        if self._proc is not None:
+            try:
+                self._proc.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                self._proc.terminate()
+        if self._conn is not None:
+            self._conn.close()
+
+
+_worker_process: WorkerProcess | None = None
+
+
+def get_worker_process() -> WorkerProcess | None:
+    return _worker_process
+
+
+def start_worker_process() -> WorkerProcess:
+    global _worker_process
+    if _worker_process is None:
+        from .utils import _cmd_opts
+
+        _worker_process = WorkerProcess()
+        _worker_process.start(_cmd_opts())
+        print("[AEC-LINK] worker process started", flush=True)
+    return _worker_process
+
+
+def stop_worker_process() -> None:
+    global _worker_process
+    if _worker_process is not None:
+        _worker_process.stop()
+        _worker_process = None
+
+
+def worker_online() -> bool:
+    if _worker_process is None:
+        from .downloader import RUNNING
+
+        return RUNNING.is_set()
+    try:
+        return bool(_worker_process.call("status").get("running"))
+    except RuntimeError:
+        return False
+
+
+atexit.register(stop_worker_process)
+
+
+# child side --------------------------------------------------------------------
+
+
+def _wait_running(enabled: bool) -> bool:
+    from .downloader import RUNNING
+
+    deadline = time.monotonic() + 3
+    while enabled and not RUNNING.is_set() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return RUNNING.is_set()
+
+
+def _handle(action: str, params: dict) -> dict:
+    from . import client, manifest
+
+    if action == "status":
+        return {"running": _wait_running(False)}
+    if action == "apply_worker_state":
+        client.apply_worker_state(params["enable"], link_key=params.get("link_key"))
+        return {"running": _wait_running(params["enable"])}
+    if action == "update_credentials":
+        client.update_credentials(**params)
+        return {}
+    if action == "generate_sidecars":
+        from .downloader import generate_sidecars_for_existing
+
+        threading.Thread(target=generate_sidecars_for_existing, daemon=True).start()
+        return {}
+    if action == "manifest_export":
+        return manifest.export_manifest(manifest._read_key(None))
+    if action == "manifest_import":
+        return manifest.import_manifest(params["manifest"], manifest._read_key(None))
+    raise ValueError(f"unknown action {action!r}")
+
+
+def main() -> None:
+    host, _, port = os.environ.pop(ADDRESS_ENV).rpartition(":")
+    authkey = bytes.fromhex(os.environ.pop(AUTHKEY_ENV))
+    conn = Client((host, int(port)), authkey=authkey)
+    send_lock = threading.Lock()
+    busy_flag = threading.Event()
+
+    def reply(request_id: int, action: str, params: dict) -> None:
+        try:
+            message = {"id": request_id, "result": _handle(action, params)}
+        except Exception as exc:
+            message = {"id": request_id, "error": str(exc), "invalid": isinstance(exc, ValueError)}
+        with send_lock:
+            conn.send(message)
+
+    def forward_hashes(entries: list) -> None:
+        with send_lock:
+            conn.send({"type": "forge_hashes", "entries": entries})
+
+    init = conn.recv()
+    from . import _start_link_services, busy, forge_cache, utils
+    from .config import load
+
+    utils._CMD_OPTS_OVERRIDE = init.get("cmd_opts") or None
+    forge_cache.FORWARD = forward_hashes
+    busy.set_probe(busy_flag.is_set)
+    _start_link_services(load())
+
+    try:
+        while True:
+            message = conn.recv()
+            kind = message.get("type")
+            if kind == "stop":
+                break
+            if kind == "busy" and message.get("value"):
+                busy_flag.set()
+            elif kind == "busy":
+                busy_flag.clear()
+            elif kind == "call":
+                threading.Thread(
+                    target=reply,
+                    args=(message["id"], message["action"], message.get("params") or {}),
+                    daemon=True,
+                ).start()
+    except (EOFError, OSError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
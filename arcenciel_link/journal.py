@@ -0,0 +1,161 @@
+"""On-disk journal of accepted download jobs.
+
+Each accepted job is recorded with its URL, destination, ``.part`` path and
+expected hash, so a restarted worker can resume the transfer or tell the
+server what happened to it.  The ``.part`` size is the resume offset, so
+progress is not written here.  Every ``.part`` path ever recorded is also
+kept in ``parts.json`` until the file is gone, so the restart sweep removes
+only partial files this worker created.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+
+from . import utils
+
+_LOCK = threading.Lock()
+_ENTRIES: dict[str, dict] | None = None
+_PARTS: set[str] | None = None
+
+_SECRET_JOB_KEYS = ("downloadGrant",)
+
+
+def _journal_file() -> Path:
+    return utils.CACHE_DIR / "jobs.json"
+
+
+def _load() -> dict[str, dict]:
+    global _ENTRIES
+    if _ENTRIES is None:
+        try:
+            data = json.loads(_journal_file().read_text())
+            _ENTRIES = data if isinstance(data, dict) else {}
+        except Exception:
+            _ENTRIES = {}
+    return _ENTRIES
+
+
+def _flush() -> None:
+    path = _journal_file()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(".json.tmp")
+    temporary.write_text(json.dumps(_ENTRIES or {}, indent=2))
+    os.replace(temporary, path)
+
+
+def _parts_file() -> Path:
+    return utils.CACHE_DIR / "parts.json"
+
+
+def _load_parts() -> set[str]:
+    global _PARTS
+    if _PARTS is None:
+        try:
+            data = json.loads(_parts_file().read_text())
+            _PARTS = {str(item) for item in data} if isinstance(data, list) else set()
+        except Exception:
+            _PARTS = set()
+    return _PARTS
+
+
+def _flush_parts() -> None:
+    path = _parts_file()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(".json.tmp")
+    temporary.write_text(json.dumps(sorted(_PARTS or ()), indent=2))
+    os.replace(temporary, path)
+
+
+def _public_job(job: dict) -> dict:
+    return {key: value for key, value in job.items() if key not in _SECRET_JOB_KEYS}
+
+
+def record(job: dict, *, url: str, target: Path, part: Path, sha256: str | None) -> None:
+    with _LOCK:
+        entries = _load()
+        entries[str(job["id"])] = {
+            "url": url,
+            "target": str(target),
+            "part": str(part),
+            "sha256": sha256,
+            "state": "DOWNLOADING",
+            "private": bool(job.get("downloadGrant")),
+            "job": _public_job(job),
+        }
+        _flush()
+        parts = _load_parts()
+        if os.path.realpath(part) not in parts:
+            parts.add(os.path.realpath(part))
+            _flush_parts()
+
+
+def update(job_id, **fields) -> None:
+    with _LOCK:
+        entry = _load().get(str(job_id))
+        if entry is None:
+            return
+        entry.update(fields)
+        _flush()
+
+
+def remove(job_id) -> None:
+    with _LOCK:
+        if _load().pop(str(job_id), None) is not None:
+            _flush()
+
+
+def entries() -> dict[str, dict]:
+    with _LOCK:
+        return {key: dict(value) for key, value in _load().items()}
+
+
+def resume_target(job_id, sha256: str | None, *target_dirs: Path) -> tuple[Path, Path] | None:
+    """Return ``(target, part)`` recorded for this job or an interrupted twin.
+
+    A journalled job keeps its destination across restarts, and a job the
+    server re-dispatched for the same model and folder (any of *target_dirs*)
+    adopts the ``.part`` an interrupted private transfer left behind.
+    """
+
+    with _LOCK:
+        current = _load()
+        entry = current.get(str(job_id))
+        if entry is not None:
+            return Path(entry["target"]), Path(entry["part"])
+        if not sha256:
+            return None
+        for key, entry in list(current.items()):
+            if entry.get("state") != "INTERRUPTED" or entry.get("sha256") != sha256:
+                continue
+            target = Path(entry["target"])
+            if target.parent not in target_dirs or target.exists():
+                continue
+            del current[key]
+            _flush()
+            return target, Path(entry["part"])
+    return None
+
+
+def claimed_parts() -> set[str]:
+    with _LOCK:
+        return {os.path.realpath(entry["part"]) for entry in _load().values() if entry.get("part")}
+
+
+def known_parts() -> set[str]:
+    """Real paths of every ``.part`` a job was ever recorded with and not yet forgotten."""
+
+    with _LOCK:
+        return set(_load_parts())
+
+
+def forget_parts(paths) -> None:
+    with _LOCK:
+        parts = _load_parts()
+        gone = parts.intersection(paths)
+        if gone:
+            parts.difference_update(gone)
+            _flush_parts()
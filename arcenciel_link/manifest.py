@@ -0,0 +1,181 @@
+"""Export and import hash manifests for provisioning identical model libraries.
+
+A manifest lists ``path, size, mtime_ns, sha256`` for every model file whose
+cached hash is current.  Paths below the WebUI root are stored relative to
+it, so a library rsynced to another node under a different root still
+matches.  The entry list is protected by a SHA-256 checksum and, when a key
+is available (``--key-file`` or ``ARCENCIEL_MANIFEST_KEY``), an HMAC-SHA256
+signature that importing nodes then require.  An imported hash is only
+trusted for a file inside one of the model folders whose size and
+``mtime_ns`` match the manifest exactly.
+
+    python -m arcenciel_link.manifest export library.json
+    python -m arcenciel_link.manifest import library.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from . import utils
+from .inventory import INDEX
+
+MANIFEST_VERSION = 1
+KEY_ENV = "ARCENCIEL_MANIFEST_KEY"
+
+
+def _canonical(entries: List[Dict]) -> bytes:
+    return json.dumps(entries, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _signature(entries: List[Dict], key: bytes) -> str:
+    return hmac.new(key, _canonical(entries), hashlib.sha256).hexdigest()
+
+
+def _root() -> Path:
+    from .config import load
+
+    return Path(os.path.realpath(utils._webui_root(load())))
+
+
+def _portable(path: Path, root: Path) -> str:
+    try:
+        return path.relative_to(root).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def _local(path: str, root: Path, model_dirs: List[Path]) -> Path:
+    """Resolve a manifest path, raising ``ValueError`` unless it lies inside a model folder."""
+
+    candidate = Path(path)
+    resolved = Path(os.path.realpath(candidate if candidate.is_absolute() else root / candidate))
+    if not any(base in resolved.parents for base in model_dirs):
+        raise ValueError(f"{path} is outside the model folders")
+    return resolved
+
+
+def export_manifest(key: bytes | None = None) -> Dict:
+    """Build a manifest from every cache entry that still matches its file."""
+
+    root = _root()
+    with utils._CACHE_LOCK:
+        cache = dict(utils._ensure_cache())
+    entries: List[Dict] = []
+    for key_path, entry in sorted(cache.items()):
+        if not entry.get("hash"):
+            continue
+        try:
+            st = os.stat(key_path)
+        except OSError:
+            continue
+        if entry.get("mtime") != int(st.st_mtime) or entry.get("size", st.st_size) != st.st_size:
+            continue
+        item = {
+            "path": _portable(Path(key_path), root),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": entry["hash"],
+        }
+        entries.append(item)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "created": int(time.time()),
+        "entries": entries,
+        "checksum": hashlib.sha256(_canonical(entries)).hexdigest(),
+    }
+    if key:
+        manifest["hmac"] = _signature(entries, key)
+    return manifest
+
+
+def verify_manifest(manifest: Dict, key: bytes | None = None) -> List[Dict]:
+    """Return the manifest entries, raising ``ValueError`` when it fails verification."""
+
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError("unsupported manifest version")
+    entries = manifest.get("entries")
+    if not isinstance(entries, list):
+        raise ValueError("manifest has no entry list")
+    if not hmac.compare_digest(str(manifest.get("checksum") or ""), hashlib.sha256(_canonical(entries)).hexdigest()):
+        raise ValueError("manifest checksum mismatch")
+    if key and not hmac.compare_digest(str(manifest.get("hmac") or ""), _signature(entries, key)):
+        raise ValueError("manifest signature missing or invalid")
+    return entries
+
+
+def import_manifest(manifest: Dict, key: bytes | None = None) -> Dict[str, int]:
+    """Adopt hashes for local files whose size and mtime_ns match the manifest."""
+
+    entries = verify_manifest(manifest, key)
+    root = _root()
+    model_dirs = [Path(os.path.realpath(directory)) for directory in utils._get_model_dirs(root)]
+    adopted: List[tuple[str, str]] = []
+    skipped = 0
+    with utils._CACHE_LOCK:
+        cache = utils._ensure_cache()
+        for item in entries:
+            try:
+                path = _local(str(item["path"]), root, model_dirs)
+                sha256 = str(item["sha256"]).lower()
+                st = path.stat()
+                matches = st.st_size == int(item["size"]) and st.st_mtime_ns == int(item["mtime_ns"])
+            except (KeyError, TypeError, ValueError, OSError):
+                skipped += 1
+                continue
+            if not matches or len(sha256) != 64:
+                skipped += 1
+                continue
+            cache[str(path)] = utils._cache_entry(st, sha256)
+            utils._PENDING.pop(str(path), None)
+            adopted.append((str(path), sha256))
+        if adopted:
+            utils._save_cache(cache)
+    INDEX.update(adopted)
+    return {"imported": len(adopted), "skipped": skipped}
+
+
+def _read_key(key_file: str | None) -> bytes | None:
+    if key_file:
+        return Path(key_file).read_bytes().strip() or None
+    value = os.getenv(KEY_ENV, "").strip()
+    return value.encode("utf-8") if value else None
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m arcenciel_link.manifest", description=__doc__.splitlines()[0])
+    parser.add_argument("action", choices=("export", "import"))
+    parser.add_argument("file", help="manifest path, '-' for stdout/stdin")
+    parser.add_argument("--key-file", help=f"HMAC key file (default: ${KEY_ENV})")
+    args = parser.parse_args(argv)
+    key = _read_key(args.key_file)
+
+    if args.action == "export":
+        text = json.dumps(export_manifest(key), indent=2)
+        if args.file == "-":
+            sys.stdout.write(text + "\n")
+        else:
+            Path(args.file).write_text(text, encoding="utf-8")
+            print(f"[AEC-LINK] manifest written to {args.file}")
+        return 0
+
+    raw = sys.stdin.read() if args.file == "-" else Path(args.file).read_text(encoding="utf-8")
+    try:
+        result = import_manifest(json.loads(raw), key)
+    except ValueError as exc:
+        print(f"[AEC-LINK] manifest rejected: {exc}", file=sys.stderr)
+        return 1
+    print(f"[AEC-LINK] imported {result['imported']} hashes, skipped {result['skipped']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
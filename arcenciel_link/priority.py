@@ -0,0 +1,92 @@
+"""Keep background hashing and downloads out of the WebUI's way.
+
+``lower_current_thread()`` moves the calling thread to the idle I/O class
+and a higher nice value.  Both are per-thread on Linux, so the WebUI's own
+threads keep their priority; other platforms are left unchanged.
+``throttle()`` meters background reads against the shared
+``background_io_mbps`` budget.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import os
+import platform
+import sys
+import threading
+import time
+
+from .config import load
+
+BACKGROUND_NICE = 10
+
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+_SYS_IOPRIO_SET = {"x86_64": 251, "i686": 289, "aarch64": 30, "armv7l": 314, "ppc64le": 273}
+
+_local = threading.local()
+_libc = None
+
+
+def _ioprio_set_idle(tid: int) -> bool:
+    global _libc
+    number = _SYS_IOPRIO_SET.get(platform.machine())
+    if number is None:
+        return False
+    try:
+        if _libc is None:
+            _libc = ctypes.CDLL(None, use_errno=True)
+        value = _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT
+        return _libc.syscall(number, _IOPRIO_WHO_PROCESS, tid, value) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def lower_current_thread() -> None:
+    """Run the calling thread at idle I/O and lowered CPU priority, once."""
+
+    if getattr(_local, "lowered", False):
+        return
+    _local.lowered = True
+    if not sys.platform.startswith("linux") or not load().get("background_priority", True):
+        return
+    tid = threading.get_native_id()
+    try:
+        current = os.getpriority(os.PRIO_PROCESS, tid)
+        if current < BACKGROUND_NICE:
+            os.setpriority(os.PRIO_PROCESS, tid, BACKGROUND_NICE)
+    except OSError:
+        pass
+    _ioprio_set_idle(tid)
+
+
+class IOBudget:
+    """Token bucket shared by every background reader."""
+
+    def __init__(self, mb_per_s: float) -> None:
+        self.rate = mb_per_s * 1024 * 1024
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def consume(self, nbytes: int) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + nbytes / self.rate
+        # allow up to one second of burst before sleeping
+        delay = self._next - now - 1.0
+        if delay > 0:
+            time.sleep(delay)
+
+
+_budget: IOBudget | None = None
+
+
+def throttle(nbytes: int) -> None:
+    global _budget
+    if _budget is None:
+        _budget = IOBudget(float(load().get("background_io_mbps") or 0))
+    _budget.consume(nbytes)
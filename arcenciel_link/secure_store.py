@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import threading
+
 SERVICE_NAME = "arcenciel-link-forge"
 
 
@@ -10,7 +12,15 @@ def sanitize_legacy_secret(value: str | None) -> str | None:
     return trimmed or None
 
 
-def _keyring():
+# the backend and every secret are looked up once; keyring backends can take
+# hundreds of milliseconds per call
+_UNSET = object()
+_backend = _UNSET
+_secrets: dict[str, str | None] = {}
+_lock = threading.Lock()
+
+
+def _probe_keyring():
     try:
         import keyring
 
@@ -22,6 +32,14 @@ def _keyring():
         return None
 
 
+def _keyring():
+    global _backend
+    with _lock:
+        if _backend is _UNSET:
+            _backend = _probe_keyring()
+        return _backend
+
+
 def is_secure_storage_available() -> bool:
     return _keyring() is not None
 
@@ -30,10 +48,16 @@ def get_secret(key: str) -> str | None:
     backend = _keyring()
     if backend is None:
         return None
+    with _lock:
+        if key in _secrets:
+            return _secrets[key]
     try:
-        return sanitize_legacy_secret(backend.get_password(SERVICE_NAME, key))
+        value = sanitize_legacy_secret(backend.get_password(SERVICE_NAME, key))
     except Exception:
         return None
+    with _lock:
+        _secrets[key] = value
+    return value
 
 
 def set_secret(key: str, value: str | None) -> None:
@@ -41,6 +65,10 @@ def set_secret(key: str, value: str | None) -> None:
     if backend is None:
         return
     normalized = sanitize_legacy_secret(value)
+    with _lock:
+        if key in _secrets and _secrets[key] == normalized:
+            return
+        _secrets.pop(key, None)
     try:
         if normalized:
             backend.set_password(SERVICE_NAME, key, normalized)
@@ -48,6 +76,8 @@ def set_secret(key: str, value: str | None) -> None:
             backend.delete_password(SERVICE_NAME, key)
     except Exception:
         return
+    with _lock:
+        _secrets[key] = normalized
 
 
 def migrate_legacy_secret(key: str, value: str | None) -> None:
@@ -6,9 +6,10 @@ from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 
-from . import client
+from . import client, manifest
 from .config import load as load_config
 from .downloader import RUNNING, generate_sidecars_for_existing
+from .isolation import WorkerUnavailable, get_worker_process, worker_online
 from .origins import is_private_host, is_same_origin, normalize_origin
 from .utils import list_subfolders
 
@@ -61,6 +62,17 @@ def _require_allowed_origin(request: Request) -> str | None:
     raise HTTPException(status_code=403, detail="Origin not allowed")
 
 
+def _require_local_ui(request: Request) -> None:
+    """Admit only loopback requests from the WebUI's own origin, for routes that expose local paths."""
+
+    origin = request.headers.get("origin")
+    if origin and not is_same_origin(origin, request.url.scheme, request.url.hostname, request.url.port):
+        raise HTTPException(status_code=403, detail="Origin not allowed")
+    client_host = request.client.host if request.client else None
+    if not client_host or not _is_loopback_host(client_host):
+        raise HTTPException(status_code=403, detail="Only available from this machine")
+
+
 def _build_cors_headers(origin: str | None, extra: dict[str, str] | None = None) -> dict[str, str]:
     headers: dict[str, str] = {"Vary": "Origin"}
     headers["Access-Control-Allow-Private-Network"] = "true"
@@ -97,6 +109,13 @@ def toggle_link_options(request: Request) -> PlainTextResponse:
     return PlainTextResponse("", status_code=204, headers=headers)
 
 
+def _call_worker(worker_process, action: str, **params) -> dict:
+    try:
+        return worker_process.call(action, **params)
+    except WorkerUnavailable as exc:
+        raise HTTPException(status_code=503, detail=f"ArcEnCiel worker process unavailable: {exc}") from exc
+
+
 @router.post("/toggle_link")
 def toggle_link(payload: ToggleLinkPayload, request: Request):
     """Start/stop the download worker from the browser UI."""
@@ -108,16 +127,22 @@ def toggle_link(payload: ToggleLinkPayload, request: Request):
         )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
+    except WorkerUnavailable as exc:
+        raise HTTPException(status_code=503, detail=f"ArcEnCiel worker process unavailable: {exc}") from exc
     except Exception as exc:
         raise HTTPException(status_code=500, detail="Failed to toggle worker") from exc
 
-    if payload.enable:
-        t0 = time.perf_counter()
-        while not RUNNING.is_set() and time.perf_counter() - t0 < 3:
-            time.sleep(0.05)
+    if get_worker_process() is not None:
+        online = worker_online()
+    else:
+        if payload.enable:
+            t0 = time.perf_counter()
+            while not RUNNING.is_set() and time.perf_counter() - t0 < 3:
+                time.sleep(0.05)
+        online = RUNNING.is_set()
 
     return JSONResponse(
-        {"ok": True, "workerOnline": RUNNING.is_set()},
+        {"ok": True, "workerOnline": online},
         headers=_build_cors_headers(origin),
     )
 
@@ -139,5 +164,37 @@ def list_folders(kind: str, request: Request):
 @router.post("/generate_sidecars")
 def generate_sidecars(request: Request):
     origin = _require_allowed_origin(request)
-    threading.Thread(target=generate_sidecars_for_existing, daemon=True).start()
+    engine = client._active_engine()
+    worker_process = get_worker_process()
+    if worker_process is not None:
+        _call_worker(worker_process, "generate_sidecars")
+    elif engine is not None:
+        engine.spawn(generate_sidecars_for_existing)
+    else:
+        threading.Thread(target=generate_sidecars_for_existing, daemon=True).start()
     return JSONResponse({"ok": True}, headers=_build_cors_headers(origin))
+
+
+@router.get("/manifest")
+def export_manifest(request: Request):
+    _require_local_ui(request)
+    worker_process = get_worker_process()
+    if worker_process is not None:
+        exported = _call_worker(worker_process, "manifest_export", timeout=120)
+    else:
+        exported = manifest.export_manifest(manifest._read_key(None))
+    return JSONResponse(exported)
+
+
+@router.post("/manifest")
+def import_manifest(payload: dict, request: Request):
+    _require_local_ui(request)
+    worker_process = get_worker_process()
+    try:
+        if worker_process is not None:
+            result = _call_worker(worker_process, "manifest_import", timeout=120, manifest=payload)
+        else:
+            result = manifest.import_manifest(payload, manifest._read_key(None))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return JSONResponse({"ok": True, **result})
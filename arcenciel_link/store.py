@@ -0,0 +1,143 @@
+"""Optional content-addressed model store keyed by SHA-256.
+
+Objects live under ``<cas_dir>/sha256/<aa>/<digest>`` and share their bytes
+with library files through hardlinks or reflinks, so placing a model into a
+second folder costs neither a transfer nor extra disk space.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+from pathlib import Path
+
+from .config import load
+
+_HEX_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+_FICLONE = 0x40049409
+
+
+def _store_root() -> Path | None:
+    raw = str(load().get("cas_dir") or "").strip()
+    if not raw:
+        return None
+    return Path(raw).expanduser()
+
+
+def enabled() -> bool:
+    return _store_root() is not None
+
+
+def object_path(sha256: str) -> Path | None:
+    root = _store_root()
+    digest = str(sha256 or "").lower()
+    if root is None or not _HEX_DIGEST.fullmatch(digest):
+        return None
+    return root / "sha256" / digest[:2] / digest
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        try:
+            with open(src, "rb") as s, open(dst, "xb") as d:
+                fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+            return True
+        except OSError:
+            dst.unlink(missing_ok=True)
+            return False
+    if sys.platform == "darwin":
+        import ctypes
+
+        try:
+            libc = ctypes.CDLL("libc.dylib", use_errno=True)
+            return libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0
+        except (OSError, AttributeError):
+            return False
+    return False
+
+
+def _link_or_clone(src: Path, dst: Path) -> str | None:
+    """Create *dst* sharing *src*'s bytes; return the method used or ``None``."""
+
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+    tmp = dst.with_name(dst.name + ".clone")
+    if _reflink(src, tmp):
+        try:
+            os.replace(tmp, dst)
+            return "reflink"
+        except OSError:
+            tmp.unlink(missing_ok=True)
+    return None
+
+
+def ingest(path: Path, sha256: str) -> bool:
+    """Hardlink a verified library file into the store without copying it."""
+
+    target = object_path(sha256)
+    if target is None:
+        return False
+    if target.exists():
+        return True
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.link(path, target)
+        return True
+    except FileExistsError:
+        return True
+    except OSError:
+        return False
+
+
+def place(sha256: str, dst: Path, candidates: list[Path] | tuple[Path, ...] = ()) -> str | None:
+    """Materialise *sha256* at *dst* from the store or a known library copy.
+
+    Returns the placement method, or ``None`` when no local source could be
+    linked or cloned onto *dst*'s filesystem.
+    """
+
+    if dst.exists():
+        return None
+    sources: list[Path] = []
+    stored = object_path(sha256)
+    if stored is not None:
+        sources.append(stored)
+    sources.extend(candidates)
+    for src in sources:
+        try:
+            if not src.is_file() or src.resolve() == dst.resolve():
+                continue
+        except OSError:
+            continue
+        method = _link_or_clone(src, dst)
+        if method:
+            if stored is not None and src != stored:
+                ingest(dst, sha256)
+            return method
+    return None
+
+
+def prune() -> int:
+    """Drop hardlinked objects that no library file references any more."""
+
+    root = _store_root()
+    if root is None or not (root / "sha256").is_dir():
+        return 0
+    removed = 0
+    for fanout in (root / "sha256").iterdir():
+        if not fanout.is_dir():
+            continue
+        for obj in fanout.iterdir():
+            try:
+                if obj.is_file() and obj.stat().st_nlink <= 1:
+                    obj.unlink()
+                    removed += 1
+            except OSError:
+                continue
+    return removed
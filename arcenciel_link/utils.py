@@ -1,18 +1,29 @@
 from __future__ import annotations
 
 import argparse
-import glob
+import contextlib
+import ctypes
+import errno
+import fnmatch
 import hashlib
 import json
 import logging
 import os
 import shlex
+import socket
+import sys
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Generator, List, Set
+from typing import Callable, Dict, Generator, Iterable, List, Sequence, Set
 
 import requests
 
+from . import busy, forge_cache, priority
+from .cancellation import CancelToken
+from .fingerprint import fingerprint
+from .inventory import INDEX
 from .version import VERSION
 
 _DEFAULT_USER_AGENT = f"ArcEnCiel-Link-Forge/{VERSION}"
@@ -41,6 +52,119 @@ log = logging.getLogger("arcenciel_link")
 log.setLevel(logging.INFO)
 
 
+# receive buffer: fills grow from MIN to MAX bytes while the link keeps up
+RECV_CHUNK_MIN = 256 * 1024
+RECV_CHUNK_MAX = 8 * 1024 * 1024
+RECV_FILL_TARGET = 0.25
+FSYNC_INTERVAL = 256 * 1024 * 1024
+FSYNC_POLICIES = ("none", "final", "periodic")
+
+
+def _content_encoded(r: requests.Response) -> bool:
+    return r.headers.get("content-encoding", "identity").strip().lower() not in ("", "identity")
+
+
+def _body_readinto(r: requests.Response):
+    """Return a ``readinto`` for the decoded response body.
+
+    Identity-encoded bodies are read straight into the caller's buffer.
+    ``requests`` leaves ``r.raw`` undecoded, so gzip or deflate bodies go
+    through urllib3's decoder and are copied in from its output.
+    """
+
+    if not _content_encoded(r):
+        return r.raw.readinto
+    chunks = r.raw.stream(RECV_CHUNK_MIN, decode_content=True)
+    pending = memoryview(b"")
+
+    def readinto(buffer) -> int:
+        nonlocal pending
+        if not pending:
+            # a decoded chunk may be larger than the buffer; the rest waits for the next call
+            pending = memoryview(next(chunks, b""))
+        n = min(len(buffer), len(pending))
+        buffer[:n] = pending[:n]
+        pending = pending[n:]
+        return n
+
+    return readinto
+
+
+def _abort_response(r: requests.Response) -> None:
+    """Shut down the response's socket so a read blocked in another thread returns.
+
+    Falls back to closing the response when urllib3 exposes no socket; a
+    blocked read then ends at the latest with the read timeout.
+    """
+
+    sock = getattr(getattr(r.raw, "connection", None), "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+            return
+        except OSError as exc:
+            log.debug("could not shut down download socket: %s", exc)
+
+    def _close() -> None:
+        try:
+            r.close()
+        except Exception as exc:
+            log.warning("could not close cancelled download: %s", exc)
+
+    # close() waits for a read in progress, which must not block the canceller
+    threading.Thread(target=_close, name="arcenciel-link-abort", daemon=True).start()
+
+
+class InsufficientSpace(OSError):
+    """A download does not fit on its filesystem; raised before its body is written."""
+
+
+_FALLOC_FL_KEEP_SIZE = 1
+_fallocate = None
+
+
+def _preallocate(fd: int, offset: int, length: int) -> bool:
+    """Reserve *length* blocks past *offset* without changing the file size.
+
+    ``os.posix_fallocate`` would extend the file, and a ``.part``'s size is
+    its resume offset, so Linux ``fallocate`` with ``FALLOC_FL_KEEP_SIZE`` is
+    used.  Returns False where that is unsupported.
+    """
+
+    global _fallocate
+    if length <= 0 or not sys.platform.startswith("linux"):
+        return False
+    if _fallocate is None:
+        try:
+            _fallocate = ctypes.CDLL(None, use_errno=True).fallocate64
+            _fallocate.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64)
+        except (OSError, AttributeError):
+            _fallocate = False
+    if not _fallocate:
+        return False
+    if _fallocate(fd, _FALLOC_FL_KEEP_SIZE, offset, length) == 0:
+        return True
+    if ctypes.get_errno() == errno.ENOSPC:
+        raise InsufficientSpace(f"No room to preallocate {length // (1024 * 1024)} MB")
+    return False
+
+
+@contextlib.contextmanager
+def _cancellable(r: requests.Response, cancel: CancelToken | None):
+    # whatever the aborted read raised, a cancelled transfer surfaces as Cancelled
+    if cancel is None:
+        yield
+        return
+    unhook = cancel.on_cancel(lambda: _abort_response(r))
+    try:
+        yield
+    except Exception:
+        cancel.check()
+        raise
+    finally:
+        unhook()
+
+
 def download_file(
     url: str,
     dst: Path,
@@ -48,32 +172,199 @@ def download_file(
     *,
     request_headers: dict[str, str] | None = None,
     allow_redirects: bool = True,
+    fsync: str = "final",
+    cancel: CancelToken | None = None,
+    reserve: Callable[[int], None] | None = None,
 ):
+    """Stream *url* into *dst*, resuming from an existing partial file.
+
+    The body is received into one reused buffer and written unbuffered in
+    chunk-aligned blocks, backing off while the WebUI is generating.
+    *fsync* is ``"final"`` (once, when the transfer is complete),
+    ``"periodic"`` (also every ``FSYNC_INTERVAL`` bytes) or ``"none"``.
+    Cancelling *cancel* closes the connection and raises ``Cancelled``; the
+    partial file is left for the caller.  Once the full size is known it is
+    passed to *reserve*, which may raise, and the rest of the file is
+    preallocated before any byte is received.
+    """
+
     session = get_http_session()
-    with session.get(
-        url,
-        stream=True,
-        timeout=60,
-        headers=request_headers,
-        allow_redirects=allow_redirects,
-    ) as r:
+    offset = dst.stat().st_size if dst.exists() else 0
+    headers = dict(request_headers or {})
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        # a range of a compressed body cannot be appended to the decoded bytes we have
+        headers["Accept-Encoding"] = "identity"
+    if cancel is not None:
+        cancel.check()
+    with (
+        session.get(
+            url,
+            stream=True,
+            timeout=60,
+            headers=headers or None,
+            allow_redirects=allow_redirects,
+        ) as r,
+        _cancellable(r, cancel),
+    ):
+        if r.status_code == 416 and offset:
+            complete = r.headers.get("content-range", "").rpartition("/")[2]
+            if complete.isdigit() and int(complete) == offset:
+                progress_cb(1.0)
+                return
+            dst.unlink(missing_ok=True)
         r.raise_for_status()
-        total = int(r.headers.get("content-length", 0))
-        chunk = 1024 * 1024
-        with open(dst, "wb") as f:
-            done = 0
-            for part in r.iter_content(chunk_size=chunk):
-                f.write(part)
-                done += len(part)
+        if r.status_code != 206:
+            offset = 0
+        # a compressed body's Content-Length is not the size of the file
+        length = 0 if _content_encoded(r) else int(r.headers.get("content-length", 0))
+        total = length + offset if length else 0
+        if total and reserve is not None:
+            reserve(total)
+        readinto = _body_readinto(r)
+        buffer = memoryview(bytearray(RECV_CHUNK_MAX))
+        chunk = RECV_CHUNK_MIN
+        with open(dst, "ab" if offset else "wb", buffering=0) as f:
+            if total:
+                _preallocate(f.fileno(), offset, total - offset)
+            done = offset
+            synced = offset
+            while True:
+                # realign after resuming from an odd offset
+                want = chunk - done % RECV_CHUNK_MIN
+                started = time.monotonic()
+                n = readinto(buffer[:want])
+                if cancel is not None:
+                    cancel.check()
+                if not n:
+                    break
+                view = buffer[:n]
+                while view:
+                    view = view[f.write(view) :]
+                done += n
+                busy.gate(n, cancel)
+                if n == want:
+                    elapsed = time.monotonic() - started
+                    if elapsed < RECV_FILL_TARGET / 2 and chunk < RECV_CHUNK_MAX:
+                        chunk *= 2
+                    elif elapsed > RECV_FILL_TARGET and chunk > RECV_CHUNK_MIN:
+                        chunk //= 2
+                if fsync == "periodic" and done - synced >= FSYNC_INTERVAL:
+                    os.fsync(f.fileno())
+                    synced = done
                 if total:
                     progress_cb(done / total)
+            if total and done < total:
+                raise IOError(f"connection closed after {done} of {total} bytes")
+            if fsync != "none":
+                os.fsync(f.fileno())
+
+
+COPY_CHUNK = 64 * 1024 * 1024
+
+
+def move_file(src: Path, dst: Path, *, fsync: str = "final", cancel: CancelToken | None = None) -> str:
+    """Move *src* to *dst*: a rename on one filesystem, else one sequential copy.
+
+    A cross-device copy is written to ``dst.part`` (preallocated, and with
+    ``copy_file_range`` where available so the bytes never pass through
+    Python), synced per *fsync* and renamed into place, so *dst* never
+    exists half-written.  Cancelling *cancel* stops the copy and leaves
+    *src* in place.  Returns ``"rename"`` or ``"copy"``.
+    """
+
+    try:
+        os.replace(src, dst)
+        return "rename"
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+    partial = dst.with_name(dst.name + ".part")
+    size = src.stat().st_size
+    try:
+        with open(src, "rb", buffering=0) as fin, open(partial, "wb", buffering=0) as fout:
+            _fadvise(fin.fileno(), "POSIX_FADV_SEQUENTIAL")
+            _preallocate(fout.fileno(), 0, size)
+            kernel_copy = hasattr(os, "copy_file_range")
+            copied = 0
+            while copied < size:
+                if cancel is not None:
+                    cancel.check()
+                count = min(COPY_CHUNK, size - copied)
+                if kernel_copy:
+                    try:
+                        n = os.copy_file_range(fin.fileno(), fout.fileno(), count)
+                    except OSError:
+                        n = 0
+                    if not n:
+                        # unsupported here (some FUSE/network filesystems return 0 before EOF);
+                        # the file offsets are where the kernel left them, carry on with plain reads
+                        kernel_copy = False
+                        continue
+                else:
+                    view = memoryview(fin.read(count))
+                    n = len(view)
+                    while view:
+                        view = view[fout.write(view) :]
+                if not n:
+                    break
+                copied += n
+                busy.gate(n, cancel)
+            if copied != size:
+                raise IOError(f"copied {copied} of {size} bytes to {dst}")
+            if fsync != "none":
+                os.fsync(fout.fileno())
+        os.replace(partial, dst)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    try:
+        src.unlink()
+    except OSError as exc:
+        # dst is complete; a leftover source only costs space
+        print(f"[AEC-LINK] could not remove {src} after copying it: {exc}", flush=True)
+    return "copy"
 
 
-def sha256_of_file(p: Path) -> str:
+HASH_BUFFER = 4 * 1024 * 1024
+_HASH_BUFFERS = threading.local()
+
+
+def _fadvise(fd: int, advice_name: str) -> None:
+    advice = getattr(os, advice_name, None)
+    if advice is None or not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, advice)
+    except OSError:
+        pass
+
+
+def sha256_of_file(p: Path, cancel: CancelToken | None = None) -> str:
+    """SHA-256 of *p*, read into a reused per-thread buffer.
+
+    hashlib releases the GIL while digesting large buffers, so several files
+    hash in parallel on separate threads.  Reads count against the
+    background I/O budget and back off while the WebUI is generating.  The
+    pages are dropped from the page cache afterwards so a library scan does
+    not evict the WebUI's working set.  Cancelling *cancel* raises
+    ``Cancelled`` between reads.
+    """
+
+    buffer = getattr(_HASH_BUFFERS, "view", None)
+    if buffer is None:
+        buffer = _HASH_BUFFERS.view = memoryview(bytearray(HASH_BUFFER))
     h = hashlib.sha256()
-    with open(p, "rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
-            h.update(chunk)
+    with open(p, "rb", buffering=0) as f:
+        fd = f.fileno()
+        _fadvise(fd, "POSIX_FADV_SEQUENTIAL")
+        while n := f.readinto(buffer):
+            h.update(buffer[:n])
+            priority.throttle(n)
+            busy.gate(n, cancel)
+            if cancel is not None:
+                cancel.check()
+        _fadvise(fd, "POSIX_FADV_DONTNEED")
     return h.hexdigest()
 
 
@@ -84,7 +375,13 @@ _CACHE_DATA: Dict[str, Dict] | None = None
 
 MODEL_EXTS = {".safetensors", ".ckpt", ".pt", ".sft", ".gguf"}
 
-KNOWN_HASHES = set()
+# a first scan publishes newly hashed files after this many files or seconds
+PUBLISH_BATCH_FILES = 16
+PUBLISH_BATCH_SECONDS = 10
+_SCAN_ACTIVE = threading.Event()
+
+# files seen by a scan that still wait for their full SHA-256: path -> fingerprint entry
+_PENDING: Dict[str, Dict] = {}
 
 
 def list_subfolders(kind: str) -> list[str]:
@@ -95,50 +392,55 @@ def list_subfolders(kind: str) -> list[str]:
         "embedding": "embeddings",
     }[kind.lower()]
 
-    root = Path(get_model_path(base))
-    if not root.exists():
-        return []
-
-    out: list[str] = []
-    for p in root.rglob("*"):
-        if p.is_dir() and not p.name.startswith("."):
-            rel = p.relative_to(root).as_posix()
-            if rel:
-                out.append(rel)
+    out: set[str] = set()
+    for root in model_paths_for_target(base):
+        if not root.exists():
+            continue
+        for p in root.rglob("*"):
+            if p.is_dir() and not p.name.startswith("."):
+                rel = p.relative_to(root).as_posix()
+                if rel:
+                    out.add(rel)
 
     return sorted(out)
 
 
-def _get_model_dirs(root: Path) -> List[Path]:
-    dirs: Set[Path] = set()
+_DIR_OPTION_KINDS = {
+    "ckpt_dir": "checkpoint",
+    "ckpt_dirs": "checkpoint",
+    "lora_dir": "lora",
+    "lora_dirs": "lora",
+    "vae_dir": "vae",
+    "vae_dirs": "vae",
+    "embeddings_dir": "embedding",
+}
 
-    dirs.update(
-        {
-            root / "models" / "Stable-diffusion",
-            root / "models" / "Lora",
-            root / "models" / "VAE",
-            root / "embeddings",
-        }
-    )
+
+def _get_model_dirs_by_kind(root: Path) -> Dict[str, List[Path]]:
+    dirs: Dict[str, Set[Path]] = {
+        "checkpoint": {root / "models" / "Stable-diffusion"},
+        "lora": {root / "models" / "Lora"},
+        "vae": {root / "models" / "VAE"},
+        "embedding": {root / "embeddings"},
+    }
+
+    def _add(option: str, value) -> None:
+        values = value if isinstance(value, list) else [value]
+        dirs[_DIR_OPTION_KINDS[option]].update(Path(item) for item in values if item)
+
+    if _CMD_OPTS_OVERRIDE is not None:
+        # a worker subprocess: the WebUI process already read its argv
+        for option, value in _CMD_OPTS_OVERRIDE.items():
+            if option in _DIR_OPTION_KINDS:
+                _add(option, value or [])
+        return {kind: [d for d in found if d.exists()] for kind, found in dirs.items()}
 
     try:
         from modules import shared
 
         co = shared.cmd_opts
-        if getattr(co, "ckpt_dir", None):
-            dirs.add(Path(co.ckpt_dir))
-        for value in getattr(co, "ckpt_dirs", []) or []:
-            dirs.add(Path(value))
-        if getattr(co, "lora_dir", None):
-            dirs.add(Path(co.lora_dir))
-        for value in getattr(co, "lora_dirs", []) or []:
-            dirs.add(Path(value))
-        if getattr(co, "vae_dir", None):
-            dirs.add(Path(co.vae_dir))
-        for value in getattr(co, "vae_dirs", []) or []:
-            dirs.add(Path(value))
-        if getattr(co, "embeddings_dir", None):
-            dirs.add(Path(co.embeddings_dir))
+        for option in _DIR_OPTION_KINDS:
+            _add(option, getattr(co, option, None) or [])
     except Exception:
         pass
 
@@ -153,13 +455,17 @@ def _get_model_dirs(root: Path) -> List[Path]:
         parser.add_argument("--vae-dirs", action="append")
         parser.add_argument("--embeddings-dir")
         args, _ = parser.parse_known_args(shlex.split(cla))
-        for val in vars(args).values():
-            if isinstance(val, list):
-                dirs.update(Path(item) for item in val if item)
-            elif val:
-                dirs.add(Path(val))
+        for option, val in vars(args).items():
+            _add(option, val or [])
+
+    return {kind: [d for d in found if d.exists()] for kind, found in dirs.items()}
 
-    return [d for d in dirs if d.exists()]
+
+def _get_model_dirs(root: Path) -> List[Path]:
+    dirs: Set[Path] = set()
+    for found in _get_model_dirs_by_kind(root).values():
+        dirs.update(found)
+    return list(dirs)
 
 
 def _load_cache() -> Dict[str, Dict]:
@@ -185,81 +491,302 @@ def _ensure_cache() -> Dict[str, Dict]:
     return _CACHE_DATA
 
 
-def _iter_model_files(root: Path) -> Generator[Path, None, None]:
-    for base in _get_model_dirs(root):
-        pattern = str(base / "**" / "*")
-        for fp in glob.glob(pattern, recursive=True):
-            p = Path(fp)
-            if p.suffix.lower() in MODEL_EXTS and p.is_file():
-                yield p
+def _scan_roots(bases: Iterable[Path]) -> List[Path]:
+    """Resolve model roots and drop every root nested inside another one."""
+
+    roots: List[Path] = []
+    for base in sorted({Path(os.path.realpath(b)) for b in bases}, key=lambda p: len(p.parts)):
+        if any(base == root or root in base.parents for root in roots):
+            continue
+        roots.append(base)
+    return roots
+
 
+def _is_excluded(rel: str, name: str, exclude: Sequence[str]) -> bool:
+    return any(
+        fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel, pattern) or fnmatch.fnmatch(rel, "*/" + pattern)
+        for pattern in exclude
+    )
+
+
+def _iter_model_files(
+    root: Path,
+    exclude: Sequence[str] = (),
+    exts: Set[str] = MODEL_EXTS,
+) -> Generator[tuple[Path, os.stat_result], None, None]:
+    """Yield ``(path, stat)`` once for every file with a suffix in *exts*.
+
+    Paths are real paths: symlinked directories are entered through their
+    target so every directory is visited once, even when roots overlap.
+    """
 
-def list_model_hashes() -> List[str]:
+    visited: Set[tuple[int, int]] = set()
+    for base in _scan_roots(_get_model_dirs(root)):
+        stack = [(base, "")]
+        while stack:
+            current, prefix = stack.pop()
+            try:
+                st = os.stat(current)
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) in visited:
+                continue
+            visited.add((st.st_dev, st.st_ino))
+            try:
+                with os.scandir(current) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            for entry in entries:
+                name = entry.name
+                if name.startswith("."):
+                    continue
+                rel = f"{prefix}{name}"
+                if exclude and _is_excluded(rel, name, exclude):
+                    continue
+                try:
+                    if entry.is_dir():
+                        target = Path(os.path.realpath(entry.path)) if entry.is_symlink() else Path(entry.path)
+                        stack.append((target, rel + "/"))
+                        continue
+                    if os.path.splitext(name)[1].lower() not in exts or not entry.is_file():
+                        continue
+                    path = Path(os.path.realpath(entry.path)) if entry.is_symlink() else Path(entry.path)
+                    yield path, entry.stat()
+                except OSError:
+                    continue
+
+
+# set by the headless daemon's --webui-root, which beats config.json
+_WEBUI_ROOT_OVERRIDE: Path | None = None
+
+
+def _webui_root(cfg: dict) -> Path:
+    if _WEBUI_ROOT_OVERRIDE is not None:
+        return _WEBUI_ROOT_OVERRIDE
+    if cfg.get("webui_root"):
+        return Path(cfg["webui_root"])
+    return Path(os.getenv("SD_WEBUI_ROOT", Path.cwd()))
+
+
+def list_partial_downloads() -> List[tuple[Path, os.stat_result]]:
     from .config import load
 
+    return list(_iter_model_files(_webui_root(load()), exts={".part"}))
+
+
+def scan_in_progress() -> bool:
+    return _SCAN_ACTIVE.is_set()
+
+
+def _publish_batch(on_batch: Callable[[], None] | None) -> None:
+    if on_batch is None:
+        return
+    try:
+        on_batch()
+    except Exception as exc:
+        log.warning("inventory batch publish failed: %s", exc)
+
+
+def pending_models() -> List[Dict]:
+    """Provisional identities of files whose full hash is not known yet."""
+
+    with _CACHE_LOCK:
+        return [dict(entry) for entry in _PENDING.values()]
+
+
+def _cache_entry(st: os.stat_result, h: str) -> Dict:
+    return {"mtime": int(st.st_mtime), "hash": h, "size": st.st_size}
+
+
+def _fingerprint_or_none(p: Path) -> str | None:
+    try:
+        return fingerprint(p)
+    except OSError:
+        return None
+
+
+def _commit_hashed(batch: List[tuple[str, os.stat_result, str]]) -> None:
+    if not batch:
+        return
     with _CACHE_LOCK:
         cache = _ensure_cache()
-        KNOWN_HASHES.clear()
-        webui_root = Path(os.getenv("SD_WEBUI_ROOT", Path.cwd()))
-        cfg = load()
-        if cfg.get("webui_root"):
-            webui_root = Path(cfg["webui_root"])
-
-        updated = False
-        result: List[str] = []
-
-        for p in _iter_model_files(webui_root):
-            mtime = int(p.stat().st_mtime)
-            key = str(p.resolve())
-            entry = cache.get(key)
-
-            if entry and entry.get("mtime") == mtime:
-                h = entry.get("hash")
-            else:
-                log.info("hashing %s", p)
-                h = sha256_of_file(p)
-                cache[key] = {"mtime": mtime, "hash": h}
-                updated = True
-
-            if h:
-                result.append(h)
-
-        orphan_keys = [k for k in cache if not Path(k).exists()]
-        for k in orphan_keys:
-            del cache[k]
-            updated = True
-
-        if updated:
-            _save_cache(cache)
+        for key, st, h in batch:
+            cache[key] = _cache_entry(st, h)
+            _PENDING.pop(key, None)
+        _save_cache(cache)
+    INDEX.update((key, h) for key, _st, h in batch)
+    batch.clear()
+
 
-        KNOWN_HASHES.update(result)
-        return result
+def list_model_hashes(on_batch: Callable[[], None] | None = None) -> List[str]:
+    """Hash every model file and reconcile the hash cache and inventory index.
+
+    Cached hashes are indexed first.  Every other file, including one whose
+    mtime changed while size and fingerprint still match, is listed as
+    pending under its fingerprint until its full SHA-256 is computed; the
+    fingerprint only samples the file, so a cached hash is never carried
+    over on its strength.  Newly hashed files are indexed in batches.
+    *on_batch* runs after each step so a long first scan publishes a
+    growing inventory instead of nothing.
+    """
+
+    from .config import load
 
+    cfg = load()
+    webui_root = _webui_root(cfg)
+    share_forge_cache = bool(cfg.get("forge_cache_sync", True))
+    dirs_by_kind = _get_model_dirs_by_kind(webui_root) if share_forge_cache else {}
+    _SCAN_ACTIVE.set()
+    try:
+        pairs: List[tuple[str, str]] = []
+        todo: List[tuple[Path, os.stat_result]] = []
+        stats: Dict[str, os.stat_result] = {}
+
+        with _CACHE_LOCK:
+            cache = _ensure_cache()
+            known_before = set(cache)
+            for p, st in _iter_model_files(webui_root, cfg.get("scan_exclude") or ()):
+                key = str(p)
+                stats[key] = st
+                entry = cache.get(key)
+                if entry and entry.get("mtime") == int(st.st_mtime) and entry.get("hash"):
+                    pairs.append((key, entry["hash"]))
+                else:
+                    todo.append((p, st))
+
+        INDEX.update(pairs)
+        _publish_batch(on_batch)
+
+        batch: List[tuple[str, os.stat_result, str]] = []
+        fingerprints = {str(p): _fingerprint_or_none(p) for p, _st in todo}
+        with _CACHE_LOCK:
+            _PENDING.clear()
+            for p, st in todo:
+                _PENDING[str(p)] = {"fingerprint": fingerprints[str(p)], "size": st.st_size}
+        _publish_batch(on_batch)
+
+        if todo and share_forge_cache:
+            # hashes the WebUI already computed are as good as our own
+            seeded = forge_cache.seed_hashes(todo, dirs_by_kind, webui_root, stats)
+            if seeded:
+                log.info("reused %d hashes from the WebUI cache", len(seeded))
+                for p, st in todo:
+                    key = str(p)
+                    if key in seeded:
+                        batch.append((key, st, seeded[key]))
+                        pairs.append((key, seeded[key]))
+                todo = [(p, st) for p, st in todo if str(p) not in seeded]
+                _commit_hashed(batch)
+                _publish_batch(on_batch)
+
+        def _hash(item: tuple[Path, os.stat_result]) -> tuple[str, str | None, bool]:
+            p, st = item
+            key = str(p)
+            with _CACHE_LOCK:
+                entry = _ensure_cache().get(key)
+            if entry and entry.get("mtime") == int(st.st_mtime) and entry.get("hash"):
+                # hashed meanwhile, e.g. for a job that arrived during the scan
+                return key, entry["hash"], False
+            log.info("hashing %s", p)
+            try:
+                return key, sha256_of_file(p), True
+            except OSError:
+                return key, None, False
+
+        last_publish = time.monotonic()
+        workers = max(1, int(cfg.get("hash_workers") or 1))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="arcenciel-link-hash", initializer=priority.lower_current_thread
+        ) as pool:
+            for (_p, st), (key, h, fresh) in zip(todo, pool.map(_hash, todo)):
+                if h is None or not fresh:
+                    with _CACHE_LOCK:
+                        _PENDING.pop(key, None)
+                    if h is None:
+                        continue
+                else:
+                    batch.append((key, st, h))
+                pairs.append((key, h))
+                if len(batch) >= PUBLISH_BATCH_FILES or time.monotonic() - last_publish >= PUBLISH_BATCH_SECONDS:
+                    _commit_hashed(batch)
+                    _publish_batch(on_batch)
+                    last_publish = time.monotonic()
+        _commit_hashed(batch)
+
+        with _CACHE_LOCK:
+            cache = _ensure_cache()
+            orphan_keys = [k for k in cache if k not in stats and not Path(k).exists()]
+            for k in orphan_keys:
+                del cache[k]
+            if orphan_keys:
+                _save_cache(cache)
+            # keep files that downloads registered while the scan was running
+            added_meanwhile = [(k, v["hash"]) for k, v in cache.items() if k not in known_before and v.get("hash")]
+
+        INDEX.update(pairs + added_meanwhile, prune=True)
+        if share_forge_cache:
+            written = forge_cache.write_back(
+                ((Path(k), stats[k].st_mtime, h) for k, h in pairs), dirs_by_kind, webui_root
+            )
+            if written:
+                log.info("shared %d hashes with the WebUI cache", written)
+        return [h for _key, h in pairs]
+    finally:
+        _SCAN_ACTIVE.clear()
+
+
+def paths_for_hash(hash_value: str) -> List[Path]:
+    return INDEX.paths(hash_value)
+
+
+def update_cached_hash(path: Path, hash_value: str) -> None:
+    """Record the hash of one new or changed model; the index publishes the change as a delta."""
 
-def update_cached_hash(path: Path, hash_value: str) -> List[str]:
     resolved = path.resolve()
     try:
-        mtime = int(resolved.stat().st_mtime)
+        st = resolved.stat()
     except FileNotFoundError:
-        return list_model_hashes()
+        forget_cached_hash(resolved)
+        return
     with _CACHE_LOCK:
         cache = _ensure_cache()
-        cache[str(resolved)] = {"mtime": mtime, "hash": hash_value}
+        cache[str(resolved)] = _cache_entry(st, hash_value)
+        _PENDING.pop(str(resolved), None)
         _save_cache(cache)
 
-        hashes = []
-        for entry in cache.values():
-            h = entry.get("hash")
-            if h:
-                hashes.append(h)
+    INDEX.add(resolved, hash_value)
+
+
+def forget_cached_hash(path: Path) -> None:
+    """Drop a model that was removed or moved away from the hash cache and the inventory."""
 
-        KNOWN_HASHES.clear()
-        KNOWN_HASHES.update(hashes)
-        return hashes
+    key = str(path.resolve())
+    with _CACHE_LOCK:
+        cache = _ensure_cache()
+        _PENDING.pop(key, None)
+        if cache.pop(key, None) is not None:
+            _save_cache(cache)
+    INDEX.remove(key)
 
 
-def _cmd_opts() -> Dict[str, str | None]:
-    opts = {"ckpt_dir": None, "lora_dir": None, "vae_dir": None, "embeddings_dir": None}
+# model folder options handed over by the WebUI process to the worker subprocess
+_CMD_OPTS_OVERRIDE: Dict[str, str | List[str] | None] | None = None
+
+
+def _cmd_opts() -> Dict[str, str | List[str] | None]:
+    """Model folder options: the singular ones as a path or None, the plural ones as a list when given."""
+
+    if _CMD_OPTS_OVERRIDE is not None:
+        return dict(_CMD_OPTS_OVERRIDE)
+    opts: Dict[str, str | List[str] | None] = {
+        "ckpt_dir": None,
+        "lora_dir": None,
+        "vae_dir": None,
+        "embeddings_dir": None,
+    }
+    # every folder of the plural options, for download placement
+    extra: Dict[str, List[str]] = {"ckpt_dirs": [], "lora_dirs": [], "vae_dirs": []}
 
     try:
         from modules import shared
@@ -268,6 +795,8 @@ def _cmd_opts() -> Dict[str, str | None]:
             val = getattr(shared.cmd_opts, k, None)
             if val:
                 opts[k] = val
+        for k in extra:
+            extra[k] = [str(v) for v in getattr(shared.cmd_opts, k, None) or [] if v]
         if not opts["ckpt_dir"] and getattr(shared.cmd_opts, "ckpt_dirs", None):
             opts["ckpt_dir"] = shared.cmd_opts.ckpt_dirs[0]
         if not opts["lora_dir"] and getattr(shared.cmd_opts, "lora_dirs", None):
@@ -277,7 +806,7 @@ def _cmd_opts() -> Dict[str, str | None]:
     except Exception:
         pass
 
-    if not any(opts.values()) and (cla := os.getenv("COMMANDLINE_ARGS")):
+    if not any(opts.values()) and not any(extra.values()) and (cla := os.getenv("COMMANDLINE_ARGS")):
         parser = argparse.ArgumentParser(add_help=False)
         parser.add_argument("--ckpt-dir")
         parser.add_argument("--ckpt-dirs", action="append")
@@ -300,43 +829,65 @@ def _cmd_opts() -> Dict[str, str | None]:
             values = parsed.get(plural)
             if not opts[singular] and values:
                 opts[singular] = values[0]
+            if values:
+                extra[plural] = list(values)
 
+    opts.update({k: v for k, v in extra.items() if v})
     return opts
 
 
+# target prefix -> (singular option, plural option, default folder under the WebUI root)
+_TARGET_FOLDERS = {
+    "models/Stable-diffusion": ("ckpt_dir", "ckpt_dirs", "models/Stable-diffusion"),
+    "models/Checkpoint": ("ckpt_dir", "ckpt_dirs", "models/Stable-diffusion"),
+    "models/Lora": ("lora_dir", "lora_dirs", "models/Lora"),
+    "models/VAE": ("vae_dir", "vae_dirs", "models/VAE"),
+    "models/Vae": ("vae_dir", "vae_dirs", "models/VAE"),
+    "models/Emb": ("embeddings_dir", None, "embeddings"),
+    "embeddings": ("embeddings_dir", None, "embeddings"),
+}
+
+
 def get_model_path(target: str) -> Path:
+    return model_paths_for_target(target)[0]
+
+
+def model_paths_for_target(target: str) -> List[Path]:
+    """Resolve *target* under every configured folder of its kind.
+
+    The primary folder (``--ckpt-dir`` and friends, else the first of the
+    plural option, else the WebUI default) comes first, followed by the
+    other ``--*-dirs`` folders in command-line order.
+    """
+
     root = Path(os.getenv("SD_WEBUI_ROOT", Path.cwd()))
     opts = _cmd_opts()
 
-    mapping = {
-        "models/Stable-diffusion": Path(opts["ckpt_dir"]) if opts["ckpt_dir"] else root / "models/Stable-diffusion",
-        "models/Checkpoint": Path(opts["ckpt_dir"]) if opts["ckpt_dir"] else root / "models/Stable-diffusion",
-        "models/Lora": Path(opts["lora_dir"]) if opts["lora_dir"] else root / "models/Lora",
-        "models/VAE": Path(opts["vae_dir"]) if opts["vae_dir"] else root / "models/VAE",
-        "models/Vae": Path(opts["vae_dir"]) if opts["vae_dir"] else root / "models/VAE",
-        "models/Emb": Path(opts["embeddings_dir"]) if opts["embeddings_dir"] else root / "embeddings",
-        "embeddings": Path(opts["embeddings_dir"]) if opts["embeddings_dir"] else root / "embeddings",
-    }
-
     normalised = str(target or "").replace("\\", "/").lstrip("/")
     if not normalised:
         raise ValueError("Invalid target path")
     lowered = normalised.lower()
 
-    for prefix, real_dir in mapping.items():
+    for prefix, (option, plural, default) in _TARGET_FOLDERS.items():
         pref_norm = prefix.replace("\\", "/")
         pref_lower = pref_norm.lower()
         if lowered == pref_lower or lowered.startswith(pref_lower + "/"):
             tail = normalised[len(pref_norm) :].lstrip("/\\")
-            base = Path(real_dir).resolve()
-            candidate = base if not tail else (base / Path(tail))
-            resolved = candidate.resolve()
-            try:
-                resolved.relative_to(base)
-            except ValueError as exc:
-                raise ValueError("Target path escapes allowed directories") from exc
-            if any(part in ("..", ".") for part in resolved.parts[len(base.parts) :]):
-                raise ValueError("Target path contains traversal segments")
-            return resolved
+            bases = [Path(opts[option]) if opts.get(option) else root / default]
+            bases += [Path(d) for d in opts.get(plural) or []]
+            out: List[Path] = []
+            for real_dir in bases:
+                base = Path(real_dir).resolve()
+                candidate = base if not tail else (base / Path(tail))
+                resolved = candidate.resolve()
+                try:
+                    resolved.relative_to(base)
+                except ValueError as exc:
+                    raise ValueError("Target path escapes allowed directories") from exc
+                if any(part in ("..", ".") for part in resolved.parts[len(base.parts) :]):
+                    raise ValueError("Target path contains traversal segments")
+                if resolved not in out:
+                    out.append(resolved)
+            return out
 
     raise ValueError("Unsupported target path")
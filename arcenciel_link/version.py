@@ -1,4 +1,12 @@
+from importlib.util import find_spec
+
 VERSION = "2.0.0"
 PROTOCOL_VERSION = 2
-CAPABILITIES = ("private_download_grant_v1",)
+MSGPACK_CAPABILITY = "ws_msgpack_v1"
+INVENTORY_DELTA_CAPABILITY = "inventory_delta_v1"
+JOB_CANCEL_CAPABILITY = "job_cancel_v1"
+# Binary framing is only advertised when the optional msgpack package is installed.
+CAPABILITIES = ("private_download_grant_v1", INVENTORY_DELTA_CAPABILITY, JOB_CANCEL_CAPABILITY) + (
+    (MSGPACK_CAPABILITY,) if find_spec("msgpack") else ()
+)
 CLIENT_ID = "forge"
@@ -0,0 +1,67 @@
+"""WebSocket payload encoding.
+
+Text frames are always JSON.  When msgpack is installed the worker advertises
+``ws_msgpack_v1``; once the server lists it in a ``capabilities`` message,
+outgoing payloads become msgpack binary frames and inventory hashes travel as
+32 raw bytes instead of 64 hex characters.
+"""
+
+from __future__ import annotations
+
+import json
+
+from .version import MSGPACK_CAPABILITY
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+_peer_capabilities: frozenset[str] = frozenset()
+_HASH_LIST_KEYS = ("hashes", "added", "removed")
+
+
+def set_peer_capabilities(capabilities) -> None:
+    global _peer_capabilities
+    _peer_capabilities = frozenset(str(item) for item in capabilities or ())
+
+
+def reset() -> None:
+    set_peer_capabilities(())
+
+
+def peer_supports(capability: str) -> bool:
+    return capability in _peer_capabilities
+
+
+def binary_enabled() -> bool:
+    return msgpack is not None and MSGPACK_CAPABILITY in _peer_capabilities
+
+
+def _pack_hashes(hashes: list[str]) -> list[bytes | str]:
+    packed: list[bytes | str] = []
+    for value in hashes:
+        try:
+            packed.append(bytes.fromhex(value) if len(value) == 64 else value)
+        except ValueError:
+            packed.append(value)
+    return packed
+
+
+def encode(payload: dict) -> str | bytes:
+    if not binary_enabled():
+        return json.dumps(payload)
+    packed = {key: _pack_hashes(payload[key]) for key in _HASH_LIST_KEYS if isinstance(payload.get(key), list)}
+    if payload.get("type") in ("inventory", "inventory_delta") and packed:
+        payload = {**payload, **packed}
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def decode(raw) -> dict | None:
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        if msgpack is None:
+            return None
+        message = msgpack.unpackb(bytes(raw), raw=False)
+    else:
+        message = json.loads(raw)
+    return message if isinstance(message, dict) else None
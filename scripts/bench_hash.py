@@ -0,0 +1,83 @@
+"""Compare the old read-loop SHA-256 with ``sha256_of_file``, serially and in parallel.
+
+    python scripts/bench_hash.py [--files 4] [--size-mb 512] [--workers 4] [DIR]
+
+Test files are created in DIR (a temporary directory by default) and removed
+afterwards.  Their pages are evicted before every run where the platform
+supports it, so each variant starts from the same cold page cache.  The
+parallel run only helps with more than one CPU core.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from arcenciel_link.utils import sha256_of_file  # noqa: E402
+
+
+def _legacy(p: Path) -> str:
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _evict(files: list[Path]) -> None:
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for p in files:
+        with open(p, "rb") as f:
+            os.fsync(f.fileno())
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def _run(label: str, fn, files: list[Path], workers: int, total_mb: float) -> None:
+    _evict(files)
+    start = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(fn, files))
+    else:
+        for p in files:
+            fn(p)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:7.2f} s  {total_mb / elapsed:8.1f} MB/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dir", nargs="?")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    print(f"{args.files} x {args.size_mb} MiB, {os.cpu_count()} CPUs")
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        files = []
+        block = os.urandom(1024 * 1024)
+        for i in range(args.files):
+            p = Path(tmp) / f"bench_{i}.bin"
+            with open(p, "wb") as f:
+                for _ in range(args.size_mb):
+                    f.write(block)
+            files.append(p)
+        total_mb = args.files * args.size_mb
+
+        _run("legacy 1 MiB read loop", _legacy, files, 1, total_mb)
+        _run("sha256_of_file", sha256_of_file, files, 1, total_mb)
+        _run(f"sha256_of_file x{args.workers}", sha256_of_file, files, args.workers, total_mb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Measure import time and ``startup()`` latency of the extension.
+
+    python scripts/bench_startup.py [--runs 5]
+
+Every run uses a fresh interpreter.  ``startup()`` runs against a stand-in
+``modules.script_callbacks`` with the bridge disabled, no Link Key and an
+unreachable dev backend, so it measures only the work on the WebUI's
+startup path.  The probe also reports which heavy modules and how many
+threads the imports alone pulled in; ``tests/test_link_v2.py`` tracks both.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("PIL", "fastapi", "pydantic", "uvicorn", "websockets", "asyncio")
+
+_PROBE = """
+import json, sys, threading, time, types
+
+t0 = time.perf_counter()
+import arcenciel_link.downloader
+imported = time.perf_counter() - t0
+heavy = sorted(m for m in HEAVY if m in sys.modules)
+threads = threading.active_count()
+
+import arcenciel_link
+import arcenciel_link.config as config
+
+# keep the debug log in the throwaway WebUI folder
+arcenciel_link.client._LOG_FILE = "client-debug.log"
+
+_load = config.load
+config.load = lambda: {**_load(), "bridge_port": 0, "link_key": "", "transport": "threads"}
+callbacks = types.ModuleType("modules.script_callbacks")
+callbacks.on_app_created = lambda fn: None
+sys.modules["modules"] = types.ModuleType("modules")
+sys.modules["modules.script_callbacks"] = callbacks
+t0 = time.perf_counter()
+arcenciel_link.startup()
+started = time.perf_counter() - t0
+print(json.dumps({"import_s": imported, "startup_s": started, "heavy": heavy, "threads": threads}))
+"""
+
+
+def probe() -> dict:
+    with tempfile.TemporaryDirectory() as webui_root:
+        env = dict(os.environ)
+        env.update(
+            PYTHONPATH=str(ROOT),
+            SD_WEBUI_ROOT=webui_root,
+            ARCENCIEL_DEV="1",
+            ARCENCIEL_LINK_URL="http://127.0.0.1:9/api/link",
+        )
+        env.pop("COMMANDLINE_ARGS", None)
+        code = f"HEAVY = {HEAVY_MODULES!r}\n" + _PROBE
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=webui_root, env=env, capture_output=True, text=True, check=True
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [probe() for _ in range(args.runs)]
+    imports = [r["import_s"] * 1000 for r in results]
+    startups = [r["startup_s"] * 1000 for r in results]
+    print(f"import arcenciel_link.downloader  median {statistics.median(imports):7.1f} ms  max {max(imports):7.1f} ms")
+    print(
+        f"startup()                         median {statistics.median(startups):7.1f} ms  max {max(startups):7.1f} ms"
+    )
+    print(f"heavy modules after import: {', '.join(results[-1]['heavy']) or 'none'}")
+    print(f"threads after import: {results[-1]['threads']}")
+
+
+if __name__ == "__main__":
+    main()
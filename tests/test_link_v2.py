@@ -1,9 +1,32 @@
+import hashlib
+import io
 import json
+import os
 from pathlib import Path
 
 import pytest
 
-from arcenciel_link import config, downloader, utils
+from arcenciel_link import config, downloader, store, utils
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _client_log(tmp_path_factory):
+    # not restored: the client's atexit shutdown still logs after the session
+    downloader.client._LOG_FILE = tmp_path_factory.mktemp("log") / "client-debug.log"
+    downloader.client._LOGGER = None
+
+
+@pytest.fixture(autouse=True)
+def _inventory(monkeypatch):
+    # every test starts from an empty index and nothing published
+    from arcenciel_link.inventory import INDEX
+
+    monkeypatch.setattr(INDEX, "_by_path", {})
+    monkeypatch.setattr(INDEX, "_by_hash", {})
+    monkeypatch.setattr(downloader, "_pending_added", set())
+    monkeypatch.setattr(downloader, "_pending_removed", set())
+    monkeypatch.setattr(downloader, "_inventory_published", False)
+    monkeypatch.setattr(downloader, "_published_pending", [])
 
 
 def test_private_download_grant_is_bound_to_configured_origin(monkeypatch):
@@ -52,6 +75,9 @@ def test_download_retry_forwards_grant_and_disables_redirects(monkeypatch, tmp_p
     assert calls[0][2] == {
         "request_headers": {"X-ArcEnCiel-Link-Grant": "grant"},
         "allow_redirects": False,
+        "fsync": "final",
+        "cancel": None,
+        "reserve": None,
     }
 
 
@@ -82,12 +108,44 @@ def test_hash_cache_update_does_not_reenter_inventory_lock(monkeypatch, tmp_path
     monkeypatch.setattr(utils, "CACHE_FILE", cache_file)
     monkeypatch.setattr(utils, "_CACHE_DATA", {})
 
-    hashes = utils.update_cached_hash(model, "a" * 64)
+    utils.update_cached_hash(model, "a" * 64)
 
-    assert hashes == ["a" * 64]
+    assert utils.INDEX.hash_of(model.resolve()) == "a" * 64
     assert json.loads(cache_file.read_text())[str(model.resolve())]["hash"] == "a" * 64
 
 
+def test_inventory_sync_sends_deltas_and_falls_back_to_the_full_list(monkeypatch):
+    from arcenciel_link.inventory import INDEX
+
+    client = downloader.client
+    sent = []
+    delta_ok = [True]
+    monkeypatch.setattr(client, "push_inventory", lambda hashes, pending: sent.append(("full", sorted(hashes))))
+    monkeypatch.setattr(
+        client,
+        "push_inventory_delta",
+        lambda added, removed, pending: delta_ok[0] and not sent.append(("delta", added, removed)),
+    )
+    monkeypatch.setattr(downloader, "pending_models", lambda: [])
+
+    INDEX.add("/models/a.safetensors", "a" * 64)
+    downloader._sync_inventory()
+    INDEX.add("/models/b.safetensors", "b" * 64)
+    INDEX.remove("/models/a.safetensors")
+    downloader._sync_inventory()
+    downloader._sync_inventory()
+    # a server without delta support gets the whole inventory
+    delta_ok[0] = False
+    INDEX.add("/models/c.safetensors", "c" * 64)
+    downloader._sync_inventory()
+
+    assert sent == [
+        ("full", ["a" * 64]),
+        ("delta", ["b" * 64], ["a" * 64]),
+        ("full", ["b" * 64, "c" * 64]),
+    ]
+
+
 def test_config_removes_retired_credentials_and_writes_private_file(monkeypatch, tmp_path):
     config_file = tmp_path / "config.json"
     config_file.write_text(
@@ -126,5 +184,1197 @@ def test_plural_forge_directories_are_discovered(monkeypatch, tmp_path):
     checkpoint_dir = tmp_path / "checkpoints"
     checkpoint_dir.mkdir()
     monkeypatch.setenv("COMMANDLINE_ARGS", f"--ckpt-dirs {checkpoint_dir}")
+    monkeypatch.setattr(utils, "_CMD_OPTS_OVERRIDE", None)
 
     assert checkpoint_dir in utils._get_model_dirs(Path("/unused"))
+
+    # a worker subprocess takes the folders the WebUI process handed over
+    lora_dir = tmp_path / "loras"
+    lora_dir.mkdir()
+    monkeypatch.delenv("COMMANDLINE_ARGS")
+    monkeypatch.setattr(utils, "_CMD_OPTS_OVERRIDE", {"lora_dir": None, "lora_dirs": [str(lora_dir)]})
+    assert utils._get_model_dirs_by_kind(Path("/unused"))["lora"] == [lora_dir]
+
+
+def test_model_walker_deduplicates_nested_roots_and_honours_excludes(monkeypatch, tmp_path):
+    checkpoints = tmp_path / "models" / "Stable-diffusion"
+    (checkpoints / "archive").mkdir(parents=True)
+    (checkpoints / "model.safetensors").write_bytes(b"a")
+    (checkpoints / "archive" / "old.safetensors").write_bytes(b"b")
+    (checkpoints / "notes.txt").write_text("skip")
+    monkeypatch.setenv("COMMANDLINE_ARGS", f"--ckpt-dir {checkpoints} --lora-dir {tmp_path / 'models'}")
+
+    found = [path for path, _stat in utils._iter_model_files(tmp_path)]
+    assert sorted(path.name for path in found) == ["model.safetensors", "old.safetensors"]
+
+    kept = [path.name for path, _stat in utils._iter_model_files(tmp_path, ["archive/*"])]
+    assert kept == ["model.safetensors"]
+
+
+def test_content_store_places_known_hash_without_copying(monkeypatch, tmp_path):
+    digest = "b" * 64
+    library = tmp_path / "Stable-diffusion" / "model.safetensors"
+    library.parent.mkdir()
+    library.write_bytes(b"weights")
+    monkeypatch.setattr(store, "load", lambda: {"cas_dir": str(tmp_path / "cas")})
+
+    assert store.ingest(library, digest)
+    placed = tmp_path / "Other" / "model.safetensors"
+    placed.parent.mkdir()
+
+    assert store.place(digest, placed) == "hardlink"
+    assert placed.stat().st_ino == library.stat().st_ino
+    assert store.prune() == 0
+    library.unlink()
+    placed.unlink()
+    assert store.prune() == 1
+
+
+class _FakeResponse:
+    def __init__(self, status_code, body, headers):
+        self.status_code = status_code
+        self.headers = headers
+        self.raw = io.BytesIO(body)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+    def close(self):
+        pass
+
+
+def test_download_resumes_partial_file_with_range_request(monkeypatch, tmp_path):
+    requests_seen = []
+
+    class Session:
+        def get(self, url, **options):
+            requests_seen.append(options["headers"])
+            return _FakeResponse(206, b"world", {"content-length": "5"})
+
+    monkeypatch.setattr(utils, "_SESSION", Session())
+    part = tmp_path / "model.safetensors.part"
+    part.write_bytes(b"hello ")
+    progress = []
+
+    utils.download_file("https://example.invalid/model", part, progress.append)
+
+    assert requests_seen == [{"Range": "bytes=6-", "Accept-Encoding": "identity"}]
+    assert part.read_bytes() == b"hello world"
+    assert progress[-1] == 1.0
+
+
+def test_download_reads_into_reused_buffer_and_fsyncs_once(monkeypatch, tmp_path):
+    body = os.urandom(utils.RECV_CHUNK_MIN * 5 + 3)
+    response = _FakeResponse(200, body, {"content-length": str(len(body))})
+    monkeypatch.setattr(utils, "_SESSION", type("Session", (), {"get": lambda self, url, **options: response})())
+    synced = []
+    monkeypatch.setattr(utils.os, "fsync", synced.append)
+    target = tmp_path / "model.safetensors.part"
+
+    utils.download_file("https://example.invalid/model", target, lambda _fraction: None)
+
+    assert target.read_bytes() == body
+    assert len(synced) == 1
+
+    response.headers["content-length"] = str(len(body) + 1)
+    response.raw = io.BytesIO(body)
+    with pytest.raises(IOError, match="connection closed"):
+        utils.download_file("https://example.invalid/model", target, lambda _fraction: None, fsync="none")
+    assert len(synced) == 1
+
+
+def test_download_decodes_gzip_encoded_body(monkeypatch, tmp_path):
+    import gzip
+    import socket
+    import threading
+
+    import requests
+
+    body = b"weights " * 1375
+    encoded = gzip.compress(body)
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        conn, _addr = listener.accept()
+        conn.recv(65536)
+        conn.sendall(
+            b"HTTP/1.1 200 OK\r\nContent-Encoding: gzip\r\n"
+            + f"Content-Length: {len(encoded)}\r\nConnection: close\r\n\r\n".encode()
+            + encoded
+        )
+        conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    session = requests.Session()
+    session.trust_env = False
+    monkeypatch.setattr(utils, "_SESSION", session)
+    target = tmp_path / "model.safetensors.part"
+
+    utils.download_file(f"http://127.0.0.1:{listener.getsockname()[1]}/model", target, lambda _f: None)
+    listener.close()
+
+    assert target.read_bytes() == body
+
+
+def test_journal_hands_interrupted_part_to_redispatched_job(monkeypatch, tmp_path):
+    from arcenciel_link import journal
+
+    monkeypatch.setattr(utils, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(journal, "_ENTRIES", None)
+    monkeypatch.setattr(journal, "_PARTS", None)
+    target = tmp_path / "Lora" / "style.safetensors"
+    part = target.with_name(target.name + ".part")
+    job = {"id": 4, "downloadGrant": "secret", "version": {}}
+
+    journal.record(job, url="https://example.invalid", target=target, part=part, sha256="c" * 64)
+    assert "secret" not in (tmp_path / "cache" / "jobs.json").read_text()
+    journal.update(4, state="INTERRUPTED")
+
+    assert journal.resume_target(9, "d" * 64, target.parent) is None
+    assert journal.resume_target(9, "c" * 64, target.parent) == (target, part)
+    assert journal.entries() == {}
+
+
+def test_restart_sweep_removes_only_stale_parts_this_worker_created(monkeypatch, tmp_path):
+    import time
+
+    from arcenciel_link import journal
+
+    monkeypatch.setattr(utils, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(journal, "_ENTRIES", None)
+    monkeypatch.setattr(journal, "_PARTS", None)
+    monkeypatch.setattr(config, "load", lambda: {"webui_root": str(tmp_path)})
+    monkeypatch.delenv("COMMANDLINE_ARGS", raising=False)
+    monkeypatch.setattr(downloader, "STAGING_DIR", None)
+    lora = tmp_path / "models" / "Lora"
+    lora.mkdir(parents=True)
+    ours, browser = lora / "ours.safetensors.part", lora / "browser.safetensors.part"
+    for part in (ours, browser):
+        part.write_bytes(b"half")
+    journal.record(
+        {"id": 16, "version": {}}, url="https://example.invalid", target=lora / "ours", part=ours, sha256=None
+    )
+    # the job failed and dropped its entry, but the .part stayed behind
+    journal.remove(16)
+    stale = time.time() - downloader.ORPHAN_PART_GRACE - 60
+    for part in (ours, browser):
+        os.utime(part, (stale, stale))
+
+    downloader._recover_journal()
+
+    assert not ours.exists() and browser.exists()
+    assert journal.known_parts() == set()
+
+
+def test_asyncio_engine_dispatches_jobs_and_carries_client_sends(monkeypatch):
+    pytest.importorskip("websockets")
+    import asyncio
+    import threading
+    import time
+
+    from websockets.asyncio.server import serve
+
+    from arcenciel_link import client, engine
+
+    received = []
+    processed = threading.Event()
+    ready = threading.Event()
+    loop = asyncio.new_event_loop()
+
+    async def handler(ws):
+        await ws.send(json.dumps({"type": "job", "data": {"id": 11}}))
+        await ws.send(json.dumps({"type": "control", "command": "list_subfolders", "kind": "lora"}))
+        async for raw in ws:
+            received.append(json.loads(raw))
+
+    async def main():
+        async with serve(handler, "127.0.0.1", 0) as server:
+            port.append(server.sockets[0].getsockname()[1])
+            stop.append(asyncio.Event())
+            ready.set()
+            await stop[0].wait()
+
+    port = []
+    stop = []
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(main(),), daemon=True)
+    server_thread.start()
+    assert ready.wait(5)
+
+    running = threading.Event()
+    running.set()
+    monkeypatch.setattr(downloader, "RUNNING", running)
+    monkeypatch.setattr(downloader, "_recover_once", lambda: None)
+    monkeypatch.setattr(
+        downloader, "_process_job", lambda job: (client.report_progress(job["id"], progress=50), processed.set())
+    )
+    monkeypatch.setattr(client, "_WS_URL", f"ws://127.0.0.1:{port[0]}/ws")
+    monkeypatch.setattr(client, "LINK_KEY", "")
+    monkeypatch.setattr(client, "_socket_enabled", True)
+    # control messages read config files and the keyring, so they must not run on the loop
+    controlled = []
+    monkeypatch.setattr(client, "_handle_control", lambda msg: controlled.append(threading.current_thread().name))
+
+    assert engine.start_engine(max_downloads=1) is not None
+    try:
+        assert processed.wait(5)
+        deadline = time.monotonic() + 5
+        while not controlled and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert controlled and controlled[0].startswith("arcenciel-link-control")
+        deadline = time.monotonic() + 5
+        while not any(message.get("type") == "progress" for message in received) and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert {"type": "progress", "jobId": 11, "progress": 50, "state": None, "message": None} in received
+    finally:
+        monkeypatch.setattr(client, "_socket_enabled", False)
+        engine.stop_engine()
+        loop.call_soon_threadsafe(stop[0].set)
+        server_thread.join(5)
+
+
+def test_wire_switches_to_msgpack_only_after_server_accepts_it():
+    msgpack = pytest.importorskip("msgpack")
+    from arcenciel_link import version, wire
+
+    assert version.MSGPACK_CAPABILITY in version.CAPABILITIES
+    payload = {"type": "inventory", "hashes": ["ab" * 32]}
+    try:
+        wire.reset()
+        assert json.loads(wire.encode(payload)) == payload
+
+        wire.set_peer_capabilities([version.MSGPACK_CAPABILITY])
+        encoded = wire.encode(payload)
+        assert isinstance(encoded, bytes)
+        assert msgpack.unpackb(encoded)["hashes"] == [bytes.fromhex("ab" * 32)]
+        assert wire.decode(msgpack.packb({"type": "job", "data": {"id": 1}})) == {"type": "job", "data": {"id": 1}}
+    finally:
+        wire.reset()
+
+
+def test_inventory_index_tracks_paths_and_notifies_hash_changes():
+    from arcenciel_link.inventory import InventoryIndex
+
+    index = InventoryIndex()
+    events = []
+    index.subscribe(lambda added, removed: events.append((added, removed)))
+    first, second = "1" * 64, "2" * 64
+
+    index.add("/models/a.safetensors", first)
+    index.add("/models/copy/a.safetensors", first)
+    index.update([("/models/a.safetensors", first), ("/models/b.safetensors", second)], prune=True)
+
+    assert index.contains(first) and index.contains(second)
+    assert index.paths(first) == [Path("/models/a.safetensors")]
+    assert index.hash_of("/models/b.safetensors") == second
+    index.remove("/models/a.safetensors")
+    assert not index.contains(first)
+    assert events == [([first], []), ([second], []), ([], [first])]
+
+
+def test_first_scan_publishes_cached_hashes_before_hashing_new_files(monkeypatch, tmp_path):
+    from arcenciel_link.inventory import INDEX
+
+    models = tmp_path / "models" / "Stable-diffusion"
+    models.mkdir(parents=True)
+    cached, fresh = models / "cached.safetensors", models / "fresh.safetensors"
+    cached.write_bytes(b"cached")
+    fresh.write_bytes(b"fresh")
+    cached_hash = "e" * 64
+    fresh_hash = utils.sha256_of_file(fresh)
+    monkeypatch.delenv("COMMANDLINE_ARGS", raising=False)
+    monkeypatch.setattr(config, "load", lambda: {"webui_root": str(tmp_path)})
+    monkeypatch.setattr(utils, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(utils, "CACHE_FILE", tmp_path / "cache" / "hashes.json")
+    monkeypatch.setattr(
+        utils, "_CACHE_DATA", {str(cached.resolve()): {"mtime": int(cached.stat().st_mtime), "hash": cached_hash}}
+    )
+    monkeypatch.setattr(utils, "PUBLISH_BATCH_FILES", 1)
+    snapshots = []
+
+    hashes = utils.list_model_hashes(
+        on_batch=lambda: snapshots.append((INDEX.contains(cached_hash), INDEX.contains(fresh_hash)))
+    )
+
+    assert sorted(hashes) == sorted([cached_hash, fresh_hash])
+    # cached hashes, then the pending fingerprint of the new file, then its full hash
+    assert snapshots == [(True, False), (True, False), (True, True)]
+    assert not utils.scan_in_progress()
+
+
+def test_scan_reuses_and_writes_back_webui_cache_hashes(monkeypatch, tmp_path):
+    models = tmp_path / "models" / "Stable-diffusion"
+    models.mkdir(parents=True)
+    known, fresh = models / "known.safetensors", models / "fresh.safetensors"
+    known.write_bytes(b"known")
+    fresh.write_bytes(b"fresh")
+    known_hash = "a" * 64
+    fresh_hash = utils.sha256_of_file(fresh)
+    webui_cache = tmp_path / "cache.json"
+    webui_cache.write_text(
+        json.dumps({"hashes": {"checkpoint/known.safetensors": {"mtime": known.stat().st_mtime, "sha256": known_hash}}})
+    )
+    monkeypatch.delenv("COMMANDLINE_ARGS", raising=False)
+    monkeypatch.delenv("SD_WEBUI_CACHE_FILE", raising=False)
+    monkeypatch.setattr(config, "load", lambda: {"webui_root": str(tmp_path)})
+    monkeypatch.setattr(utils, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(utils, "CACHE_FILE", tmp_path / "cache" / "hashes.json")
+    monkeypatch.setattr(utils, "_CACHE_DATA", {})
+    hashed = []
+    real_sha256 = utils.sha256_of_file
+    monkeypatch.setattr(utils, "sha256_of_file", lambda path: hashed.append(path.name) or real_sha256(path))
+
+    hashes = utils.list_model_hashes()
+
+    assert sorted(hashes) == sorted([known_hash, fresh_hash])
+    assert hashed == ["fresh.safetensors"]
+    section = json.loads(webui_cache.read_text())["hashes"]
+    assert section["checkpoint/fresh.safetensors"]["sha256"] == fresh_hash
+    assert section["checkpoint/known.safetensors"]["sha256"] == known_hash
+
+
+def test_webui_stem_hash_is_not_reused_when_a_hashed_file_shares_the_stem(monkeypatch, tmp_path):
+    from arcenciel_link import forge_cache
+
+    first, second = tmp_path / "a" / "foo.safetensors", tmp_path / "b" / "foo.safetensors"
+    for path in (first, second):
+        path.parent.mkdir()
+        path.write_bytes(b"weights")
+    (tmp_path / "cache.json").write_text(json.dumps({"hashes": {"lora/foo": {"mtime": 2e9, "sha256": "f" * 64}}}))
+    monkeypatch.delenv("SD_WEBUI_CACHE_FILE", raising=False)
+    dirs = {"lora": [first.parent, second.parent]}
+    todo = [(second, second.stat())]
+
+    assert forge_cache.seed_hashes(todo, dirs, tmp_path) == {str(second): "f" * 64}
+    assert forge_cache.seed_hashes(todo, dirs, tmp_path, [str(first), str(second)]) == {}
+
+
+def test_hashes_are_written_back_through_the_process_that_owns_the_webui_cache(monkeypatch, tmp_path):
+    import sys
+    import types
+
+    from arcenciel_link import forge_cache
+
+    model = tmp_path / "Lora" / "style.safetensors"
+    model.parent.mkdir()
+    model.write_bytes(b"weights")
+    dirs = {"lora": [model.parent]}
+    monkeypatch.delenv("SD_WEBUI_CACHE_FILE", raising=False)
+
+    # a worker subprocess forwards the entries to the WebUI process
+    forwarded = []
+    monkeypatch.setattr(forge_cache, "FORWARD", forwarded.extend)
+    assert forge_cache.write_back([(model, 5.0, "a" * 64)], dirs, tmp_path) == 0
+    assert forwarded == [(str(model), 5.0, "a" * 64)]
+
+    # inside the WebUI its in-memory cache is updated and saved by the WebUI itself
+    sections, dumps = {"hashes": {}}, []
+    webui_cache = types.SimpleNamespace(cache=sections.__getitem__, dump_cache=lambda: dumps.append(1))
+    monkeypatch.setitem(sys.modules, "modules", types.SimpleNamespace(cache=webui_cache))
+    monkeypatch.setitem(sys.modules, "modules.cache", webui_cache)
+    assert forge_cache.write_back([(model, 2e9, "a" * 64)], dirs, tmp_path) == 1
+    assert sections["hashes"] == {"lora/style": {"mtime": 2e9, "sha256": "a" * 64}}
+    assert dumps == [1] and not (tmp_path / "cache.json").exists()
+    assert forge_cache.seed_hashes([(model, model.stat())], dirs, tmp_path) == {str(model): "a" * 64}
+
+
+def test_touched_and_new_files_stay_pending_until_fully_rehashed(monkeypatch, tmp_path):
+    models = tmp_path / "models" / "Stable-diffusion"
+    models.mkdir(parents=True)
+    touched, edited, new = (models / f"{name}.safetensors" for name in ("touched", "edited", "new"))
+    for path in (touched, edited, new):
+        header = json.dumps({"w": {"dtype": "F16", "shape": [4], "data_offsets": [0, 8]}}).encode()
+        path.write_bytes(len(header).to_bytes(8, "little") + header + path.name.encode().ljust(8))
+    entries = {
+        str(path.resolve()): utils._cache_entry(path.stat(), utils.sha256_of_file(path)) for path in (touched, edited)
+    }
+    os.utime(touched, (1, 1))
+    edited.write_bytes(edited.read_bytes()[:-1] + b"!")
+    os.utime(edited, (1, 1))
+    monkeypatch.delenv("COMMANDLINE_ARGS", raising=False)
+    monkeypatch.setattr(config, "load", lambda: {"webui_root": str(tmp_path), "forge_cache_sync": False})
+    monkeypatch.setattr(utils, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(utils, "CACHE_FILE", tmp_path / "cache" / "hashes.json")
+    monkeypatch.setattr(utils, "_CACHE_DATA", entries)
+    hashed, pending = [], []
+    real_sha256 = utils.sha256_of_file
+    monkeypatch.setattr(utils, "sha256_of_file", lambda path: hashed.append(path.name) or real_sha256(path))
+
+    utils.list_model_hashes(on_batch=lambda: pending.append(len(utils.pending_models())))
+
+    # a matching fingerprint only samples the file, so the touched one is rehashed too
+    assert sorted(hashed) == ["edited.safetensors", "new.safetensors", "touched.safetensors"]
+    assert pending[1] == 3 and utils.pending_models() == []
+    assert utils._CACHE_DATA[str(touched.resolve())]["mtime"] == 1
+    assert utils._CACHE_DATA[str(edited.resolve())]["hash"] == real_sha256(edited)
+
+
+def test_manifest_round_trip_adopts_only_matching_files(monkeypatch, tmp_path):
+    from arcenciel_link import manifest
+
+    models = tmp_path / "models" / "Lora"
+    models.mkdir(parents=True)
+    same, changed = models / "same.safetensors", models / "changed.safetensors"
+    same.write_bytes(b"same")
+    changed.write_bytes(b"changed")
+    monkeypatch.delenv("COMMANDLINE_ARGS", raising=False)
+    monkeypatch.setattr(config, "load", lambda: {"webui_root": str(tmp_path)})
+    monkeypatch.setattr(utils, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(utils, "CACHE_FILE", tmp_path / "cache" / "hashes.json")
+    monkeypatch.setattr(
+        utils,
+        "_CACHE_DATA",
+        {str(p.resolve()): utils._cache_entry(p.stat(), utils.sha256_of_file(p)) for p in (same, changed)},
+    )
+    exported = manifest.export_manifest(b"secret")
+    assert {item["path"] for item in exported["entries"]} == {
+        "models/Lora/same.safetensors",
+        "models/Lora/changed.safetensors",
+    }
+
+    monkeypatch.setattr(utils, "_CACHE_DATA", {})
+    os.utime(changed, ns=(1, 1))
+    with pytest.raises(ValueError, match="signature"):
+        manifest.import_manifest(exported, b"other")
+    tampered = {**exported, "entries": [dict(exported["entries"][0], sha256="0" * 64)] + exported["entries"][1:]}
+    with pytest.raises(ValueError, match="checksum"):
+        manifest.import_manifest(tampered)
+
+    assert manifest.import_manifest(exported, b"secret") == {"imported": 1, "skipped": 1}
+    assert list(utils._CACHE_DATA) == [str(same.resolve())]
+
+    outside = tmp_path / "outside.safetensors"
+    outside.write_bytes(b"outside")
+    st = outside.stat()
+    foreign = [
+        {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": "1" * 64}
+        for path in ("models/Lora/../../outside.safetensors", str(outside))
+    ]
+    forged = manifest.export_manifest()
+    forged["entries"] = foreign
+    forged["checksum"] = hashlib.sha256(manifest._canonical(foreign)).hexdigest()
+    assert manifest.import_manifest(forged) == {"imported": 0, "skipped": 2}
+
+
+def test_sha256_of_file_matches_hashlib_across_threads(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    files = []
+    for i in range(3):
+        path = tmp_path / f"model_{i}.safetensors"
+        path.write_bytes(os.urandom(utils.HASH_BUFFER + i * 7 + 3))
+        files.append(path)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        digests = list(pool.map(utils.sha256_of_file, files + files))
+
+    expected = [hashlib.sha256(path.read_bytes()).hexdigest() for path in files]
+    assert digests == expected + expected
+
+
+def test_io_budget_delays_readers_beyond_one_second_of_burst(monkeypatch):
+    from arcenciel_link import priority
+
+    clock = [100.0]
+    slept = []
+    monkeypatch.setattr(priority.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(priority.time, "sleep", slept.append)
+    budget = priority.IOBudget(1)
+
+    budget.consume(512 * 1024)
+    budget.consume(512 * 1024)
+    assert slept == []
+    budget.consume(1024 * 1024)
+    assert slept == [pytest.approx(1.0)]
+    priority.IOBudget(0).consume(10**9)
+    assert len(slept) == 1
+
+
+def test_busy_gate_pauses_until_probe_reports_idle(monkeypatch):
+    from arcenciel_link import busy
+
+    states = iter([True, True, False])
+    slept = []
+    monkeypatch.setattr(busy, "_policy", "pause")
+    monkeypatch.setattr(busy, "PROBE_TTL", 0)
+    monkeypatch.setattr(busy.time, "sleep", slept.append)
+    busy.set_probe(lambda: next(states))
+    try:
+        busy.gate(1024)
+    finally:
+        busy.set_probe(None)
+
+    assert slept == [busy.PAUSE_POLL]
+    assert busy.is_busy() is False
+
+
+def test_worker_process_channel_round_trips_calls_and_errors(monkeypatch):
+    import threading
+    from multiprocessing.connection import Listener
+
+    import arcenciel_link
+    from arcenciel_link import busy, forge_cache, isolation
+
+    started = []
+    monkeypatch.setattr(arcenciel_link, "_start_link_services", started.append)
+    monkeypatch.setattr(utils, "_CMD_OPTS_OVERRIDE", None)
+    monkeypatch.setattr(forge_cache, "FORWARD", None)
+    # main() installs its own busy probe
+    monkeypatch.setattr(busy, "_probe", busy._probe)
+    authkey = os.urandom(32)
+    listener = Listener(("127.0.0.1", 0), authkey=authkey)
+    host, port = listener.address
+    monkeypatch.setenv(isolation.ADDRESS_ENV, f"{host}:{port}")
+    monkeypatch.setenv(isolation.AUTHKEY_ENV, authkey.hex())
+    parent = isolation.WorkerProcess()
+    threading.Thread(target=parent._serve, args=(listener, {"lora_dir": "/models/lora"}), daemon=True).start()
+    child = threading.Thread(target=isolation.main, daemon=True)
+    child.start()
+
+    assert parent.call("status") == {"running": False}
+    assert utils._cmd_opts() == {"lora_dir": "/models/lora"}
+    assert len(started) == 1
+    with pytest.raises(ValueError, match="manifest"):
+        parent.call("manifest_import", manifest={})
+    # a reply nobody waits for any more is dropped
+    with pytest.raises(isolation.WorkerUnavailable, match="did not answer"):
+        parent.call("status", timeout=0)
+    parent.call("status")
+    assert parent._replies == {} and parent._waiting == set()
+    parent.stop()
+    child.join(timeout=5)
+    assert not child.is_alive()
+
+    # the routes answer 503 instead of failing with a bare 500
+    from fastapi import HTTPException
+
+    from arcenciel_link import server
+
+    monkeypatch.setattr(server, "_require_local_ui", lambda request: None)
+    monkeypatch.setattr(server, "get_worker_process", lambda: parent)
+    with pytest.raises(HTTPException) as failed:
+        server.export_manifest(None)
+    assert failed.value.status_code == 503
+
+
+def test_cli_routes_manifest_subcommand(monkeypatch, tmp_path):
+    from arcenciel_link.__main__ import main
+
+    monkeypatch.setattr(config, "load", lambda: {"webui_root": str(tmp_path)})
+    monkeypatch.setattr(utils, "_CACHE_DATA", {})
+    monkeypatch.delenv("ARCENCIEL_MANIFEST_KEY", raising=False)
+    target = tmp_path / "library.json"
+
+    assert main(["manifest", "export", str(target)]) == 0
+    assert json.loads(target.read_text())["entries"] == []
+
+
+def test_daemon_prefers_explicit_webui_root_over_config(monkeypatch, tmp_path):
+    import signal
+
+    import arcenciel_link
+    from arcenciel_link.__main__ import main
+
+    started = []
+    monkeypatch.setattr(config, "load", lambda: {"webui_root": "/from/config", "bridge_port": 0})
+    monkeypatch.setattr(arcenciel_link, "_start_link_services", started.append)
+    monkeypatch.setattr(utils, "_WEBUI_ROOT_OVERRIDE", None)
+    # recorded so monkeypatch restores it after main() sets it
+    monkeypatch.setenv("SD_WEBUI_ROOT", "")
+    # stop as soon as the shutdown handlers are installed
+    monkeypatch.setattr(signal, "signal", lambda _sig, handler: handler())
+    monkeypatch.setattr(downloader.client, "_shutdown", lambda: None)
+
+    assert main(["--webui-root", str(tmp_path)]) == 0
+    assert len(started) == 1
+    assert os.environ["SD_WEBUI_ROOT"] == str(tmp_path)
+    assert utils._webui_root(config.load()) == tmp_path
+
+
+def test_import_and_startup_stay_light():
+    from scripts.bench_startup import probe
+
+    result = probe()
+
+    # timings are left to scripts/bench_startup.py
+    assert result["heavy"] == []
+    assert result["threads"] == 1
+
+
+def test_config_load_is_cached_until_file_changes_or_save(monkeypatch, tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"min_free_mb": 100}))
+    lookups = []
+    monkeypatch.setattr(config, "_CFG", config_file)
+    monkeypatch.setattr(config, "_cached", None)
+    monkeypatch.setattr(config, "is_secure_storage_available", lambda: False)
+    monkeypatch.setattr(config, "get_secret", lambda key: lookups.append(key))
+    monkeypatch.setattr(config, "set_secret", lambda _key, _value: None)
+    monkeypatch.setattr(config, "migrate_legacy_secret", lambda _key, _value: None)
+
+    first = config.load()
+    first["min_free_mb"] = 1
+    assert config.load()["min_free_mb"] == 100
+    assert lookups == ["link_key"]
+
+    config_file.write_text(json.dumps({"min_free_mb": 200, "scan_exclude": ["a"]}))
+    os.utime(config_file, ns=(1, 1))
+    assert config.load()["min_free_mb"] == 200
+    config.save({**config.load(), "min_free_mb": 300})
+    assert config.load()["min_free_mb"] == 300
+    assert len(lookups) == 3
+
+
+def test_keyring_backend_and_secrets_are_looked_up_once(monkeypatch):
+    from arcenciel_link import secure_store
+
+    calls = []
+
+    class Backend:
+        def get_password(self, service, key):
+            calls.append(("get", key))
+            return " lk_secret "
+
+        def set_password(self, service, key, value):
+            calls.append(("set", key))
+
+    monkeypatch.setattr(secure_store, "_backend", Backend())
+    monkeypatch.setattr(secure_store, "_secrets", {})
+
+    assert secure_store.get_secret("link_key") == "lk_secret"
+    assert secure_store.get_secret("link_key") == "lk_secret"
+    secure_store.set_secret("link_key", "lk_secret")
+    secure_store.set_secret("link_key", "lk_other")
+    assert secure_store.get_secret("link_key") == "lk_other"
+    assert calls == [("get", "link_key"), ("set", "link_key")]
+
+
+def test_idle_worker_wakes_on_job_arrival_and_disable(monkeypatch):
+    import threading
+    import time
+
+    client = downloader.client
+    monkeypatch.setattr(client, "_socket_enabled", False)
+    monkeypatch.setattr(client, "_active_engine", lambda: None)
+    got = []
+
+    def consume():
+        got.append(client.queue_next_job(timeout=30))
+        got.append(time.monotonic())
+
+    waiter = threading.Thread(target=consume, daemon=True)
+    waiter.start()
+    time.sleep(0.1)
+    sent = time.monotonic()
+    client.enqueue_job({"id": 7})
+    waiter.join(timeout=5)
+    assert got[0] == {"id": 7}
+    # woken by the arrival, not by the next safety-net poll
+    assert got[1] - sent < client.POLL_INTERVAL / 2
+
+    waiter = threading.Thread(target=consume, daemon=True)
+    waiter.start()
+    time.sleep(0.1)
+    client.wake_dispatcher()
+    waiter.join(timeout=5)
+    assert got[2] is None
+
+
+def test_cancel_control_aborts_transfer_without_retry_and_reports_cancelled(monkeypatch, tmp_path):
+    from arcenciel_link import cancellation, journal
+    from arcenciel_link.cancellation import Cancelled
+
+    client = downloader.client
+    body = os.urandom(utils.RECV_CHUNK_MIN * 4)
+    attempts = []
+
+    class Body(io.BytesIO):
+        def readinto(self, buffer):
+            if self.tell():
+                client._handle_control({"type": "control", "command": "cancel", "jobId": 9})
+            return super().readinto(buffer)
+
+    def get(url, **options):
+        attempts.append(url)
+        response = _FakeResponse(200, b"", {"content-length": str(len(body))})
+        response.raw = Body(body)
+        return response
+
+    monkeypatch.setattr(utils, "_SESSION", type("Session", (), {"get": lambda self, url, **options: get(url)})())
+    monkeypatch.setattr(utils, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(journal, "_ENTRIES", None)
+    monkeypatch.setattr(journal, "_PARTS", None)
+    reports = []
+    monkeypatch.setattr(client, "report_progress", lambda job_id, **fields: reports.append((job_id, fields)))
+    part = tmp_path / "model.safetensors.part"
+    token = cancellation.token_for(9)
+    try:
+        with pytest.raises(Cancelled):
+            downloader._download_with_retry("https://example.invalid/model", part, lambda _f: None, cancel=token)
+        assert attempts == ["https://example.invalid/model"]
+        assert 0 < part.stat().st_size < len(body)
+
+        downloader._cancel_job({"id": 9}, part)
+    finally:
+        cancellation.release(9)
+
+    assert not part.exists()
+    assert reports == [(9, {"state": "CANCELLED"})]
+
+
+def test_cancel_shuts_down_a_stalled_socket_and_interrupts_busy_pause(monkeypatch, tmp_path):
+    import socket
+    import threading
+    import time
+
+    import requests
+
+    from arcenciel_link import busy, cancellation
+    from arcenciel_link.cancellation import Cancelled
+
+    listener = socket.create_server(("127.0.0.1", 0))
+    stalled = threading.Event()
+
+    def serve():
+        conn, _addr = listener.accept()
+        conn.recv(65536)
+        conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 1000000\r\n\r\n" + b"x" * 1000)
+        stalled.wait(10)
+        conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    session = requests.Session()
+    session.trust_env = False
+    monkeypatch.setattr(utils, "_SESSION", session)
+    token = cancellation.CancelToken()
+    errors = []
+
+    def download():
+        try:
+            utils.download_file(
+                f"http://127.0.0.1:{listener.getsockname()[1]}/model",
+                tmp_path / "m.part",
+                lambda _f: None,
+                cancel=token,
+            )
+        except Exception as exc:
+            errors.append(exc)
+
+    worker = threading.Thread(target=download, daemon=True)
+    worker.start()
+    deadline = time.monotonic() + 5
+    while not (tmp_path / "m.part").exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    token.cancel()
+    worker.join(timeout=5)
+    stalled.set()
+    listener.close()
+    # the read timeout is 60 s, so only the socket shutdown can end it this soon
+    assert not worker.is_alive()
+    assert isinstance(errors[0], Cancelled)
+
+    # without a reachable socket the response is closed instead
+    closed = threading.Event()
+    utils._abort_response(type("Response", (), {"raw": object(), "close": lambda self: closed.set()})())
+    assert closed.wait(5)
+
+    # a generating WebUI holds a paused transfer, but not past a cancel
+    monkeypatch.setattr(busy, "_policy", "pause")
+    busy.set_probe(lambda: True)
+    try:
+        paused = cancellation.CancelToken()
+        threading.Timer(0.05, paused.cancel).start()
+        busy.gate(1024, paused)
+    finally:
+        busy.set_probe(None)
+    assert paused.cancelled
+
+
+def test_cancel_is_kept_only_for_jobs_this_worker_holds(monkeypatch):
+    import queue
+
+    from arcenciel_link import cancellation
+
+    client = downloader.client
+    acks = []
+    monkeypatch.setattr(client, "_send_control_ack", acks.append)
+    monkeypatch.setattr(client, "_active_engine", lambda: None)
+    monkeypatch.setattr(client, "_job_queue", queue.Queue())
+    monkeypatch.setattr(client, "wake_dispatcher", lambda: None)
+
+    client._handle_control({"type": "control", "command": "cancel", "jobId": 404})
+    assert acks[-1]["ok"] is False
+    assert "404" not in cancellation._TOKENS
+
+    client.enqueue_job({"id": 21})
+    client._handle_control({"type": "control", "command": "cancel", "jobId": 21})
+    assert acks[-1]["ok"] is True
+    try:
+        assert cancellation.token_for(21).cancelled
+    finally:
+        cancellation.release(21)
+    assert "21" not in cancellation._TOKENS and "21" not in cancellation._QUEUED
+
+
+def test_pausing_worker_keeps_part_and_resume_continues_with_range(monkeypatch, tmp_path):
+    from arcenciel_link import journal
+
+    client = downloader.client
+    body = os.urandom(utils.RECV_CHUNK_MIN * 4)
+    ranges = []
+
+    class Body(io.BytesIO):
+        def readinto(self, buffer):
+            if self.tell() and not ranges[-1]:
+                downloader.toggle_worker(False)
+            return super().readinto(buffer)
+
+    def get(url, **options):
+        offset = int((options.get("headers") or {}).get("Range", "bytes=0-")[6:-1])
+        ranges.append(offset)
+        response = _FakeResponse(206 if offset else 200, b"", {"content-length": str(len(body) - offset)})
+        response.raw = Body(body[offset:])
+        return response
+
+    monkeypatch.setattr(
+        utils, "_SESSION", type("Session", (), {"get": lambda self, url, **options: get(url, **options)})()
+    )
+    monkeypatch.setattr(utils, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(journal, "_ENTRIES", None)
+    monkeypatch.setattr(journal, "_PARTS", None)
+    monkeypatch.setattr(downloader, "model_paths_for_target", lambda _target: [tmp_path / "Lora"])
+    monkeypatch.setattr(downloader, "MIN_FREE_MB", 0)
+    monkeypatch.setattr(downloader, "start_worker", lambda: None)
+    monkeypatch.setattr(client, "_active_engine", lambda: None)
+    monkeypatch.setattr(client, "report_progress", lambda job_id, **fields: None)
+    requeued = []
+    monkeypatch.setattr(client, "enqueue_job", requeued.append)
+    finished = []
+    monkeypatch.setattr(downloader, "_finish_job", lambda job, meta, path, sha: finished.append((path, sha)))
+    job = {
+        "id": 11,
+        "targetPath": "lora",
+        "version": {"externalDownloadUrl": "https://example.invalid/style.safetensors"},
+    }
+    downloader.RUNNING.set()
+    try:
+        downloader._process_job(job)
+        part = tmp_path / "Lora" / "style.safetensors.part"
+        paused_at = part.stat().st_size
+        assert 0 < paused_at < len(body)
+        assert journal.entries()["11"]["state"] == "PAUSED"
+
+        downloader.toggle_worker(True)
+        assert requeued == [job]
+        downloader._process_job(job)
+    finally:
+        downloader.RUNNING.clear()
+
+    assert ranges == [0, paused_at]
+    assert (tmp_path / "Lora" / "style.safetensors").read_bytes() == body
+    assert finished[0][1] == hashlib.sha256(body).hexdigest()
+
+
+def test_resuming_hands_paused_private_jobs_back_to_the_server(monkeypatch, tmp_path):
+    from arcenciel_link import journal
+
+    client = downloader.client
+    monkeypatch.setattr(utils, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(journal, "_ENTRIES", None)
+    monkeypatch.setattr(journal, "_PARTS", None)
+    monkeypatch.setattr(downloader, "_PAUSED", {})
+    monkeypatch.setattr(downloader, "start_worker", lambda: None)
+    reports, requeued = [], []
+    monkeypatch.setattr(client, "report_progress", lambda job_id, **fields: reports.append((job_id, fields)))
+    monkeypatch.setattr(client, "enqueue_job", requeued.append)
+    private = {"id": 14, "downloadGrant": "g" * 40, "version": {}}
+    public = {"id": 15, "version": {}}
+    for job in (private, public):
+        target = tmp_path / "Lora" / f"{job['id']}.safetensors"
+        part = target.with_name(target.name + ".part")
+        part.parent.mkdir(exist_ok=True)
+        part.write_bytes(b"half")
+        journal.record(job, url="https://example.invalid", target=target, part=part, sha256="e" * 64)
+        downloader._pause_job(job, part)
+
+    downloader.toggle_worker(True)
+    downloader.RUNNING.clear()
+
+    assert requeued == [public]
+    assert journal.entries()["14"]["state"] == "INTERRUPTED"
+    assert (tmp_path / "Lora" / "14.safetensors.part").exists()
+    assert (14, {"state": "ERROR", "message": "Download interrupted by pause"}) in reports
+
+
+def test_cancel_for_paused_job_discards_its_part_at_once(monkeypatch, tmp_path):
+    from arcenciel_link import cancellation, journal
+
+    client = downloader.client
+    monkeypatch.setattr(utils, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(journal, "_ENTRIES", None)
+    monkeypatch.setattr(journal, "_PARTS", None)
+    monkeypatch.setattr(downloader, "_PAUSED", {})
+    acks, reports = [], []
+    monkeypatch.setattr(client, "_send_control_ack", acks.append)
+    monkeypatch.setattr(client, "report_progress", lambda job_id, **fields: reports.append((job_id, fields)))
+    job = {"id": 13, "version": {}}
+    target = tmp_path / "Lora" / "style.safetensors"
+    part = target.with_name(target.name + ".part")
+    part.parent.mkdir()
+    part.write_bytes(b"half")
+    journal.record(job, url="https://example.invalid", target=target, part=part, sha256=None)
+    downloader._pause_job(job, part)
+
+    client._handle_control({"type": "control", "command": "cancel", "jobId": 13})
+
+    assert acks[-1]["ok"] is True
+    assert downloader._PAUSED == {} and journal.entries() == {}
+    assert not part.exists()
+    assert reports[-1] == (13, {"state": "CANCELLED"})
+    assert "13" not in cancellation._TOKENS
+
+
+def test_space_reservations_count_other_active_jobs_and_fail_before_transfer(monkeypatch, tmp_path):
+    mib = 1024 * 1024
+    monkeypatch.setattr(downloader, "MIN_FREE_MB", 10)
+    monkeypatch.setattr(downloader.shutil, "disk_usage", lambda _path: type("Usage", (), {"free": 100 * mib})())
+    monkeypatch.setattr(downloader, "_SPACE_RESERVED", {})
+
+    downloader._reserve_space(1, tmp_path / "first.safetensors.part", 60 * mib)
+    with pytest.raises(utils.InsufficientSpace, match="second.safetensors needs 50 MB"):
+        downloader._reserve_space(2, tmp_path / "second.safetensors.part", 40 * mib)
+    downloader._release_space(1)
+    downloader._reserve_space(2, tmp_path / "second.safetensors.part", 40 * mib)
+
+    body = b"x" * 4096
+    calls = []
+
+    def get(url, **options):
+        calls.append(url)
+        return _FakeResponse(200, body, {"content-length": str(len(body))})
+
+    monkeypatch.setattr(utils, "_SESSION", type("Session", (), {"get": lambda self, url, **options: get(url)})())
+    part = tmp_path / "third.safetensors.part"
+    with pytest.raises(utils.InsufficientSpace):
+        downloader._download_with_retry(
+            "https://example.invalid/third",
+            part,
+            lambda _f: None,
+            reserve=lambda total: downloader._reserve_space(3, part, total * 16 * 1024),
+        )
+    assert calls == ["https://example.invalid/third"]
+    assert not part.exists()
+
+    # a resumed attempt that no longer fits drops its .part along with the job
+    part.write_bytes(b"x" * 100)
+    with pytest.raises(utils.InsufficientSpace):
+        downloader._download_with_retry(
+            "https://example.invalid/third",
+            part,
+            lambda _f: None,
+            reserve=lambda total: downloader._reserve_space(3, part, total * 16 * 1024),
+        )
+    assert not part.exists()
+
+
+def test_placement_policies_spread_downloads_across_model_folders(monkeypatch, tmp_path):
+    import threading
+
+    mib = 1024 * 1024
+    fast, big, spare = (tmp_path / name for name in ("ssd", "hdd", "spare"))
+    for folder in (fast, big, spare):
+        folder.mkdir()
+    monkeypatch.setattr(utils, "_CMD_OPTS_OVERRIDE", None)
+    monkeypatch.setenv("COMMANDLINE_ARGS", f"--lora-dirs {fast} --lora-dirs {big} --lora-dirs {spare}")
+    candidates = utils.model_paths_for_target("models/Lora")
+    assert candidates == [fast, big, spare]
+    assert utils.get_model_path("models/Lora/styles") == fast / "styles"
+
+    free = {fast: 300 * mib, big: 900 * mib, spare: 500 * mib}
+    monkeypatch.setattr(downloader.shutil, "disk_usage", lambda path: type("Usage", (), {"free": free[path]})())
+    monkeypatch.setattr(downloader, "MIN_FREE_MB", 100)
+    monkeypatch.setattr(downloader, "_SPACE_RESERVED", {})
+    monkeypatch.setattr(downloader, "_ROUND_ROBIN", {})
+
+    def choose(policy, size_mb):
+        monkeypatch.setattr(downloader, "PLACEMENT_POLICY", policy)
+        return downloader._rank_target_dirs(candidates, size_mb * mib)[0]
+
+    assert choose("first", 150) == fast
+    assert choose("first", 250) == big
+    assert choose("most_free", 150) == big
+    assert choose("tiered", 150) == fast
+    assert choose("tiered", 2000) == big
+    assert [choose("round_robin", 350) for _ in range(3)] == [big, spare, big]
+    monkeypatch.setattr(downloader, "PLACEMENT_POLICY", "first")
+    assert downloader._rank_target_dirs(candidates, 150 * mib) == [fast, big, spare]
+    assert downloader._rank_target_dirs(candidates, 2000 * mib) == [big, spare, fast]
+
+    # without a fileSize the primary folder is tried, and the Content-Length sends the job on
+    body = b"w" * 4096
+    monkeypatch.setattr(
+        utils,
+        "_SESSION",
+        type(
+            "Session", (), {"get": lambda self, url, **options: _FakeResponse(200, body, {"content-length": "4096"})}
+        )(),
+    )
+    monkeypatch.setattr(downloader, "model_paths_for_target", lambda _target: candidates)
+    monkeypatch.setattr(downloader, "_reserve_job_space", lambda job_id, part, target, total=0: reserve(part, total))
+    monkeypatch.setattr(downloader.client, "report_progress", lambda job_id, **fields: None)
+    monkeypatch.setattr(downloader, "_finish_job", lambda job, meta, path, sha: finished.append(path))
+    monkeypatch.setattr(downloader.journal, "_ENTRIES", None)
+    monkeypatch.setattr(downloader.journal, "_PARTS", None)
+    monkeypatch.setattr(utils, "CACHE_DIR", tmp_path / "cache")
+    running = threading.Event()
+    running.set()
+    monkeypatch.setattr(downloader, "RUNNING", running)
+    finished = []
+
+    def reserve(part, total):
+        if total and part.parent == fast:
+            raise utils.InsufficientSpace("no room on the ssd")
+
+    downloader._process_job(
+        {"id": 14, "targetPath": "lora", "version": {"externalDownloadUrl": "https://example.invalid/s.safetensors"}}
+    )
+    assert finished == [big / "s.safetensors"]
+    assert (big / "s.safetensors").read_bytes() == body
+    assert not list(fast.iterdir())
+
+
+def test_eviction_frees_space_from_least_recently_used_arcenciel_models(monkeypatch, tmp_path):
+    import time
+
+    from arcenciel_link import eviction
+
+    mib = 1024 * 1024
+    lora = tmp_path / "models" / "Lora"
+    lora.mkdir(parents=True)
+    now = time.time()
+    models = {}
+    for name, age_hours, owned in (
+        ("oldest", 500, True),
+        ("older", 300, True),
+        ("recent", 1, True),
+        ("mine", 900, False),
+    ):
+        path = lora / f"{name}.safetensors"
+        path.write_bytes(b"m")
+        # sidecars generated for a hand-added model carry no ownership flag
+        path.with_suffix(".arcenciel.info").write_text(json.dumps({"downloadedByLink": True} if owned else {}))
+        path.with_suffix(".json").write_text("{}")
+        os.utime(path, (now - age_hours * 3600, now - age_hours * 3600))
+        models[name] = path
+    cfg = {"webui_root": str(tmp_path), "evict_lru": True, "evict_min_idle_hours": 72}
+    monkeypatch.setattr(eviction, "load", lambda: cfg)
+    monkeypatch.setattr(utils, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(utils, "CACHE_FILE", tmp_path / "cache" / "hashes.json")
+    monkeypatch.setattr(utils, "_CACHE_DATA", {})
+    monkeypatch.delenv("COMMANDLINE_ARGS", raising=False)
+    # loaded by the WebUI just now, so no longer the least recently used
+    eviction.touch(models["oldest"])
+
+    # every evicted model frees 40 MiB
+    def disk_usage(_path):
+        gone = sum(not path.exists() for path in models.values())
+        return type("Usage", (), {"free": (20 + 40 * gone) * mib})()
+
+    monkeypatch.setattr(downloader.shutil, "disk_usage", disk_usage)
+    monkeypatch.setattr(downloader, "MIN_FREE_MB", 10)
+    monkeypatch.setattr(downloader, "_SPACE_RESERVED", {})
+    monkeypatch.setattr(downloader, "_sync_inventory", lambda: None)
+    collect, evict = eviction.collect, eviction.evict
+
+    def collect_unlocked(directory):
+        assert not downloader._SPACE_LOCK.locked()
+        return collect(directory)
+
+    def evict_unlocked(victims):
+        assert not downloader._SPACE_LOCK.locked()
+        return evict(victims)
+
+    monkeypatch.setattr(eviction, "collect", collect_unlocked)
+    monkeypatch.setattr(eviction, "evict", evict_unlocked)
+
+    downloader._reserve_space(5, lora / "new.safetensors.part", 40 * mib)
+
+    assert not models["older"].exists() and not models["older"].with_suffix(".json").exists()
+    assert models["oldest"].exists() and models["recent"].exists() and models["mine"].exists()
+    assert str(lora / "new.safetensors.part") in str(downloader._SPACE_RESERVED["5"])
+
+    # a cold folder keeps the layout below the model folder and is never overwritten
+    cold = tmp_path / "cold"
+    nested = lora / "styles" / "ink.safetensors"
+    nested.parent.mkdir()
+    nested.write_bytes(b"ink")
+    nested.with_suffix(".json").write_text("{}")
+    eviction._evict(nested, lora, cold)
+    assert (cold / "Lora" / "styles" / "ink.safetensors").read_bytes() == b"ink"
+    assert (cold / "Lora" / "styles" / "ink.json").exists() and not nested.exists()
+
+    nested.write_bytes(b"ink 2")
+    with pytest.raises(FileExistsError):
+        eviction._evict(nested, lora, cold)
+    assert nested.read_bytes() == b"ink 2"
+    assert (cold / "Lora" / "styles" / "ink.safetensors").read_bytes() == b"ink"
+
+
+def test_staged_download_is_copied_into_place_across_devices(monkeypatch, tmp_path):
+    import errno
+
+    staging = tmp_path / "nvme"
+    monkeypatch.setattr(downloader, "STAGING_DIR", staging)
+    target = tmp_path / "nas" / "Lora" / "style.safetensors"
+    target.parent.mkdir(parents=True)
+    part = downloader._part_path(12, target)
+    assert part == staging / "12_style.safetensors.part"
+
+    body = os.urandom(3 * 1024 * 1024 + 5)
+    part.write_bytes(body)
+    replace = os.replace
+
+    def cross_device_replace(src, dst):
+        if Path(src) == part:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        replace(src, dst)
+
+    monkeypatch.setattr(utils.os, "replace", cross_device_replace)
+    monkeypatch.setattr(utils, "COPY_CHUNK", 1024 * 1024)
+
+    assert utils.move_file(part, target) == "copy"
+    assert target.read_bytes() == body
+    assert not part.exists()
+    assert not target.with_name(target.name + ".part").exists()
+
+    # copy_file_range giving up part-way falls back to plain reads
+    if hasattr(os, "copy_file_range"):
+        copy_file_range = os.copy_file_range
+        calls = []
+
+        def stalling_copy_file_range(src_fd, dst_fd, count):
+            calls.append(count)
+            return copy_file_range(src_fd, dst_fd, count) if len(calls) == 1 else 0
+
+        monkeypatch.setattr(utils.os, "copy_file_range", stalling_copy_file_range)
+    # and a source that cannot be removed afterwards does not fail the move
+    unlink = Path.unlink
+
+    def stuck_unlink(self, missing_ok=False):
+        if self == part:
+            raise PermissionError(13, "Permission denied")
+        unlink(self, missing_ok=missing_ok)
+
+    monkeypatch.setattr(Path, "unlink", stuck_unlink)
+    body = os.urandom(3 * 1024 * 1024 + 7)
+    part.write_bytes(body)
+    assert utils.move_file(part, target) == "copy"
+    assert target.read_bytes() == body
+    assert part.exists()
+    assert not target.with_name(target.name + ".part").exists()